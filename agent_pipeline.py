@@ -0,0 +1,52 @@
+"""Run agents as explicit sequential steps instead of a broadcasting group chat."""
+import asyncio
+import contextvars
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import autogen
+
+from agents import ask_agent
+
+EXECUTION_MODES = ("groupchat", "pipeline")
+
+
+class PipelineStep(NamedTuple):
+    """One agent call in a pipeline.
+
+    ``build_prompt`` receives the replies of the earlier steps keyed by step
+    name, so each step is sent only the inputs it actually needs.
+    """
+    name: str
+    agent: autogen.ConversableAgent
+    build_prompt: Callable[[Dict[str, str]], str]
+
+
+def _as_message(step: PipelineStep, reply: str) -> Dict:
+    # Same shape as GroupChat messages so the existing result parsers apply
+    return {"role": "user", "name": step.name, "content": reply}
+
+
+def run_pipeline(steps: List[PipelineStep], cache: Optional[Any] = None) -> List[Dict]:
+    """Run the steps in order and return their replies as chat-style messages"""
+    outputs: Dict[str, str] = {}
+    messages = []
+    for step in steps:
+        reply = ask_agent(step.agent, step.build_prompt(outputs), cache=cache)
+        outputs[step.name] = reply
+        messages.append(_as_message(step, reply))
+    return messages
+
+
+async def arun_pipeline(steps: List[PipelineStep], cache: Optional[Any] = None) -> List[Dict]:
+    """Asynchronous variant of :func:`run_pipeline`; each call runs on the default executor"""
+    loop = asyncio.get_running_loop()
+    outputs: Dict[str, str] = {}
+    messages = []
+    for step in steps:
+        prompt = step.build_prompt(outputs)
+        # run_in_executor does not carry context variables over on its own
+        context = contextvars.copy_context()
+        reply = await loop.run_in_executor(None, lambda: context.run(ask_agent, step.agent, prompt, cache))
+        outputs[step.name] = reply
+        messages.append(_as_message(step, reply))
+    return messages
@@ -1,31 +1,74 @@
 """Define the agents used in the book generation system with improved context management"""
 import autogen
-from typing import Dict, List, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from outline_context import CONTEXT_MODES, format_full_outline, format_table_of_contents
+from scene_patch import EDIT_MODES
+from story_state import StoryState
+
+# Callable applied to every agent a generator uses, e.g. telemetry instrumentation
+AgentHook = Callable[[autogen.ConversableAgent], None]
+
+
+def ask_agent(agent: autogen.ConversableAgent, prompt: str, cache: Optional[Any] = None) -> str:
+    """Send one prompt to an agent outside of any chat and return the reply text.
+
+    The request goes straight through the agent's LLM client with its system
+    message, so no chat history is stored on the agent and the call is safe
+    to make from several threads at once.
+    """
+    if agent.client is None:
+        raise ValueError(f"Agent {agent.name} has no LLM configured")
+
+    messages = [
+        {"role": "system", "content": agent.system_message},
+        {"role": "user", "content": prompt},
+    ]
+    response = agent.client.create(messages=messages, cache=cache, agent=agent)
+    reply = agent.client.extract_text_or_completion_object(response)[0]
+    if not isinstance(reply, str):
+        reply = getattr(reply, "content", None) or ""
+    return reply
 
 class BookAgents:
-    def __init__(self, agent_config: Dict, outline: Optional[List[Dict]] = None):
-        """Initialize agents with book outline context"""
+    def __init__(self, agent_config: Dict, outline: Optional[List[Dict]] = None,
+                 context_mode: str = "full", output_dir: str = "book_output", edit_mode: str = "rewrite",
+                 story_state: Optional[StoryState] = None):
+        """Initialize agents with book outline context
+
+        ``context_mode`` "window" keeps only a table of contents in system
+        messages; the chapter at hand is supplied with each chapter prompt.
+        ``edit_mode`` "patch" has the editor return anchored edits instead of
+        the complete edited chapter. World elements and character
+        developments are kept in ``story_state``, which the book generator
+        fills from the memory keeper's updates.
+        """
+        if context_mode not in CONTEXT_MODES:
+            raise ValueError(f"Unknown context mode {context_mode!r}; expected one of {CONTEXT_MODES}")
+        if edit_mode not in EDIT_MODES:
+            raise ValueError(f"Unknown edit mode {edit_mode!r}; expected one of {EDIT_MODES}")
         self.agent_config = agent_config
         self.outline = outline
-        self.world_elements = {}  # Track described locations/elements
-        self.character_developments = {}  # Track character arcs
+        self.context_mode = context_mode
+        self.edit_mode = edit_mode
+        self.output_dir = output_dir  # Working directory of the user proxy
+        self._outline_context = ""  # Outline text embedded in the created agents' system messages
+        self._lock = threading.Lock()
+        self.story_state = story_state if story_state is not None else StoryState()
         
     def _format_outline_context(self) -> str:
         """Format the book outline into a readable context"""
         if not self.outline:
             return ""
-            
-        context_parts = ["Complete Book Outline:"]
-        for chapter in self.outline:
-            context_parts.extend([
-                f"\nChapter {chapter['chapter_number']}: {chapter['title']}",
-                chapter['prompt']
-            ])
-        return "\n".join(context_parts)
+
+        if self.context_mode == "window":
+            return format_table_of_contents(self.outline)
+        return format_full_outline(self.outline)
 
     def create_agents(self, initial_prompt, num_chapters) -> Dict:
         """Create and return all agents needed for book generation"""
-        outline_context = self._format_outline_context()
+        outline_context = self._outline_context = self._format_outline_context()
         
         # Memory Keeper: Maintains story continuity and context
         memory_keeper = autogen.AssistantAgent(
@@ -43,8 +86,8 @@ class BookAgents:
             Format your responses as follows:
             - Start updates with 'MEMORY UPDATE:'
             - List key events with 'EVENT:'
-            - List character developments with 'CHARACTER:'
-            - List world details with 'WORLD:'
+            - List character developments as 'CHARACTER: <Name> - <development>', one character per line
+            - List world details as 'WORLD: <Place> - <detail>', one place per line
             - Flag issues with 'CONTINUITY ALERT:'""",
             llm_config=self.agent_config,
         )
@@ -176,6 +219,13 @@ class BookAgents:
             llm_config=self.agent_config,
         )
 
+        if self.edit_mode == "patch":
+            edited_chapter = "Return anchored edits to the draft instead of the complete chapter"
+            edited_format = "List your changes after 'EDITS:' as a JSON array, in the format the chapter instructions give"
+        else:
+            edited_chapter = "Return complete edited chapter"
+            edited_format = "Return full edited chapter with 'EDITED_SCENE:'"
+
         # Editor: Reviews and improves content
         editor = autogen.AssistantAgent(
             name="editor",
@@ -189,14 +239,14 @@ class BookAgents:
             2. Verify character consistency
             3. Maintain world-building rules
             4. Improve prose quality
-            5. Return complete edited chapter
+            5. {edited_chapter}
             6. Never ask to start the next chapter, as the next step is finalizing this chapter
             7. Each chapter MUST be at least 5000 words. If the content is shorter, return it to the writer for expansion. This is a hard requirement - do not approve chapters shorter than 5000 words
             
             Format your responses:
             1. Start critiques with 'FEEDBACK:'
             2. Provide suggestions with 'SUGGEST:'
-            3. Return full edited chapter with 'EDITED_SCENE:'
+            3. {edited_format}
             
             Reference specific outline elements in your feedback.""",
             llm_config=self.agent_config,
@@ -207,7 +257,7 @@ class BookAgents:
             name="user_proxy",
             human_input_mode="TERMINATE",
             code_execution_config={
-                "work_dir": "book_output",
+                "work_dir": self.output_dir,
                 "use_docker": False
             }
         )
@@ -222,33 +272,56 @@ class BookAgents:
             "outline_creator": outline_creator
         }
 
-    def update_world_element(self, element_name: str, description: str) -> None:
+    def refresh_outline_context(self, agents: Dict[str, autogen.ConversableAgent]) -> None:
+        """Swap the outline in the agents' system messages for the current one.
+
+        Used while the outline is streamed in: ``self.outline`` grows in place
+        after the agents were created.
+        """
+        with self._lock:
+            current = self._format_outline_context()
+            if not self._outline_context or current == self._outline_context:
+                return
+            for agent in agents.values():
+                if isinstance(agent, autogen.AssistantAgent) and self._outline_context in agent.system_message:
+                    agent.update_system_message(agent.system_message.replace(self._outline_context, current))
+            self._outline_context = current
+
+    @property
+    def world_elements(self) -> Dict[str, str]:
+        return self.story_state.world_elements
+
+    @property
+    def character_developments(self) -> Dict[str, List[str]]:
+        return self.story_state.character_developments
+
+    def update_world_element(self, element_name: str, description: str, chapter_number: int = 0) -> None:
         """Track a new or updated world element"""
-        self.world_elements[element_name] = description
+        self.story_state.add(chapter_number, "world", element_name, description)
 
-    def update_character_development(self, character_name: str, development: str) -> None:
+    def update_character_development(self, character_name: str, development: str, chapter_number: int = 0) -> None:
         """Track character development"""
-        if character_name not in self.character_developments:
-            self.character_developments[character_name] = []
-        self.character_developments[character_name].append(development)
+        self.story_state.add(chapter_number, "character", character_name, development)
 
     def get_world_context(self) -> str:
         """Get formatted world-building context"""
-        if not self.world_elements:
+        world_elements = self.world_elements
+        if not world_elements:
             return "No established world elements yet."
         
         return "\n".join([
             "Established World Elements:",
-            *[f"- {name}: {desc}" for name, desc in self.world_elements.items()]
+            *[f"- {name}: {desc}" for name, desc in world_elements.items()]
         ])
 
     def get_character_context(self) -> str:
         """Get formatted character development context"""
-        if not self.character_developments:
+        character_developments = self.character_developments
+        if not character_developments:
             return "No character developments tracked yet."
         
         return "\n".join([
             "Character Development History:",
             *[f"- {name}:\n  " + "\n  ".join(devs) 
-              for name, devs in self.character_developments.items()]
+              for name, devs in character_developments.items()]
         ])
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Generate many books from a JSONL file of jobs with a bounded worker pool.
+
+Each line is a JSON object describing one book::
+
+    {"id": "heist", "prompt": "A heist in orbit...", "chapters": 12, "provider": "openrouter", "model": "openai/gpt-4o-mini"}
+
+``request_id`` and ``title``/``body`` are accepted in place of ``id`` and
+``prompt``, so backlog files such as ``requests.jsonl`` can be used as is.
+Every job writes to its own directory under ``--output-root`` and the
+outcome of each job is recorded in ``<output-root>/manifest.json``.
+
+Usage::
+
+    python batch_runner.py jobs.jsonl --workers 4 --chapters 10
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from chapter_store import atomic_write_text
+from generation_service import run_generation
+from run_journal import JOURNAL_FILENAME
+
+MANIFEST_FILENAME = "manifest.json"
+
+# Job keys passed straight through to run_generation
+JOB_OPTIONS = ("local_url", "model", "concurrency", "context_mode", "outline_window", "execution_mode",
+               "stream_outline", "target_words", "edit_mode", "continuity_mode")
+
+
+def _job_id(raw: Dict[str, Any], line_number: int) -> str:
+    job_id = str(raw.get("id") or raw.get("request_id") or f"job-{line_number:03d}")
+    # The id names the job's output directory
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", job_id).strip("-") or f"job-{line_number:03d}"
+
+
+def load_jobs(path: Path, default_chapters: int) -> List[Dict[str, Any]]:
+    """Read and validate the jobs in a JSONL file"""
+    jobs = []
+    seen = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            prompt = raw.get("prompt")
+            if not prompt and raw.get("body"):
+                prompt = "\n\n".join(part for part in (raw.get("title"), raw["body"]) if part)
+            if not prompt:
+                raise ValueError(f"{path}:{line_number}: job has no 'prompt' or 'body'")
+
+            job_id = _job_id(raw, line_number)
+            if job_id in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate job id {job_id!r}")
+            seen.add(job_id)
+
+            provider = raw.get("provider")
+            job = {
+                "id": job_id,
+                "prompt": prompt,
+                "chapters": int(raw.get("chapters") or raw.get("num_chapters") or default_chapters),
+                "use_openrouter": None if provider is None else provider.lower() == "openrouter",
+            }
+            job.update({key: raw[key] for key in JOB_OPTIONS if raw.get(key) is not None})
+            jobs.append(job)
+    return jobs
+
+
+class Manifest:
+    """Results of every job, rewritten atomically as each job finishes"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                self.entries = {entry["id"]: entry for entry in json.load(f)["jobs"]}
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[entry["id"]] = entry
+            atomic_write_text(self.path, json.dumps({"jobs": list(self.entries.values())}, indent=2))
+
+    def succeeded(self, job_id: str) -> bool:
+        return self.entries.get(job_id, {}).get("status") == "ok"
+
+
+def run_job(job: Dict[str, Any], output_root: Path, resume: bool, run_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate one book in its own directory and describe the outcome"""
+    output_dir = output_root / job["id"]
+    resume = resume and (output_dir / JOURNAL_FILENAME).exists()
+
+    def progress(message: str) -> None:
+        print(f"[{job['id']}] {message}", flush=True)
+
+    started = time.perf_counter()
+    entry: Dict[str, Any] = {"id": job["id"], "output_dir": str(output_dir), "chapters_requested": job["chapters"]}
+    try:
+        result = run_generation(
+            job["prompt"],
+            job["chapters"],
+            use_openrouter=job["use_openrouter"],
+            progress_callback=progress,
+            resume=resume,
+            output_dir=output_dir,
+            **{key: job[key] for key in JOB_OPTIONS if key in job},
+            **run_options,
+        )
+        entry.update({
+            "status": "ok",
+            "chapters_written": len(result["chapters"]),
+            "outline_path": result["outline_path"],
+            "journal_path": result["journal_path"],
+        })
+        if "telemetry" in result:
+            entry["telemetry"] = result["telemetry"]["totals"]
+    except Exception as e:
+        progress(f"Failed: {str(e)}")
+        entry.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+    entry["duration_s"] = round(time.perf_counter() - started, 1)
+    return entry
+
+
+def run_batch(jobs: List[Dict[str, Any]], output_root: Path, workers: int = 2, resume: bool = False,
+              run_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run the jobs ``workers`` at a time and return the manifest contents"""
+    output_root.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(output_root / MANIFEST_FILENAME)
+    pending = [job for job in jobs if not (resume and manifest.succeeded(job["id"]))]
+    print(f"Running {len(pending)} of {len(jobs)} jobs with {workers} workers; results in {manifest.path}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_job, job, output_root, resume, run_options or {}) for job in pending]
+        for future in as_completed(futures):
+            entry = future.result()
+            manifest.record(entry)
+            print(f"[{entry['id']}] {entry['status']} in {entry['duration_s']}s")
+
+    return {"jobs": list(manifest.entries.values())}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a batch of books from a JSONL file of jobs")
+    parser.add_argument("jobs", type=Path, help="JSONL file with one job per line")
+    parser.add_argument("--output-root", type=Path, default=Path("batch_output"),
+                        help="Directory holding one output directory per job")
+    parser.add_argument("--workers", type=int, default=2, help="Books generated at the same time")
+    parser.add_argument("--chapters", type=int, default=10, help="Chapters for jobs that do not set 'chapters'")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip jobs that already succeeded and resume interrupted ones from their journal")
+    parser.add_argument("--use-cache", action="store_true", help="Share the on-disk response cache between jobs")
+    parser.add_argument("--outline-only", action="store_true", help="Generate outlines without chapters")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs, args.chapters)
+    results = run_batch(
+        jobs,
+        args.output_root,
+        workers=args.workers,
+        resume=args.resume,
+        run_options={"use_cache": args.use_cache, "generate_book": not args.outline_only},
+    )
+    failed = [entry["id"] for entry in results["jobs"] if entry["status"] != "ok"]
+    if failed:
+        print(f"{len(failed)} job(s) failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
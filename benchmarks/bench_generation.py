@@ -0,0 +1,181 @@
+"""End-to-end load benchmark for ``run_generation`` against a local fake endpoint.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_generation --chapters 5 25 100 --concurrency 4
+
+Everything runs offline: the fake server in :mod:`benchmarks.fake_llm_server`
+answers every completion, and each book is written to a temporary directory.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from agent_pipeline import EXECUTION_MODES
+from benchmarks.fake_llm_server import FakeLLMServer
+from continuity import CONTINUITY_MODES
+from generation_service import run_generation
+from scene_patch import EDIT_MODES
+
+PROMPT = (
+    "A software engineer named Dane finishes a stock prediction algorithm that forecasts "
+    "a catastrophic market crash, oversleeps, and must convince sceptical executives."
+)
+
+# Progress messages that open and close each measured phase
+PHASE_MARKERS = {
+    "outline": ("Generating outline...", "Outline generated"),
+    "chapter": ("Initializing chapter generation...", "Book generation complete."),
+}
+
+
+def _merge_snapshots(servers: List[FakeLLMServer]) -> Dict[str, Dict[str, int]]:
+    merged: Dict[str, Dict[str, int]] = {}
+    for server in servers:
+        for phase, stats in server.snapshot().items():
+            bucket = merged.setdefault(phase, {})
+            for key, value in stats.items():
+                bucket[key] = bucket.get(key, 0) + value
+    return merged
+
+
+def run_once(servers: List[FakeLLMServer], chapters: int, concurrency: int, execution_mode: str,
+             quiet: bool, stream_outline: bool = False, target_words: int = 0,
+             edit_mode: str = "rewrite", continuity_mode: str = "llm") -> Dict[str, Any]:
+    """Generate one book and return wall time plus per-phase server counters."""
+    for server in servers:
+        server.reset_stats()
+    marks: Dict[str, float] = {}
+
+    def on_progress(message: str) -> None:
+        for phase, (start, end) in PHASE_MARKERS.items():
+            if message.startswith(start):
+                marks[f"{phase}_start"] = time.perf_counter()
+            elif message.startswith(end):
+                marks[f"{phase}_end"] = time.perf_counter()
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="book-bench-") as workdir:
+        os.chdir(workdir)
+        started = time.perf_counter()
+        try:
+            output = io.StringIO() if quiet else None
+            with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+                result = run_generation(
+                    PROMPT,
+                    chapters,
+                    local_url=",".join(server.url for server in servers),
+                    use_openrouter=False,
+                    progress_callback=on_progress,
+                    concurrency=concurrency,
+                    execution_mode=execution_mode,
+                    stream_outline=stream_outline,
+                    target_words=target_words,
+                    edit_mode=edit_mode,
+                    continuity_mode=continuity_mode,
+                )
+        finally:
+            os.chdir(previous_dir)
+        wall_time = time.perf_counter() - started
+
+    phases = _merge_snapshots(servers)
+    for phase in PHASE_MARKERS:
+        if f"{phase}_start" in marks and f"{phase}_end" in marks:
+            phases.setdefault(phase, {})["wall_s"] = round(marks[f"{phase}_end"] - marks[f"{phase}_start"], 3)
+
+    return {
+        "chapters": chapters,
+        "chapters_written": len(result["chapters"]),
+        "concurrency": concurrency,
+        "endpoints": len(servers),
+        "throttled": sum(server.throttled for server in servers),
+        "calls_per_endpoint": [sum(stats["calls"] for stats in server.snapshot().values()) for server in servers],
+        "execution_mode": execution_mode,
+        "stream_outline": stream_outline,
+        "target_words": target_words,
+        "edit_mode": edit_mode,
+        "continuity_mode": continuity_mode,
+        "continuity_alerts": len(result["continuity_alerts"]),
+        "wall_s": round(wall_time, 3),
+        "phases": phases,
+    }
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    header = f"{'chapters':>8} {'phase':>8} {'wall_s':>9} {'calls':>6} {'req_KB':>9} {'resp_KB':>9} {'prompt_tok':>11} {'compl_tok':>10}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        for phase, stats in sorted(result["phases"].items()):
+            lines.append(
+                f"{result['chapters']:>8} {phase:>8} {stats.get('wall_s', 0):>9.2f} {stats.get('calls', 0):>6} "
+                f"{stats.get('request_bytes', 0) / 1024:>9.1f} {stats.get('response_bytes', 0) / 1024:>9.1f} "
+                f"{stats.get('prompt_tokens', 0):>11} {stats.get('completion_tokens', 0):>10}"
+            )
+        lines.append(
+            f"{result['chapters']:>8} {'total':>8} {result['wall_s']:>9.2f}   "
+            f"({result['chapters_written']}/{result['chapters']} chapters written, "
+            f"{result['throttled']} requests throttled)"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Chapters drafted in parallel")
+    parser.add_argument("--execution-mode", choices=EXECUTION_MODES, default="groupchat")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Simulated generation speed (0 = instant)")
+    parser.add_argument("--chapter-words", type=int, default=800, help="Approximate words per drafted scene")
+    parser.add_argument("--endpoints", type=int, default=1, help="Fake servers to spread requests over")
+    parser.add_argument("--slots", type=int, default=0,
+                        help="Requests each fake server generates at once (0 = unlimited)")
+    parser.add_argument("--throttle-every", type=int, default=0,
+                        help="Answer every Nth request with 429 and Retry-After (0 = never)")
+    parser.add_argument("--stream-outline", action="store_true",
+                        help="Start chapters while the outline is still streaming")
+    parser.add_argument("--edit-mode", choices=EDIT_MODES, default="rewrite",
+                        help="Full rewrite by writer_final, or the editor's edits applied locally")
+    parser.add_argument("--continuity-mode", choices=CONTINUITY_MODES, default="llm",
+                        help="Memory keeper turn per chapter, local rule-based checks, or local checks with LLM review")
+    parser.add_argument("--target-words", type=int, default=0,
+                        help="Continue chapters shorter than this many words (0 = off)")
+    parser.add_argument("--outline-defects", type=int, default=0,
+                        help="Leave the Tone out of every Nth outline chapter to exercise repair (0 = never)")
+    parser.add_argument("--json", dest="json_path", help="Also write the raw results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the generators' console output")
+    args = parser.parse_args()
+
+    results = []
+    servers = [
+        FakeLLMServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                      chapter_words=args.chapter_words, slots=args.slots,
+                      throttle_every=args.throttle_every, outline_defects=args.outline_defects).start()
+        for _ in range(max(1, args.endpoints))
+    ]
+    try:
+        for chapters in args.chapters:
+            results.append(run_once(servers, chapters, args.concurrency, args.execution_mode,
+                                    quiet=not args.verbose, stream_outline=args.stream_outline,
+                                    target_words=args.target_words, edit_mode=args.edit_mode,
+                                    continuity_mode=args.continuity_mode))
+            print(format_report(results[-1:]), flush=True)
+    finally:
+        for server in servers:
+            server.stop()
+
+    print()
+    print(format_report(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Micro-benchmark of the single-pass outline parser against the previous regex parser.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_outline_parser --chapters 10 100 500
+
+The corpus is the hand-written outlines in ``benchmarks/outline_corpus``
+plus synthetic outlines of the requested sizes in three styles. Every
+entry is first checked to give identical chapters with both parsers.
+"""
+import argparse
+import json
+import random
+import re
+import timeit
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from outline_parser import parse_outline
+
+CORPUS_DIR = Path(__file__).resolve().parent / "outline_corpus"
+STYLES = ("plain", "bold", "mixed")
+
+
+def legacy_parse_outline(outline_content: str) -> Tuple[List[Dict], Dict[int, str]]:
+    """The parser ``OutlineGenerator._process_outline_results`` used before, minus its printing."""
+    chapters = []
+    problems = {}
+    chapter_sections = re.split(r'Chapter \d+:', outline_content)
+
+    for i, section in enumerate(chapter_sections[1:], 1):
+        title_match = re.search(r'\*?\*?Title:\*?\*?\s*(.+?)(?=\n|$)', section, re.IGNORECASE)
+        events_match = re.search(r'\*?\*?Key Events:\*?\*?\s*(.*?)(?=\*?\*?Character Developments:|$)', section, re.DOTALL | re.IGNORECASE)
+        character_match = re.search(r'\*?\*?Character Developments:\*?\*?\s*(.*?)(?=\*?\*?Setting:|$)', section, re.DOTALL | re.IGNORECASE)
+        setting_match = re.search(r'\*?\*?Setting:\*?\*?\s*(.*?)(?=\*?\*?Tone:|$)', section, re.DOTALL | re.IGNORECASE)
+        tone_match = re.search(r'\*?\*?Tone:\*?\*?\s*(.*?)(?=\*?\*?Chapter \d+:|$)', section, re.DOTALL | re.IGNORECASE)
+
+        if not title_match:
+            title_match = re.search(r'\*?\*?Chapter \d+:\s*(.+?)(?=\n|$)', section)
+
+        if not all([title_match, events_match, character_match, setting_match, tone_match]):
+            missing = []
+            if not title_match: missing.append("Title")
+            if not events_match: missing.append("Key Events")
+            if not character_match: missing.append("Character Developments")
+            if not setting_match: missing.append("Setting")
+            if not tone_match: missing.append("Tone")
+            problems[i] = f"missing {', '.join(missing)}"
+            continue
+
+        chapter_info = {
+            "chapter_number": i,
+            "title": title_match.group(1).strip(),
+            "prompt": "\n".join([
+                f"- Key Events: {events_match.group(1).strip()}",
+                f"- Character Developments: {character_match.group(1).strip()}",
+                f"- Setting: {setting_match.group(1).strip()}",
+                f"- Tone: {tone_match.group(1).strip()}"
+            ])
+        }
+
+        events = re.findall(r'-\s*(.+?)(?=\n|$)', events_match.group(1))
+        if len(events) < 3:
+            problems[i] = "fewer than 3 events"
+            continue
+
+        chapters.append(chapter_info)
+
+    return chapters, problems
+
+
+def _chapter_text(number: int, style: str, rng: random.Random) -> str:
+    title = f"{rng.choice(['The', 'A', 'No'])} {rng.choice(['Signal', 'Harbour', 'Ledger', 'Storm', 'Map'])} {number}"
+    events = [
+        f"{rng.choice(['Dane', 'Ilse', 'Amara', 'Gary'])} {rng.choice(['finds', 'hides', 'loses', 'decodes'])} "
+        f"the {rng.choice(['logbook', 'chart', 'report', 'key'])} in scene {scene}"
+        for scene in range(1, rng.randint(3, 6) + 1)
+    ]
+    development = "Trust between the leads shifts as the stakes rise. " * rng.randint(1, 4)
+    setting = f"A {rng.choice(['rain-soaked', 'frozen', 'crowded', 'silent'])} {rng.choice(['port', 'station', 'office'])}."
+    tone = rng.choice(["Tense.", "Wistful and strange.", "Frantic with dark humour."])
+
+    if style == "mixed":
+        style = rng.choice(["plain", "bold", "bullets", "defective"])
+    if style == "bold":
+        return "\n".join([
+            f"**Chapter {number}:** {title}",
+            f"**Title:** {title}",
+            "**Key Events:**",
+            *(f"- {event}" for event in events),
+            "",
+            f"**Character Developments:** {development.strip()}",
+            f"**Setting:** {setting}",
+            f"**Tone:** {tone}",
+            "",
+        ])
+    if style == "bullets":
+        return "\n".join([
+            f"Chapter {number}: {title}",
+            f"- **Title:** {title}",
+            "- **Key Events:**",
+            *(f"  - {event}" for event in events),
+            f"- **Character Developments:** {development.strip()}",
+            f"- **Setting:** {setting}",
+            f"- **Tone:** {tone}",
+            "",
+        ])
+    lines = [
+        f"Chapter {number}: {title}",
+        f"Chapter Title: {title}",
+        "Key Events:",
+        *(f"- {event}" for event in events),
+        f"Character Developments: {development.strip()}",
+        f"Setting: {setting}",
+        f"Tone: {tone}",
+        "",
+    ]
+    if style == "defective":
+        # Drop a field or most of the events, as models sometimes do
+        if rng.random() < 0.5:
+            lines = [line for line in lines if not line.startswith(rng.choice(["Setting:", "Tone:", "Chapter Title:"]))]
+        else:
+            lines = lines[:4] + lines[3 + len(events):]
+    return "\n".join(lines)
+
+
+def synthetic_outline(chapters: int, style: str, seed: int = 0) -> str:
+    """Outline of ``chapters`` chapters in one of :data:`STYLES`"""
+    rng = random.Random(f"{style}-{chapters}-{seed}")
+    body = "\n".join(_chapter_text(number, style, rng) for number in range(1, chapters + 1))
+    return f"OUTLINE:\n{body}\nEND OF OUTLINE"
+
+
+def load_corpus(sizes: List[int]) -> List[Tuple[str, str]]:
+    corpus = [(path.stem, path.read_text(encoding="utf-8")) for path in sorted(CORPUS_DIR.glob("*.txt"))]
+    corpus += [(f"{style}-{size}", synthetic_outline(size, style)) for size in sizes for style in STYLES]
+    return corpus
+
+
+def _best_time(func, content: str, repeat: int) -> float:
+    number = max(1, 20000 // max(1, len(content) // 100))
+    return min(timeit.repeat(lambda: func(content), number=number, repeat=repeat)) / number
+
+
+def run(sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for name, content in load_corpus(sizes):
+        legacy = legacy_parse_outline(content)
+        parsed = parse_outline(content)
+        if (parsed.chapters, parsed.problems) != legacy:
+            raise AssertionError(f"{name}: parsers disagree")
+        legacy_s = _best_time(legacy_parse_outline, content, repeat)
+        parser_s = _best_time(parse_outline, content, repeat)
+        results.append({
+            "outline": name,
+            "chars": len(content),
+            "chapters": len(parsed.chapters) + len(parsed.problems),
+            "rejected": len(parsed.problems),
+            "legacy_ms": round(legacy_s * 1000, 3),
+            "parser_ms": round(parser_s * 1000, 3),
+            "speedup": round(legacy_s / parser_s, 1),
+        })
+    return results
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    header = f"{'outline':>16} {'chars':>8} {'chapters':>8} {'rejected':>8} {'legacy ms':>10} {'parser ms':>10} {'speedup':>8}"
+    lines = [header, "-" * len(header)]
+    for row in results:
+        lines.append(
+            f"{row['outline']:>16} {row['chars']:>8} {row['chapters']:>8} {row['rejected']:>8} "
+            f"{row['legacy_ms']:>10.3f} {row['parser_ms']:>10.3f} {row['speedup']:>7.1f}x"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, nargs="+", default=[10, 100, 500],
+                        help="Sizes of the synthetic outlines")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per outline; the best is reported")
+    parser.add_argument("--json", dest="json_path", help="Also write the raw results to this file")
+    args = parser.parse_args()
+
+    results = run(args.chapters, args.repeat)
+    print(format_report(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Offline stand-in for an OpenAI-compatible ``/v1/chat/completions`` endpoint.
+
+Replies are canned but follow the formats ``OutlineGenerator`` and
+``BookGenerator`` parse, so the whole pipeline can run end to end without a
+model. Latency and generation speed are configurable, and every request is
+counted per phase (outline, chapter or speaker selection) for the benchmark
+report.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+OUTLINE_ROLES = {"story_planner", "world_builder", "outline_creator"}
+
+_SENTENCES = [
+    "Dane watched the numbers scroll past, each one heavier than the last.",
+    "The office hummed with the low sound of servers and nervous conversation.",
+    "Gary tapped his pen against the desk and avoided looking at the screen.",
+    "Outside, the city moved on as if nothing could ever go wrong.",
+    "Jonathan Morego leaned forward, his questions sharp and deliberate.",
+    "The algorithm did not care about anyone's expectations.",
+]
+
+
+def _estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _prose(words: int, seed: int = 0) -> str:
+    """Deterministic filler prose of roughly ``words`` words in short paragraphs."""
+    sentences: List[str] = []
+    count = 0
+    index = seed
+    while count < words:
+        sentence = _SENTENCES[index % len(_SENTENCES)]
+        sentences.append(sentence)
+        count += len(sentence.split())
+        index += 1
+    paragraphs = [" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    return "\n\n".join(paragraphs)
+
+
+def canned_outline(chapter_numbers: List[int], defects_every: int = 0) -> str:
+    """Outline text in the exact format the outline_creator is asked for.
+
+    With ``defects_every`` every Nth chapter leaves out its Tone line.
+    """
+    parts = ["OUTLINE:"]
+    for number in chapter_numbers:
+        tone = "" if defects_every and number % defects_every == 0 else "Tone: Tense and technical.\n"
+        parts.append(
+            f"Chapter {number}: The Signal Part {number}\n"
+            f"Chapter Title: The Signal Part {number}\n"
+            "Key Events:\n"
+            f"- Dane reruns the model for the {number} time\n"
+            "- Gary receives a call from upper management\n"
+            "- Morego questions the prediction in front of the executives\n"
+            f"Character Developments: Dane grows more certain while Gary wavers (step {number}).\n"
+            "Setting: A glass-walled conference room above the trading floor.\n"
+            f"{tone}"
+        )
+    parts.append("END OF OUTLINE")
+    return "\n".join(parts)
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering chat completions with canned content.
+
+    Args:
+        latency: Fixed delay in seconds before each reply starts.
+        tokens_per_sec: Simulated generation speed; ``0`` replies instantly.
+        chapter_words: Approximate length of each drafted scene.
+        slots: Requests generated at once, like a model server's parallel
+            slots; further requests queue. ``0`` means unlimited.
+        throttle_every: Answer every Nth request with ``429 Too Many
+            Requests`` and a ``Retry-After`` header. ``0`` never throttles.
+        outline_defects: Leave the Tone out of every Nth chapter of full
+            outlines; repair requests are always answered correctly.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 tokens_per_sec: float = 0.0, chapter_words: int = 800, slots: int = 0,
+                 throttle_every: int = 0, retry_after: float = 0.5, outline_defects: int = 0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.chapter_words = chapter_words
+        self._slots = threading.BoundedSemaphore(slots) if slots > 0 else None
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.outline_defects = outline_defects
+        self._requests = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats: Dict[str, Dict[str, int]] = {}
+            self.throttled = 0
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {phase: dict(values) for phase, values in self.stats.items()}
+
+    def _should_throttle(self) -> bool:
+        with self._lock:
+            self._requests += 1
+            if self.throttle_every and self._requests % self.throttle_every == 0:
+                self.throttled += 1
+                return True
+            return False
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def _record(self, phase: str, request_bytes: int, response_bytes: int,
+                prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            bucket = self.stats.setdefault(phase, {
+                "calls": 0, "request_bytes": 0, "response_bytes": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            bucket["calls"] += 1
+            bucket["request_bytes"] += request_bytes
+            bucket["response_bytes"] += response_bytes
+            bucket["prompt_tokens"] += prompt_tokens
+            bucket["completion_tokens"] += completion_tokens
+
+    def reply_for(self, messages: List[Dict]) -> Tuple[str, str]:
+        """Return ``(role, content)`` for a request, identified by its system message."""
+        # Agents are told apart by how their own system message opens; later
+        # text (outline context, instructions) mentions other roles freely.
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        opening = system.strip().split("\n", 1)[0]
+        conversation = "\n".join(str(m.get("content") or "") for m in messages)
+        last = str(messages[-1].get("content") or "") if messages else ""
+        chapter_match = re.search(r"Chapter (\d+)", last) or re.search(r"Chapter (\d+)", conversation)
+        chapter = int(chapter_match.group(1)) if chapter_match else 1
+
+        if "role play game" in system:
+            role = "writer" if "PLAN:" in conversation else "story_planner"
+            return "speaker_selection", role
+        if opening.startswith("You are an expert story arc planner"):
+            return "story_planner", (
+                "STORY_ARC:\n- Major Plot Points:\nThe algorithm predicts a crash.\n"
+                "- Character Arcs:\nDane learns to trust himself.\n"
+                "- Story Beats:\nDiscovery, doubt, confrontation.\n"
+                "- Key Transitions:\nFrom the lab to the boardroom.\n"
+                "PLAN: Build tension toward the presentation."
+            )
+        if opening.startswith("You are an expert in world-building"):
+            return "world_builder", (
+                "WORLD_ELEMENTS:\n\n[TRADING FLOOR]:\n- Physical Description: Rows of screens.\n"
+                "- Atmosphere: Restless.\n- Key Features: The glass conference room.\n"
+                "- Sensory Details: Keyboards and ringing phones.\nSETTING: A fintech office."
+            )
+        outline_match = re.match(r"Generate a detailed (\d+)-chapter outline", opening)
+        if outline_match:
+            repair_match = re.search(r"Rewrite only these chapters: ([\d, ]+)", last)
+            if repair_match:
+                return "outline_creator", canned_outline([int(n) for n in repair_match.group(1).split(",")])
+            return "outline_creator", canned_outline(list(range(1, int(outline_match.group(1)) + 1)),
+                                                     defects_every=self.outline_defects)
+        if opening.startswith("You are the keeper of the story's continuity"):
+            if "may contradict earlier chapters" in last:
+                return "memory_keeper", "CONTINUITY ALERT: NONE"
+            return "memory_keeper", (
+                f"MEMORY UPDATE: Chapter {chapter} moves the crash prediction forward.\n"
+                "EVENT: Dane presents new evidence\n"
+                "CHARACTER: Dane - more confident\n"
+                "WORLD: Conference Room - tense and crowded\n"
+                "TRANSITION: NONE"
+            )
+        if opening.startswith("You are an expert editor"):
+            if "EDITS:" in system:
+                return "editor", (
+                    "FEEDBACK: The draft follows the outline; sharpen the opening and add a beat.\n"
+                    "EDITS:\n"
+                    '[{"op": "replace", "paragraph": 1, "text": "Dane had rerun the model six times before dawn."},\n'
+                    ' {"op": "insert_after", "paragraph": 2, "text": "Gary finally said what everyone was thinking."}]'
+                )
+            return "editor", (
+                "FEEDBACK: The draft follows the outline; tighten the middle section.\n"
+                "SUGGEST: Give Gary one more line of dialogue."
+            )
+        if opening.startswith("You are an expert creative writer"):
+            if "Respond with 'CONTINUATION:'" in last:
+                return "writer", f"CONTINUATION:\n{_prose(self.chapter_words, seed=chapter + 1)}"
+            scene = _prose(self.chapter_words, seed=chapter)
+            if "FEEDBACK:" in last:
+                return "writer", (
+                    f"SCENE FINAL:\n{scene}\n\n**Confirmation:** Chapter {chapter} completed successfully."
+                )
+            return "writer", (
+                f"PLAN: Follow the chapter {chapter} outline.\nSETTING: The conference room.\n"
+                f"SCENE:\n{scene}"
+            )
+        return "other", "Acknowledged."
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # Keep benchmark output clean
+                return
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                payload = json.loads(raw or b"{}")
+                if server._should_throttle():
+                    body = b'{"error": {"message": "Rate limit exceeded", "code": 429}}'
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                messages = payload.get("messages", [])
+                role, content = server.reply_for(messages)
+                if role == "speaker_selection":
+                    phase = "selection"
+                else:
+                    phase = "outline" if role in OUTLINE_ROLES else "chapter"
+                prompt_tokens = sum(_estimate_tokens(str(m.get("content") or "")) for m in messages)
+                completion_tokens = _estimate_tokens(content)
+
+                if server._slots is not None:
+                    server._slots.acquire()
+                try:
+                    time.sleep(server.latency)
+                    if payload.get("stream"):
+                        sent = self._stream(payload, content, completion_tokens)
+                    else:
+                        if server.tokens_per_sec:
+                            time.sleep(completion_tokens / server.tokens_per_sec)
+                        sent = self._complete(payload, content, prompt_tokens, completion_tokens)
+                finally:
+                    if server._slots is not None:
+                        server._slots.release()
+                server._record(phase, len(raw), sent, prompt_tokens, completion_tokens)
+
+            def _complete(self, payload, content, prompt_tokens, completion_tokens) -> int:
+                body = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "fake-model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return len(body)
+
+            def _stream(self, payload, content, completion_tokens) -> int:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                pieces = [content[i:i + 64] for i in range(0, len(content), 64)] or [""]
+                delay = (completion_tokens / server.tokens_per_sec / len(pieces)) if server.tokens_per_sec else 0
+                sent = 0
+                for index, piece in enumerate(pieces):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": payload.get("model", "fake-model"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"role": "assistant", "content": piece} if index == 0 else {"content": piece},
+                            "finish_reason": "stop" if index == len(pieces) - 1 else None,
+                        }],
+                    }
+                    sent += self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    if delay:
+                        time.sleep(delay)
+                sent += self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                return sent
+
+            def _write_chunk(self, data: bytes) -> int:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+                return len(data)
+
+        return Handler
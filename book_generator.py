@@ -1,20 +1,92 @@
 """Main class for generating books using AutoGen with improved iteration control"""
+import asyncio
 import autogen
-from typing import Dict, List, Optional
-import os
-import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Union
+import contextvars
 import re
+import string
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agent_pipeline import EXECUTION_MODES, PipelineStep, arun_pipeline, run_pipeline
+from agents import AgentHook, ask_agent
+from chapter_store import ChapterStore
+from continuity import CONTINUITY_MODES, ContinuityChecker, ContinuityIssue, memory_update_lines
+from llm_cache import ResponseCache
+from outline_context import format_full_outline, format_outline_window, format_table_of_contents
+from outline_stream import OutlineStream, aordered_chapters, ordered_chapters
+from retrieval import PassageIndex
+from run_journal import RunJournal
+from scene_patch import (EDIT_FORMAT, EDIT_MODES, PatchError, apply_edits, number_draft_messages, number_paragraphs,
+                         parse_edits)
+from story_memory import StoryMemory
+from story_state import StoryState
+from telemetry import label_agents, trace_labels
+from text_utils import count_words, estimate_tokens, truncate_to_tokens
+
+_KEY_EVENTS = re.compile(r"Key Events:(.*?)(?=\n- (?:Character Developments|Setting|Tone):|$)", re.DOTALL | re.IGNORECASE)
+_CONTINUITY_ALERT = re.compile(r"CONTINUITY ALERT:\**\s*(.+)")
+_BLANK_LINE = re.compile(r"\n\s*\n")
+_CONFIRMATION = re.compile(r"\s*Confirmation:\s*Chapter \d+ completed successfully\.?\s*$", re.IGNORECASE)
 
 class BookGenerator:
-    def __init__(self, agents: Dict[str, autogen.ConversableAgent], agent_config: Dict, outline: List[Dict]):
+    def __init__(self, agents: Dict[str, autogen.ConversableAgent], agent_config: Dict, outline: List[Dict],
+                 cache: Optional[ResponseCache] = None, concurrency: int = 1,
+                 memory_budget: int = 1500, context_mode: str = "full", outline_window: int = 1,
+                 agent_hooks: Sequence[AgentHook] = (), execution_mode: str = "groupchat",
+                 journal: Optional[RunJournal] = None, output_dir: str = "book_output",
+                 num_chapters: Optional[int] = None, target_words: int = 5000,
+                 continuation_paragraphs: int = 6, max_continuations: int = 3, edit_mode: str = "rewrite",
+                 story_state: Optional[StoryState] = None, retrieved_passages: int = 3,
+                 retrieval_budget: int = 600, continuity_mode: str = "llm"):
         """Initialize with outline to maintain chapter count context"""
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {execution_mode!r}; expected one of {EXECUTION_MODES}")
+        if edit_mode not in EDIT_MODES:
+            raise ValueError(f"Unknown edit mode {edit_mode!r}; expected one of {EDIT_MODES}")
+        if continuity_mode not in CONTINUITY_MODES:
+            raise ValueError(f"Unknown continuity mode {continuity_mode!r}; expected one of {CONTINUITY_MODES}")
         self.agents = agents
         self.agent_config = agent_config
-        self.output_dir = "book_output"
+        self.cache = cache  # Optional persistent response cache
+        self.output_dir = output_dir
         self.chapters_memory = []  # Store chapter summaries
+        # Bounded view of chapters_memory used in prompts
+        self.story_memory = StoryMemory(token_budget=memory_budget, summarizer=self._summarize_memory)
+        # Characters, places and events from the memory updates, shared with BookAgents when given
+        self.story_state = story_state if story_state is not None else StoryState()
+        # Saved chapters, searchable for passages relevant to a later chapter
+        self.passage_index = PassageIndex()
+        self.retrieved_passages = retrieved_passages  # Passages added to each chapter's context; 0 disables
+        self.retrieval_budget = retrieval_budget  # Tokens shared by the retrieved passages
         self.max_iterations = 3  # Limit editor-writer iterations
+        self.target_words = target_words  # Chapters shorter than this are continued; 0 disables
+        self.continuation_paragraphs = continuation_paragraphs  # Closing paragraphs sent with each continuation
+        self.max_continuations = max_continuations
         self.outline = outline  # Store the outline
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.num_chapters = num_chapters  # Expected length while a streamed outline is still growing
+        self.concurrency = max(1, concurrency)  # Chapters drafted in parallel
+        self.context_mode = context_mode  # "full" outline or a per-chapter "window"
+        self.outline_window = outline_window  # Neighbouring chapters shown in window mode
+        self.execution_mode = execution_mode  # "groupchat" or a direct "pipeline" of agent calls
+        self.edit_mode = edit_mode  # "rewrite" by writer_final, or "patch": the editor's edits applied locally
+        # "llm": the memory keeper takes a turn per chapter; "local": rule-based checks replace that turn;
+        # "hybrid": local checks, with ambiguous findings sent to the memory keeper
+        self.continuity_mode = continuity_mode
+        self.continuity = ContinuityChecker()
+        self.continuity_alerts: List[str] = []  # "Chapter N: ..." alerts, oldest first
+        self.context_savings = []  # Per-chapter outline token accounting
+        self.agent_hooks = list(agent_hooks)  # Applied to every agent, including copies
+        self.journal = journal  # Optional crash-safe record used to resume the run
+        # Atomic chapter files with a size and hash manifest; chapters are validated before they are written
+        self.chapter_store = ChapterStore(output_dir)
+        for agent in self.agents.values():
+            self._prepare_agent(agent)
+
+    @property
+    def total_chapters(self) -> int:
+        """Chapters in the book, including any a streamed outline has not reached yet"""
+        last = self.outline[-1]['chapter_number'] if self.outline else 0
+        return max(last, self.num_chapters or 0)
 
     def _clean_chapter_content(self, content: str) -> str:
         """Clean up chapter content by removing artifacts and chapter numbers"""
@@ -29,34 +101,86 @@ class BookGenerator:
         return content
     
 
-    def initiate_group_chat(self) -> autogen.GroupChat:
+    def _prepare_agent(self, agent: autogen.ConversableAgent) -> autogen.ConversableAgent:
+        """Apply the configured agent hooks, and number drafts for a patch-mode editor"""
+        for hook in self.agent_hooks:
+            hook(agent)
+        if self.edit_mode == "patch" and agent.name == "editor" and not getattr(agent, "numbers_drafts", False):
+            # Group chats show the editor the writer's own message; pipeline steps number it themselves
+            agent.register_hook("process_all_messages_before_reply", number_draft_messages)
+            agent.numbers_drafts = True
+        return agent
+
+    def _clone_agents(self) -> Dict[str, autogen.ConversableAgent]:
+        """Create private agent copies so concurrently drafted chapters keep separate histories"""
+        if self.execution_mode == "pipeline":
+            return self.agents  # Pipeline calls store no history, so sharing is safe
+        clones = {}
+        for key, agent in self.agents.items():
+            if isinstance(agent, autogen.UserProxyAgent):
+                clones[key] = autogen.UserProxyAgent(
+                    name=agent.name,
+                    human_input_mode=agent.human_input_mode,
+                    code_execution_config={
+                        "work_dir": self.output_dir,
+                        "use_docker": False
+                    }
+                )
+            else:
+                clones[key] = self._prepare_agent(autogen.AssistantAgent(
+                    name=agent.name,
+                    system_message=agent.system_message,
+                    llm_config=self.agent_config
+                ))
+        return clones
+
+    def _outline_seed(self, chapter_number: Optional[int]) -> str:
+        """Outline context that opens each chapter conversation"""
+        if self.context_mode != "window" or chapter_number is None:
+            return format_full_outline(self.outline)
+
+        full_outline = format_full_outline(self.outline)
+        seed = format_outline_window(self.outline, chapter_number, self.outline_window)
+        # Every call otherwise carries the full outline twice: system message and seed
+        full_tokens = 2 * estimate_tokens(full_outline)
+        window_tokens = estimate_tokens(format_table_of_contents(self.outline)) + estimate_tokens(seed)
+        self.context_savings.append({
+            "chapter_number": chapter_number,
+            "full_tokens_per_call": full_tokens,
+            "window_tokens_per_call": window_tokens,
+            "saved_tokens_per_call": full_tokens - window_tokens,
+        })
+        print(f"Outline context for chapter {chapter_number}: ~{window_tokens} tokens per call "
+              f"instead of ~{full_tokens} (saves ~{full_tokens - window_tokens})")
+        return seed
+
+    def initiate_group_chat(self, agents: Optional[Dict[str, autogen.ConversableAgent]] = None,
+                            chapter_number: Optional[int] = None, remember: bool = True) -> autogen.GroupChat:
         """Create a new group chat for the agents with improved speaking order"""
-        outline_context = "\n".join([
-            f"\nChapter {ch['chapter_number']}: {ch['title']}\n{ch['prompt']}"
-            for ch in sorted(self.outline, key=lambda x: x['chapter_number'])
-        ])
+        agents = agents or self.agents
 
         messages = [{
             "role": "system",
-            "content": f"Complete Book Outline:\n{outline_context}"
+            "content": self._outline_seed(chapter_number)
         }]
 
-        writer_final = autogen.AssistantAgent(
-            name="writer_final",
-            system_message=self.agents["writer"].system_message,
-            llm_config=self.agent_config
-        )
+        chat_agents = [agents["user_proxy"]]
+        if self._memory_keeper_turn(remember):
+            chat_agents.append(agents["memory_keeper"])
+        chat_agents += [agents["writer"], agents["editor"]]
+        if self.edit_mode == "rewrite":
+            chat_agents.append(self._prepare_agent(autogen.AssistantAgent(
+                name="writer_final",
+                system_message=agents["writer"].system_message,
+                llm_config=self.agent_config
+            )))
+        if chapter_number is not None:
+            label_agents(chat_agents, phase="chapter", chapter=chapter_number)
         
         return autogen.GroupChat(
-            agents=[
-                self.agents["user_proxy"],
-                self.agents["memory_keeper"],
-                self.agents["writer"],
-                self.agents["editor"],
-                writer_final
-            ],
+            agents=chat_agents,
             messages=messages,
-            max_round=5,
+            max_round=len(chat_agents),
             speaker_selection_method="round_robin"
         )
 
@@ -64,13 +188,21 @@ class BookGenerator:
         """Helper to get sender from message regardless of format"""
         return msg.get("sender") or msg.get("name", "")
 
-    def _verify_chapter_complete(self, messages: List[Dict]) -> bool:
+    def _memory_keeper_turn(self, remember: bool = True) -> bool:
+        """Whether chapter conversations include the memory keeper, which only llm continuity needs.
+
+        Chapters drafted in parallel (``remember=False``) leave memory to the
+        sequential continuity pass, so they skip it too.
+        """
+        return remember and self.continuity_mode == "llm"
+
+    def _verify_chapter_complete(self, messages: List[Dict], remember: bool = True) -> bool:
         """Verify chapter completion by analyzing entire conversation context"""
         print("******************** VERIFYING CHAPTER COMPLETION ****************")
         current_chapter = None
         chapter_content = None
         sequence_complete = {
-            'memory_update': False,
+            'memory_update': not self._memory_keeper_turn(remember),
             'plan': False,
             'setting': False,
             'scene': False,
@@ -107,8 +239,8 @@ class BookGenerator:
             print("******************** CHAPTER_CONTENT ****************", chapter_content)
         
         # Verify all steps completed and content exists
-        if all(sequence_complete.values()) and current_chapter and chapter_content:
-            self._save_chapter(current_chapter, chapter_content)
+        # The caller knows the chapter number and saves the result itself
+        if all(sequence_complete.values()) and chapter_content:
             return True
             
         return False
@@ -118,32 +250,141 @@ class BookGenerator:
         if chapter_number == 1:
             return f"Initial Chapter\nRequirements:\n{prompt}"
             
-        context_parts = [
-            "Previous Chapter Summaries:",
-            *[f"Chapter {i+1}: {summary}" for i, summary in enumerate(self.chapters_memory)],
+        context_parts = [self.story_memory.render()]
+        # Only the characters and places this chapter's outline entry mentions
+        state = self.story_state.render_for(f"{self.outline[chapter_number - 1]['title']}\n{prompt}")
+        if state:
+            context_parts += ["\nStory State:", state]
+        passages = self._retrieve_passages(chapter_number, prompt)
+        if passages:
+            context_parts += ["\nRelevant Passages from Earlier Chapters:", passages]
+        if self.continuity_alerts:
+            context_parts += ["\nContinuity Alerts (do not repeat these mistakes):", *self.continuity_alerts[-5:]]
+        context_parts += [
             "\nCurrent Chapter Requirements:",
             prompt
         ]
         return "\n".join(context_parts)
 
-    def generate_chapter(self, chapter_number: int, prompt: str) -> None:
-        """Generate a single chapter with completion verification"""
-        print(f"\nGenerating Chapter {chapter_number}...")
-        
-        try:
-            # Create group chat with reduced rounds
-            groupchat = self.initiate_group_chat()
-            manager = autogen.GroupChatManager(
-                groupchat=groupchat,
-                llm_config=self.agent_config
-            )
+    def _retrieve_passages(self, chapter_number: int, prompt: str) -> str:
+        """Earlier passages that best match this chapter's key events, within ``retrieval_budget``"""
+        if not self.retrieved_passages or chapter_number <= 1:
+            return ""
+        earlier = range(1, chapter_number)
+        for number in earlier:
+            # Chapters finished before a resume were never saved by this generator
+            if number not in self.passage_index:
+                content = self.chapter_store.read(number)
+                if content is not None:
+                    self.passage_index.add_chapter(number, content.split("\n\n", 1)[-1])
 
-            # Prepare context
-            context = self._prepare_chapter_context(chapter_number, prompt)
-            chapter_prompt = f"""
+        events = _KEY_EVENTS.search(prompt)
+        query = f"{self.outline[chapter_number - 1]['title']}\n{events.group(1) if events else prompt}"
+        passages = self.passage_index.search(query, limit=self.retrieved_passages, chapters=earlier)
+        if not passages:
+            return ""
+        share = max(1, self.retrieval_budget // len(passages))
+        return "\n\n".join(
+            f"[Chapter {passage.chapter}] {truncate_to_tokens(passage.text, share)}"
+            for passage in sorted(passages, key=lambda p: (p.chapter, p.index))
+        )
+
+    def _remember(self, chapter_number: int, summary: str) -> None:
+        """Record a chapter summary in the raw and the bounded memory, and its facts in the story state"""
+        self.chapters_memory.append(summary)
+        self.story_memory.add(chapter_number, summary)
+        self.story_state.record_update(chapter_number, summary)
+
+    def _reset_memory(self) -> None:
+        self.chapters_memory = []
+        self.story_memory.clear()
+        self.story_state.clear()
+        self.continuity.clear()
+        self.continuity_alerts = []
+
+    def _restore_memory(self) -> None:
+        """Reset memory to the state journaled after the last completed chapter"""
+        self._reset_memory()
+        if self.journal is not None and self.journal.memory:
+            self.chapters_memory = list(self.journal.memory["chapters_memory"])
+            self.story_memory.load_dict(self.journal.memory["story_memory"])
+            self.story_state.load_dict(self.journal.memory.get("story_state", {}))
+            self.continuity.load_dict(self.journal.memory.get("continuity", {}))
+            self.continuity_alerts = list(self.journal.memory.get("continuity_alerts", []))
+
+    def _journal_chapter(self, chapter_number: int, status: str, with_memory: bool = False) -> None:
+        """Record a chapter's progress in the run journal, if there is one"""
+        if self.journal is None:
+            return
+        memory = None
+        if with_memory:
+            memory = {
+                "chapters_memory": list(self.chapters_memory),
+                "story_memory": self.story_memory.to_dict(),
+                "story_state": self.story_state.to_dict(),
+                "continuity": self.continuity.to_dict(),
+                "continuity_alerts": list(self.continuity_alerts),
+            }
+        self.journal.record_chapter(chapter_number, status, memory)
+
+    def _journaled_as(self, chapter_number: int, *statuses: str) -> bool:
+        """Whether the journal has the chapter in one of ``statuses`` and its file is still valid"""
+        if self.journal is None or self.journal.chapter_status(chapter_number) not in statuses:
+            return False
+        # Files may have been edited since the journaled run, so compare their hashes
+        return self._chapter_valid(chapter_number, check_hash=True)
+
+    def _chapter_valid(self, chapter_number: int, check_hash: bool = False) -> bool:
+        """Whether a chapter is saved and valid, from the manifest rather than by rereading it"""
+        if chapter_number in self.chapter_store:
+            return self.chapter_store.intact(chapter_number, check_hash=check_hash)
+        # Saved before chapters had a manifest
+        content = self.chapter_store.read(chapter_number)
+        return content is not None and self._verify_chapter_content(content, chapter_number)
+
+    def _summarize_memory(self, parts: List[str], max_tokens: int) -> str:
+        """Condense older memory entries with the memory keeper"""
+        entries = "\n\n".join(parts)
+        summary_prompt = f"""Condense these story memory entries into one summary of at most {max_tokens * 3 // 4} words.
+Keep plot events, character changes, world details and unresolved threads. Drop repetition.
+
+{entries}
+
+Respond with the summary only."""
+        with trace_labels(phase="memory"):
+            summary = ask_agent(self.agents["memory_keeper"], summary_prompt, cache=self.cache)
+        return summary.replace("MEMORY UPDATE:", "").strip()
+
+    def _prepare_draft_context(self, chapter_number: int, prompt: str) -> str:
+        """Prepare outline-only context for chapters drafted before their predecessors exist"""
+        if chapter_number == 1:
+            return f"Initial Chapter\nRequirements:\n{prompt}"
+
+        previous = self.outline[chapter_number - 2]
+        return "\n".join([
+            f"Previous Chapter Outline (Chapter {previous['chapter_number']}: {previous['title']}):",
+            previous['prompt'],
+            "\nCurrent Chapter Requirements:",
+            prompt
+        ])
+
+    def _build_chapter_prompt(self, chapter_number: int, prompt: str, context: str,
+                              remember: bool = True) -> str:
+        """Build the opening message for a chapter conversation"""
+        steps = ["Writer: Draft (CHAPTER)"]
+        if self._memory_keeper_turn(remember):
+            steps.insert(0, "Memory Keeper: Context (MEMORY UPDATE)")
+        if self.edit_mode == "patch":
+            steps.append(f"""Editor: Review (FEEDBACK) with anchored edits to the draft (EDITS)
+
+            {EDIT_FORMAT}""")
+        else:
+            steps += ["Editor: Review (FEEDBACK)", "Writer Final: Revision (CHAPTER FINAL)"]
+        steps = "\n            ".join(f"{number}. {step}" for number, step in enumerate(steps, 1))
+        return f"""
             IMPORTANT: Wait for confirmation before proceeding.
             IMPORTANT: This is Chapter {chapter_number}. Do not proceed to next chapter until explicitly instructed.
-            DO NOT END THE STORY HERE unless this is actually the final chapter ({self.outline[-1]['chapter_number']}).
+            DO NOT END THE STORY HERE unless this is actually the final chapter ({self.total_chapters}).
 
             Current Task: Generate Chapter {chapter_number} content only.
 
@@ -158,33 +399,226 @@ class BookGenerator:
 
             Follow this exact sequence for Chapter {chapter_number} only:
 
-            1. Memory Keeper: Context (MEMORY UPDATE)
-            2. Writer: Draft (CHAPTER)
-            3. Editor: Review (FEEDBACK)
-            4. Writer Final: Revision (CHAPTER FINAL)
+            {steps}
 
             Wait for each step to complete before proceeding."""
 
+    def _chapter_header(self, chapter_number: int) -> str:
+        title = self.outline[chapter_number - 1]['title']
+        header = f"Chapter {chapter_number} of {self.total_chapters}: {title}"
+        if self.context_mode == "window":
+            # System messages only carry a table of contents in window mode
+            header = f"{header}\n\n{format_outline_window(self.outline, chapter_number, self.outline_window)}"
+        return header
+
+    def _build_revision_prompt(self, chapter_number: int, prompt: str, draft: str, review: str) -> str:
+        """Ask the writer for the complete revised chapter"""
+        return f"""Revise {self._chapter_header(chapter_number)}
+
+Chapter Requirements:
+{prompt}
+
+Draft:
+{draft}
+
+Editor Review:
+{review}
+
+Respond with 'SCENE FINAL:' followed by the complete revised chapter, then end with '**Confirmation:** Chapter {chapter_number} completed successfully.'"""
+
+    def _chapter_steps(self, chapter_number: int, prompt: str, context: str,
+                       agents: Dict[str, autogen.ConversableAgent], remember: bool = True) -> List[PipelineStep]:
+        """Memory keeper, writer, editor and final revision, each sent only what it builds on"""
+        header = self._chapter_header(chapter_number)
+
+        def draft_scene(outputs: Dict[str, str]) -> str:
+            draft = outputs["writer"]
+            return draft.split("SCENE:", 1)[1].strip() if "SCENE:" in draft else draft
+
+        if self.edit_mode == "patch":
+            review_request = f"Give your review after 'FEEDBACK:', then your edits.\n\n{EDIT_FORMAT}"
+            draft_text = lambda outputs: number_paragraphs(draft_scene(outputs))
+        else:
+            review_request = "Give your review after 'FEEDBACK:'."
+            draft_text = draft_scene
+
+        def continuity_notes(outputs: Dict[str, str]) -> str:
+            if "memory_keeper" not in outputs:
+                return ""
+            return f"\n\nContinuity Notes:\n{outputs['memory_keeper']}"
+
+        steps = [
+            PipelineStep("memory_keeper", agents["memory_keeper"], lambda outputs: f"""{header}
+
+Chapter Requirements:
+{prompt}
+
+Previous Context for Reference:
+{context}
+
+Before this chapter is written, note the events, character states and settings it must stay consistent with.
+Start your response with 'MEMORY UPDATE:'."""),
+            PipelineStep("writer", agents["writer"], lambda outputs: f"""Write {header}
+
+Chapter Requirements:
+{prompt}
+
+Previous Context for Reference:
+{context}{continuity_notes(outputs)}
+
+Write Chapter {chapter_number} only. Respond with 'PLAN:', then 'SETTING:', then the complete chapter after 'SCENE:'."""),
+            PipelineStep("editor", agents["editor"], lambda outputs: f"""Review this draft of {header}
+
+Chapter Requirements:
+{prompt}
+
+Draft:
+{draft_text(outputs)}
+
+{review_request}"""),
+        ]
+        if not self._memory_keeper_turn(remember):
+            steps.pop(0)  # Checked locally once the chapter is saved, or in the continuity pass
+        if self.edit_mode == "rewrite":
+            steps.append(PipelineStep("writer_final", agents["writer"], lambda outputs: self._build_revision_prompt(
+                chapter_number, prompt, draft_scene(outputs), outputs["editor"])))
+        return steps
+
+    def _apply_editor_edits(self, chapter_number: int, prompt: str, messages: List[Dict],
+                            agents: Dict[str, autogen.ConversableAgent]) -> List[Dict]:
+        """Finish a patch-mode chapter by applying the editor's edits to the draft locally.
+
+        Falls back to a full rewrite by the writer when the edits are missing
+        or do not apply.
+        """
+        draft = review = None
+        for msg in reversed(messages):
+            content = msg.get("content") or ""
+            sender = self._get_sender(msg)
+            if review is None and sender == "editor":
+                review = content
+            elif draft is None and sender == "writer" and "SCENE:" in content:
+                draft = content.split("SCENE:", 1)[1].strip()
+        if draft is None or review is None:
+            return messages  # Incomplete conversation; verification reports it
+
+        try:
+            final = apply_edits(draft, parse_edits(review))
+            print(f"Applied the editor's edits to chapter {chapter_number}")
+            reply = f"SCENE FINAL:\n{final}\n\n**Confirmation:** Chapter {chapter_number} completed successfully."
+        except PatchError as e:
+            print(f"Editor edits for chapter {chapter_number} did not apply ({str(e)}); requesting a full revision")
+            with trace_labels(phase="chapter", chapter=chapter_number):
+                reply = ask_agent(agents["writer"], self._build_revision_prompt(chapter_number, prompt, draft, review),
+                                  cache=self.cache)
+        return messages + [{"role": "user", "name": "writer_final", "content": reply}]
+
+    def _complete_chapter(self, chapter_number: int, prompt: str, messages: List[Dict],
+                          agents: Dict[str, autogen.ConversableAgent], remember: bool = True) -> None:
+        """Apply the editor's edits in patch mode, then verify and save the chapter"""
+        if self.edit_mode == "patch":
+            messages = self._apply_editor_edits(chapter_number, prompt, messages, agents)
+        self._finalize_chapter(chapter_number, messages, remember)
+
+    async def _acomplete_chapter(self, chapter_number: int, prompt: str, messages: List[Dict],
+                                 agents: Dict[str, autogen.ConversableAgent], remember: bool = True) -> None:
+        """:meth:`_complete_chapter` on the default executor, as it may call the writer"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        await loop.run_in_executor(None, context.run, self._complete_chapter, chapter_number, prompt, messages,
+                                   agents, remember)
+
+    def _finalize_chapter(self, chapter_number: int, messages: List[Dict], remember: bool = True) -> None:
+        """Verify a finished chapter conversation and persist its results"""
+        if not self._verify_chapter_complete(messages, remember):
+            raise ValueError(f"Chapter {chapter_number} generation incomplete")
+    
+        self._process_chapter_results(chapter_number, messages, remember)
+        if chapter_number not in self.chapter_store:
+            raise FileNotFoundError(f"Chapter {chapter_number} file not created")
+
+    def generate_chapter(self, chapter_number: int, prompt: str,
+                         agents: Optional[Dict[str, autogen.ConversableAgent]] = None,
+                         context: Optional[str] = None, remember: bool = True) -> None:
+        """Generate a single chapter with completion verification.
+
+        With ``remember=False`` the chapter is only saved: the memory keeper
+        sits out and story memory is left untouched, as for parallel drafts.
+        """
+        print(f"\nGenerating Chapter {chapter_number}...")
+        agents = agents or self.agents
+        
+        try:
+            # Prepare context
+            if context is None:
+                context = self._prepare_chapter_context(chapter_number, prompt)
+
+            if self.execution_mode == "pipeline":
+                with trace_labels(phase="chapter", chapter=chapter_number):
+                    messages = run_pipeline(self._chapter_steps(chapter_number, prompt, context, agents, remember),
+                                            cache=self.cache)
+                self._complete_chapter(chapter_number, prompt, messages, agents, remember)
+                return
+
+            # Create group chat with reduced rounds
+            groupchat = self.initiate_group_chat(agents, chapter_number, remember)
+            manager = autogen.GroupChatManager(
+                groupchat=groupchat,
+                llm_config=self.agent_config
+            )
+
+            chapter_prompt = self._build_chapter_prompt(chapter_number, prompt, context, remember)
+
             # Start generation
-            self.agents["user_proxy"].initiate_chat(
+            agents["user_proxy"].initiate_chat(
                 manager,
-                message=chapter_prompt
+                message=chapter_prompt,
+                cache=self.cache
             )
 
-            if not self._verify_chapter_complete(groupchat.messages):
-                raise ValueError(f"Chapter {chapter_number} generation incomplete")
-        
-            self._process_chapter_results(chapter_number, groupchat.messages)
-            chapter_file = os.path.join(self.output_dir, f"chapter_{chapter_number:02d}.txt")
-            if not os.path.exists(chapter_file):
-                raise FileNotFoundError(f"Chapter {chapter_number} file not created")
-        
-            completion_msg = f"Chapter {chapter_number} is complete. Proceed with next chapter."
-            self.agents["user_proxy"].send(completion_msg, manager)
+            self._complete_chapter(chapter_number, prompt, groupchat.messages, agents, remember)
             
         except Exception as e:
             print(f"Error in chapter {chapter_number}: {str(e)}")
-            self._handle_chapter_generation_failure(chapter_number, prompt)
+            self._handle_chapter_generation_failure(chapter_number, prompt, agents, remember)
+
+    async def agenerate_chapter(self, chapter_number: int, prompt: str,
+                                agents: Optional[Dict[str, autogen.ConversableAgent]] = None,
+                                context: Optional[str] = None, remember: bool = True) -> None:
+        """Asynchronous variant of :meth:`generate_chapter`"""
+        print(f"\nGenerating Chapter {chapter_number}...")
+        agents = agents or self.agents
+
+        try:
+            if context is None:
+                context = self._prepare_chapter_context(chapter_number, prompt)
+
+            if self.execution_mode == "pipeline":
+                with trace_labels(phase="chapter", chapter=chapter_number):
+                    messages = await arun_pipeline(self._chapter_steps(chapter_number, prompt, context, agents, remember),
+                                                   cache=self.cache)
+                await self._acomplete_chapter(chapter_number, prompt, messages, agents, remember)
+                return
+
+            groupchat = self.initiate_group_chat(agents, chapter_number, remember)
+            manager = autogen.GroupChatManager(
+                groupchat=groupchat,
+                llm_config=self.agent_config
+            )
+
+            chapter_prompt = self._build_chapter_prompt(chapter_number, prompt, context, remember)
+
+            await agents["user_proxy"].a_initiate_chat(
+                manager,
+                message=chapter_prompt,
+                cache=self.cache
+            )
+
+            await self._acomplete_chapter(chapter_number, prompt, groupchat.messages, agents, remember)
+
+        except Exception as e:
+            print(f"Error in chapter {chapter_number}: {str(e)}")
+            await self._ahandle_chapter_generation_failure(chapter_number, prompt, agents, remember)
 
     def _extract_final_scene(self, messages: List[Dict]) -> Optional[str]:
         """Extract chapter content with improved content detection"""
@@ -211,28 +645,24 @@ class BookGenerator:
                     
         return None
 
-    def _handle_chapter_generation_failure(self, chapter_number: int, prompt: str) -> None:
-        """Handle failed chapter generation with simplified retry"""
-        print(f"Attempting simplified retry for Chapter {chapter_number}...")
-        
-        try:
-            # Create a new group chat with just essential agents
-            retry_groupchat = autogen.GroupChat(
-                agents=[
-                    self.agents["user_proxy"],
-                    self.agents["story_planner"],
-                    self.agents["writer"]
-                ],
-                messages=[],
-                max_round=3
-            )
-            
-            manager = autogen.GroupChatManager(
-                groupchat=retry_groupchat,
-                llm_config=self.agent_config
-            )
+    def _create_retry_chat(self, agents: Dict[str, autogen.ConversableAgent],
+                           chapter_number: int) -> autogen.GroupChat:
+        """Create a group chat with just the essential agents for a retry"""
+        chat_agents = [
+            agents["user_proxy"],
+            agents["story_planner"],
+            agents["writer"]
+        ]
+        label_agents(chat_agents, phase="retry", chapter=chapter_number)
+        return autogen.GroupChat(
+            agents=chat_agents,
+            messages=[],
+            max_round=3
+        )
 
-            retry_prompt = f"""Emergency chapter generation for Chapter {chapter_number}.
+    def _build_retry_prompt(self, chapter_number: int, prompt: str) -> str:
+        """Build the opening message for an emergency chapter retry"""
+        return f"""Emergency chapter generation for Chapter {chapter_number}.
             
 {prompt}
 
@@ -242,21 +672,70 @@ Please generate this chapter in two steps:
 
 Keep it simple and direct."""
 
-            self.agents["user_proxy"].initiate_chat(
+    def _handle_chapter_generation_failure(self, chapter_number: int, prompt: str,
+                                           agents: Optional[Dict[str, autogen.ConversableAgent]] = None,
+                                           remember: bool = True) -> None:
+        """Handle failed chapter generation with simplified retry"""
+        print(f"Attempting simplified retry for Chapter {chapter_number}...")
+        agents = agents or self.agents
+        
+        try:
+            retry_groupchat = self._create_retry_chat(agents, chapter_number)
+            manager = autogen.GroupChatManager(
+                groupchat=retry_groupchat,
+                llm_config=self.agent_config
+            )
+
+            agents["user_proxy"].initiate_chat(
                 manager,
-                message=retry_prompt
+                message=self._build_retry_prompt(chapter_number, prompt),
+                cache=self.cache
             )
             
             # Save the retry results
-            self._process_chapter_results(chapter_number, retry_groupchat.messages)
+            self._process_chapter_results(chapter_number, retry_groupchat.messages, remember)
             
         except Exception as e:
             print(f"Error in retry attempt for Chapter {chapter_number}: {str(e)}")
             print("Unable to generate chapter content after retry")
 
-    def _process_chapter_results(self, chapter_number: int, messages: List[Dict]) -> None:
-        """Process and save chapter results, updating memory"""
+    async def _ahandle_chapter_generation_failure(self, chapter_number: int, prompt: str,
+                                                  agents: Optional[Dict[str, autogen.ConversableAgent]] = None,
+                                                  remember: bool = True) -> None:
+        """Asynchronous variant of :meth:`_handle_chapter_generation_failure`"""
+        print(f"Attempting simplified retry for Chapter {chapter_number}...")
+        agents = agents or self.agents
+
+        try:
+            retry_groupchat = self._create_retry_chat(agents, chapter_number)
+            manager = autogen.GroupChatManager(
+                groupchat=retry_groupchat,
+                llm_config=self.agent_config
+            )
+
+            await agents["user_proxy"].a_initiate_chat(
+                manager,
+                message=self._build_retry_prompt(chapter_number, prompt),
+                cache=self.cache
+            )
+
+            # Saving may continue a short chapter and roll up memory, both LLM calls
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            await loop.run_in_executor(None, context.run, self._process_chapter_results, chapter_number,
+                                       retry_groupchat.messages, remember)
+
+        except Exception as e:
+            print(f"Error in retry attempt for Chapter {chapter_number}: {str(e)}")
+            print("Unable to generate chapter content after retry")
+
+    def _process_chapter_results(self, chapter_number: int, messages: List[Dict], remember: bool = True) -> None:
+        """Process and save chapter results, updating memory unless ``remember`` is False"""
         try:
+            if not remember:
+                self._save_chapter(chapter_number, messages)
+                return
+
             # Extract the Memory Keeper's final summary
             memory_updates = []
             for msg in reversed(messages):
@@ -266,17 +745,21 @@ Keep it simple and direct."""
                 if sender == "memory_keeper" and "MEMORY UPDATE:" in content:
                     update_start = content.find("MEMORY UPDATE:") + 14
                     memory_updates.append(content[update_start:].strip())
+                    self._add_continuity_alerts(chapter_number, _CONTINUITY_ALERT.findall(content))
                     break
             
             # Add to memory even if no explicit update (use basic content summary)
             if memory_updates:
-                self.chapters_memory.append(memory_updates[0])
+                self._remember(chapter_number, memory_updates[0])
             else:
                 # Create basic memory from chapter content
                 chapter_content = self._extract_final_scene(messages)
                 if chapter_content:
                     basic_summary = f"Chapter {chapter_number} Summary: {chapter_content[:200]}..."
-                    self.chapters_memory.append(basic_summary)
+                    if self.continuity_mode != "llm":
+                        # The facts the memory keeper would have noted, found locally
+                        basic_summary = "\n".join([basic_summary, *memory_update_lines(chapter_content)])
+                    self._remember(chapter_number, basic_summary)
             
             # Extract and save the chapter content
             self._save_chapter(chapter_number, messages)
@@ -293,73 +776,350 @@ Keep it simple and direct."""
                 raise ValueError(f"No content found for Chapter {chapter_number}")
                 
             chapter_content = self._clean_chapter_content(chapter_content)
-            
-            filename = os.path.join(self.output_dir, f"chapter_{chapter_number:02d}.txt")
-            
-            # Create backup if file exists
-            if os.path.exists(filename):
-                backup_filename = f"{filename}.backup"
-                import shutil
-                shutil.copy2(filename, backup_filename)
-                
-            with open(filename, "w", encoding='utf-8') as f:
-                f.write(f"Chapter {chapter_number}\n\n{chapter_content}")
-                
-            # Verify file
-            with open(filename, "r", encoding='utf-8') as f:
-                saved_content = f.read()
-                if len(saved_content.strip()) == 0:
-                    raise IOError(f"File {filename} is empty")
-                    
-            print(f"✓ Saved to: {filename}")
+            chapter_content = self._continue_short_chapter(chapter_number, chapter_content)
+            self._write_chapter(chapter_number, chapter_content)
             
         except Exception as e:
             print(f"Error saving chapter: {str(e)}")
             raise
 
-    def generate_book(self, outline: List[Dict]) -> None:
-        """Generate the book with strict chapter sequencing"""
+    def _build_continuation_prompt(self, chapter_number: int, tail: str, missing_words: int) -> str:
+        """Ask the writer to carry on from the chapter's closing paragraphs"""
+        chapter = self.outline[chapter_number - 1]
+        return f"""Continue Chapter {chapter_number} of {self.total_chapters}: {chapter['title']}
+
+Chapter Requirements:
+{chapter['prompt']}
+
+The chapter so far ends with:
+{tail}
+
+The chapter is about {missing_words} words short. Continue the story from exactly where it stops, covering the requirements not yet written.
+Do not repeat or summarize earlier text, and do not end the chapter early.
+Respond with 'CONTINUATION:' followed by the new text only."""
+
+    def _continue_short_chapter(self, chapter_number: int, content: str) -> str:
+        """Extend a chapter under ``target_words`` using only its outline entry and closing paragraphs"""
+        if not self.target_words or count_words(content) >= self.target_words:
+            return content
+
+        content = _CONFIRMATION.sub("", content)
+        for attempt in range(1, self.max_continuations + 1):
+            words = count_words(content)
+            if words >= self.target_words:
+                break
+            print(f"Chapter {chapter_number} has {words} of {self.target_words} words; "
+                  f"continuing (attempt {attempt} of {self.max_continuations})")
+            paragraphs = [p for p in content.split("\n\n") if p.strip()]
+            tail = paragraphs[-self.continuation_paragraphs:]
+            prompt = self._build_continuation_prompt(chapter_number, "\n\n".join(tail), self.target_words - words)
+            try:
+                with trace_labels(phase="continuation", chapter=chapter_number):
+                    reply = ask_agent(self.agents["writer"], prompt, cache=self.cache)
+            except Exception as e:
+                print(f"Error continuing chapter {chapter_number}: {str(e)}")
+                break
+
+            if "CONTINUATION:" in reply:
+                reply = reply.split("CONTINUATION:", 1)[1]
+            # Models often restate the text they were given before carrying on
+            seen = {p.strip() for p in tail}
+            added = [p for p in _CONFIRMATION.sub("", self._clean_chapter_content(reply)).split("\n\n")
+                     if p.strip() and p.strip() not in seen]
+            if not added:
+                break
+            content = "\n\n".join([content.rstrip()] + added)
+        return content
+
+    def _write_chapter(self, chapter_number: int, chapter_content: str) -> None:
+        """Validate chapter text in memory and save it atomically, keeping a backup of any previous version"""
+        text = f"Chapter {chapter_number}\n\n{chapter_content}"
+        valid = self._verify_chapter_content(text, chapter_number)
+        self.chapter_store.write(chapter_number, text, valid=valid)
+        self.passage_index.add_chapter(chapter_number, chapter_content)
+        print(f"✓ Saved to: {self.chapter_store.path(chapter_number)}")
+
+    def _previous_chapter_ready(self, chapter_number: int) -> bool:
+        """Verify the chapter before ``chapter_number`` exists and is valid"""
+        if chapter_number <= 1:
+            return True
+
+        if not self._chapter_valid(chapter_number - 1):
+            print(f"Previous chapter {chapter_number-1} missing or invalid. Stopping.")
+            return False
+        return True
+
+    def _chapter_ready(self, chapter_number: int) -> bool:
+        """Verify a just-generated chapter exists and is valid"""
+        if not self._chapter_valid(chapter_number):
+            print(f"Chapter {chapter_number} was not generated or its content is invalid")
+            return False
+        return True
+
+    def generate_book(self, outline: Union[List[Dict], OutlineStream]) -> None:
+        """Generate the book with strict chapter sequencing.
+
+        ``outline`` may be an :class:`OutlineStream`, in which case each
+        chapter starts as soon as its outline entry has arrived.
+        """
         print("\nStarting Book Generation...")
-        print(f"Total chapters: {len(outline)}")
-        
-        # Sort outline by chapter number
-        sorted_outline = sorted(outline, key=lambda x: x["chapter_number"])
+        print(f"Total chapters: {self.total_chapters}")
         
+        # Sort outline by chapter number; a stream already arrives in order
+        sorted_outline = ordered_chapters(outline)
+
+        if self.concurrency > 1:
+            self._generate_book_concurrently(sorted_outline)
+            return
+
+        self._restore_memory()
         for chapter in sorted_outline:
             chapter_number = chapter["chapter_number"]
+            if self._journaled_as(chapter_number, "complete"):
+                print(f"✓ Chapter {chapter_number} already complete")
+                continue
             
             # Verify previous chapter exists and is valid
-            if chapter_number > 1:
-                prev_file = os.path.join(self.output_dir, f"chapter_{chapter_number-1:02d}.txt")
-                if not os.path.exists(prev_file):
-                    print(f"Previous chapter {chapter_number-1} not found. Stopping.")
-                    break
-                    
-                # Verify previous chapter content
-                with open(prev_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if not self._verify_chapter_content(content, chapter_number-1):
-                        print(f"Previous chapter {chapter_number-1} content invalid. Stopping.")
-                        break
+            if not self._previous_chapter_ready(chapter_number):
+                break
             
             # Generate current chapter
             print(f"\n{'='*20} Chapter {chapter_number} {'='*20}")
             self.generate_chapter(chapter_number, chapter["prompt"])
             
             # Verify current chapter
-            chapter_file = os.path.join(self.output_dir, f"chapter_{chapter_number:02d}.txt")
-            if not os.path.exists(chapter_file):
-                print(f"Failed to generate chapter {chapter_number}")
+            if not self._chapter_ready(chapter_number):
+                self._journal_chapter(chapter_number, "failed")
                 break
-                
-            with open(chapter_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if not self._verify_chapter_content(content, chapter_number):
-                    print(f"Chapter {chapter_number} content invalid")
-                    break
-                    
+
+            self._check_continuity(chapter_number)
+            self._journal_chapter(chapter_number, "complete", with_memory=True)
             print(f"✓ Chapter {chapter_number} complete")
-            time.sleep(5)
+
+    async def agenerate_book(self, outline: Union[List[Dict], OutlineStream]) -> None:
+        """Asynchronous variant of :meth:`generate_book`"""
+        print("\nStarting Book Generation...")
+        print(f"Total chapters: {self.total_chapters}")
+
+        sorted_outline = aordered_chapters(outline)
+
+        if self.concurrency > 1:
+            await self._agenerate_book_concurrently(sorted_outline)
+            return
+
+        self._restore_memory()
+        async for chapter in sorted_outline:
+            chapter_number = chapter["chapter_number"]
+            if self._journaled_as(chapter_number, "complete"):
+                print(f"✓ Chapter {chapter_number} already complete")
+                continue
+            if not self._previous_chapter_ready(chapter_number):
+                break
+
+            print(f"\n{'='*20} Chapter {chapter_number} {'='*20}")
+            await self.agenerate_chapter(chapter_number, chapter["prompt"])
+
+            if not self._chapter_ready(chapter_number):
+                self._journal_chapter(chapter_number, "failed")
+                break
+
+            await self._acheck_continuity(chapter_number)
+            self._journal_chapter(chapter_number, "complete", with_memory=True)
+            print(f"✓ Chapter {chapter_number} complete")
+
+    def _generate_book_concurrently(self, sorted_outline: Iterable[Dict]) -> None:
+        """Draft chapters in parallel from the outline, then run a sequential continuity pass"""
+        print(f"Drafting chapters with concurrency {self.concurrency}")
+        chapters = []
+
+        def draft(chapter: Dict) -> int:
+            chapter_number = chapter["chapter_number"]
+            context = self._prepare_draft_context(chapter_number, chapter["prompt"])
+            # Memory is built in chapter order by the continuity pass, not by the drafts
+            self.generate_chapter(chapter_number, chapter["prompt"],
+                                  agents=self._clone_agents(), context=context, remember=False)
+            if self._chapter_ready(chapter_number):
+                self._journal_chapter(chapter_number, "drafted")
+            return chapter_number
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = []
+            # Submitted as they arrive, so a streamed outline is drafted while it grows
+            for chapter in sorted_outline:
+                chapters.append(chapter)
+                if not self._journaled_as(chapter["chapter_number"], "drafted", "complete"):
+                    futures.append(executor.submit(draft, chapter))
+            for future in as_completed(futures):
+                try:
+                    print(f"✓ Chapter {future.result()} drafted")
+                except Exception as e:
+                    print(f"Error drafting chapter: {str(e)}")
+
+        # Drafts were written without knowledge of each other, so build memory in order
+        self._restore_memory()
+        for chapter in chapters:
+            if not self._journaled_as(chapter["chapter_number"], "complete"):
+                self._reconcile_chapter(chapter)
+
+    async def _agenerate_book_concurrently(self, sorted_outline: AsyncIterator[Dict]) -> None:
+        """Asynchronous variant of :meth:`_generate_book_concurrently` bounded by a semaphore"""
+        print(f"Drafting chapters with concurrency {self.concurrency}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chapters = []
+
+        async def draft(chapter: Dict) -> None:
+            chapter_number = chapter["chapter_number"]
+            async with semaphore:
+                context = self._prepare_draft_context(chapter_number, chapter["prompt"])
+                await self.agenerate_chapter(chapter_number, chapter["prompt"],
+                                             agents=self._clone_agents(), context=context, remember=False)
+            if self._chapter_ready(chapter_number):
+                self._journal_chapter(chapter_number, "drafted")
+            print(f"✓ Chapter {chapter_number} drafted")
+
+        tasks = []
+        async for chapter in sorted_outline:
+            chapters.append(chapter)
+            if not self._journaled_as(chapter["chapter_number"], "drafted", "complete"):
+                tasks.append(asyncio.ensure_future(draft(chapter)))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result  # Cancellation or interrupt: stop before the continuity pass
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error drafting chapter: {str(result)}")
+
+        self._restore_memory()
+        loop = asyncio.get_running_loop()
+        for chapter in chapters:
+            if self._journaled_as(chapter["chapter_number"], "complete"):
+                continue
+            # run_in_executor does not carry context variables over on its own
+            context = contextvars.copy_context()
+            await loop.run_in_executor(None, context.run, self._reconcile_chapter, chapter)
+
+    def _reconcile_chapter(self, chapter: Dict) -> None:
+        """Summarize a drafted chapter into memory and smooth its opening transition"""
+        chapter_number = chapter["chapter_number"]
+        content = self.chapter_store.read(chapter_number)
+        if content is None:
+            print(f"Chapter {chapter_number} was not drafted; skipping continuity pass")
+            return
+        if not self._chapter_valid(chapter_number):
+            print(f"Chapter {chapter_number} content invalid; skipping continuity pass")
+            return
+
+        self._check_continuity(chapter_number)
+        body = content.split("\n\n", 1)[1] if "\n\n" in content else content
+        paragraphs = [p for p in body.split("\n\n") if p.strip()]
+        previous_ending = ""
+        if chapter_number > 1:
+            previous = self.chapter_store.read(chapter_number - 1)
+            if previous is not None:
+                prev_paragraphs = [p for p in previous.split("\n\n") if p.strip()]
+                previous_ending = "\n\n".join(prev_paragraphs[-2:])
+
+        summaries = self.story_memory.render()
+        opening = "\n\n".join(paragraphs[:2])
+        closing = "\n\n".join(paragraphs[-2:])
+        continuity_prompt = f"""Chapter {chapter_number} ({chapter['title']}) was drafted in parallel with its neighbours.
+
+{summaries or "Previous Chapter Summaries: None"}
+
+Chapter Outline:
+{chapter['prompt']}
+
+Ending of the previous chapter:
+{previous_ending or "None - this is the first chapter"}
+
+Opening of this chapter:
+{opening}
+
+Closing of this chapter:
+{closing}
+
+1. Summarize this chapter for the story memory, starting with 'MEMORY UPDATE:'.
+2. If the opening does not follow naturally from the previous chapter's ending, rewrite ONLY the first paragraph after 'TRANSITION:'. Otherwise write 'TRANSITION: NONE'."""
+
+        try:
+            with trace_labels(phase="continuity", chapter=chapter_number):
+                reply = ask_agent(self.agents["memory_keeper"], continuity_prompt, cache=self.cache)
+        except Exception as e:
+            print(f"Error in continuity pass for chapter {chapter_number}: {str(e)}")
+            self._remember(chapter_number, f"Chapter {chapter_number} Summary: {body[:200]}...")
+            self._journal_chapter(chapter_number, "complete", with_memory=True)
+            return
+
+        memory_part, _, transition = reply.partition("TRANSITION:")
+        if "MEMORY UPDATE:" in memory_part:
+            memory_part = memory_part.split("MEMORY UPDATE:", 1)[1]
+        self._remember(chapter_number, memory_part.strip() or f"Chapter {chapter_number} Summary: {body[:200]}...")
+
+        # The new paragraph ends at the first blank line; anything after it is commentary
+        transition = _BLANK_LINE.split(transition.strip(), 1)[0].strip()
+        # "NONE", "**None.**" or "None - the opening already follows on"
+        keep_opening = transition.split("\n", 1)[0].strip(string.punctuation + string.whitespace).upper()
+        if chapter_number > 1 and paragraphs and transition and not keep_opening.startswith("NONE"):
+            paragraphs[0] = self._clean_chapter_content(transition)
+            self._write_chapter(chapter_number, "\n\n".join(paragraphs))
+            print(f"✓ Smoothed transition into chapter {chapter_number}")
+        self._journal_chapter(chapter_number, "complete", with_memory=True)
+
+    def _add_continuity_alerts(self, chapter_number: int, alerts: Iterable[str]) -> None:
+        for alert in alerts:
+            alert = alert.strip(" *")
+            if not alert or alert.upper().rstrip(".") == "NONE":
+                continue
+            alert = f"Chapter {chapter_number}: {alert}"
+            print(f"CONTINUITY ALERT: {alert}")
+            self.continuity_alerts.append(alert)
+
+    def _check_continuity(self, chapter_number: int) -> None:
+        """Check a saved chapter against the earlier ones; chapters must be checked in order.
+
+        In hybrid mode only the ambiguous findings go to the memory keeper,
+        which keeps those it confirms; plain contradictions are always kept.
+        """
+        if self.continuity_mode == "llm":
+            return
+        body = self.chapter_store.read(chapter_number).split("\n\n", 1)[-1]
+        issues = self.continuity.analyze(chapter_number, body)
+        self._add_continuity_alerts(chapter_number, [issue.message for issue in issues if not issue.ambiguous])
+
+        ambiguous = [issue for issue in issues if issue.ambiguous]
+        if not ambiguous:
+            return
+        if self.continuity_mode == "local":
+            self._add_continuity_alerts(chapter_number, [f"{issue.message} (possibly intended)" for issue in ambiguous])
+            return
+        try:
+            with trace_labels(phase="continuity", chapter=chapter_number):
+                reply = ask_agent(self.agents["memory_keeper"],
+                                  self._build_continuity_prompt(chapter_number, ambiguous), cache=self.cache)
+        except Exception as e:
+            print(f"Error checking continuity of chapter {chapter_number}: {str(e)}")
+            return
+        self._add_continuity_alerts(chapter_number, _CONTINUITY_ALERT.findall(reply))
+
+    async def _acheck_continuity(self, chapter_number: int) -> None:
+        """:meth:`_check_continuity` on the default executor, as hybrid mode calls the memory keeper"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        await loop.run_in_executor(None, context.run, self._check_continuity, chapter_number)
+
+    def _build_continuity_prompt(self, chapter_number: int, issues: List[ContinuityIssue]) -> str:
+        """Ask the memory keeper which possible continuity errors are real"""
+        findings = "\n".join(
+            f"- {issue.message}" + (f'\n  Text: "{issue.evidence}"' if issue.evidence else "") for issue in issues
+        )
+        return f"""Chapter {chapter_number} of {self.total_chapters} may contradict earlier chapters:
+{findings}
+
+{self.story_memory.render() or "Previous Chapter Summaries: None"}
+
+For each finding that is a real continuity error rather than an intended change, write one line starting with 'CONTINUITY ALERT:'.
+Write 'CONTINUITY ALERT: NONE' if none of them are errors."""
 
     def _verify_chapter_content(self, content: str, chapter_number: int) -> bool:
         """Verify chapter content is valid"""
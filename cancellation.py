@@ -0,0 +1,36 @@
+"""Stop a generation run before its next LLM request once it has been cancelled."""
+import threading
+from typing import Any
+
+import autogen
+
+from agents import AgentHook
+
+
+class GenerationCancelled(BaseException):
+    """Raised in the thread making a request after the run's cancel event is set.
+
+    Like ``KeyboardInterrupt`` it derives from ``BaseException``, so the
+    per-chapter ``except Exception`` retries do not swallow it and the run
+    stops with its journal intact for a later resume.
+    """
+
+
+def cancel_hook(event: threading.Event) -> AgentHook:
+    """Agent hook that raises :class:`GenerationCancelled` instead of sending a request once ``event`` is set"""
+    def hook(agent: autogen.ConversableAgent) -> None:
+        client = getattr(agent, "client", None)
+        if client is None or getattr(client, "cancel_event", None) is event:
+            return
+
+        create = client.create
+
+        def cancellable_create(**config: Any) -> Any:
+            if event.is_set():
+                raise GenerationCancelled(f"Generation cancelled before {agent.name}'s request")
+            return create(**config)
+
+        client.create = cancellable_create
+        client.cancel_event = event
+
+    return hook
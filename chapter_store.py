@@ -0,0 +1,124 @@
+"""Atomic chapter files with a size and checksum manifest, so saved chapters never need rereading."""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+CHAPTER_MANIFEST_FILENAME = "chapter_manifest.json"
+
+
+def atomic_write_text(path: Union[str, Path], text: str) -> int:
+    """Write ``text`` to a temporary file, fsync it and rename it over ``path``; returns the bytes written.
+
+    A crash leaves either the previous or the new file on disk, never a
+    partial one.
+    """
+    path = Path(path)
+    data = text.encode("utf-8")
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class ChapterRecord(NamedTuple):
+    file: str  # Name within the output directory
+    bytes: int
+    sha256: str
+    valid: bool = True  # Whether the caller's validation accepted the text
+
+
+class ChapterStore:
+    """Chapter files in ``output_dir`` and a manifest of their sizes and hashes.
+
+    Each chapter is written once, atomically, and its text is kept in memory,
+    so callers validate content before saving and later checks compare file
+    sizes against the manifest instead of reading chapters back. The
+    previous version of a chapter is kept as ``<file>.backup``.
+    """
+
+    def __init__(self, output_dir: Union[str, Path]):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.output_dir / CHAPTER_MANIFEST_FILENAME
+        self.records: Dict[int, ChapterRecord] = {}
+        self._texts: Dict[int, str] = {}  # Full file text of chapters written or read by this store
+        self._lock = threading.Lock()
+        if self.manifest_path.exists():
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                chapters = json.load(f).get("chapters", {})
+            self.records = {int(number): ChapterRecord(**record) for number, record in chapters.items()}
+
+    def __contains__(self, chapter_number: int) -> bool:
+        return chapter_number in self.records
+
+    def path(self, chapter_number: int) -> Path:
+        return self.output_dir / f"chapter_{chapter_number:02d}.txt"
+
+    def write(self, chapter_number: int, text: str, valid: bool = True) -> ChapterRecord:
+        """Atomically replace a chapter's file with ``text`` and record it in the manifest"""
+        path = self.path(chapter_number)
+        if path.exists():
+            backup = path.with_name(f"{path.name}.backup")
+            try:
+                # A hard link keeps the old version without copying it
+                if backup.exists():
+                    backup.unlink()
+                os.link(path, backup)
+            except OSError:
+                shutil.copy2(path, backup)
+        size = atomic_write_text(path, text)
+        record = ChapterRecord(path.name, size, hashlib.sha256(text.encode("utf-8")).hexdigest(), valid)
+        with self._lock:
+            self.records[chapter_number] = record
+            self._texts[chapter_number] = text
+            self._save()
+        return record
+
+    def read(self, chapter_number: int) -> Optional[str]:
+        """Full text of a chapter, from memory when this store wrote it; None if it has no file"""
+        with self._lock:
+            text = self._texts.get(chapter_number)
+        if text is not None:
+            return text
+        path = self.path(chapter_number)
+        if not path.exists():
+            return None
+        text = path.read_bytes().decode("utf-8")  # No newline translation, so the hash matches
+        with self._lock:
+            self._texts[chapter_number] = text
+        return text
+
+    def intact(self, chapter_number: int, check_hash: bool = False) -> bool:
+        """Whether the chapter was valid when written and its file still matches its manifest record.
+
+        By default only the file size is compared, which costs a stat call;
+        ``check_hash`` also reads the file and compares its SHA-256.
+        """
+        record = self.records.get(chapter_number)
+        if record is None or not record.valid:
+            return False
+        path = self.output_dir / record.file
+        try:
+            if path.stat().st_size != record.bytes:
+                return False
+        except OSError:
+            return False
+        if check_hash:
+            with self._lock:
+                self._texts.pop(chapter_number, None)  # Changed on disk since it was cached, perhaps
+            text = self.read(chapter_number)
+            return hashlib.sha256(text.encode("utf-8")).hexdigest() == record.sha256
+        return True
+
+    def _save(self) -> None:
+        atomic_write_text(self.manifest_path, json.dumps(
+            {"chapters": {str(number): record._asdict() for number, record in sorted(self.records.items())}},
+            indent=2,
+        ))
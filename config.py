@@ -1,6 +1,6 @@
 """Configuration helpers for the book generation system."""
 import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pathlib import Path
 
@@ -34,6 +34,12 @@ def _build_local_config(url: str, model: Optional[str]) -> Dict:
     }
 
 
+def _split_urls(value: str) -> List[str]:
+    """Split a comma-separated list of endpoint URLs."""
+
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
 def _build_openrouter_config(model_override: Optional[str]) -> Dict:
     """Return a config entry configured for OpenRouter."""
 
@@ -78,9 +84,10 @@ def get_config(
     """Construct the shared AutoGen configuration.
 
     Args:
-        local_url: Explicit local endpoint URL. If ``None`` the value from the
-            ``LOCAL_LLM_URL`` environment variable or the default localhost
-            endpoint is used.
+        local_url: Explicit local endpoint URL, or several separated by
+            commas to spread requests over multiple servers. If ``None`` the
+            value from the ``LOCAL_LLM_URL`` environment variable or the
+            default localhost endpoint is used.
         use_openrouter: Force enabling or disabling OpenRouter. When ``None``
             the function automatically prefers OpenRouter if an API key is
             available and no explicit local URL was supplied.
@@ -97,7 +104,10 @@ def get_config(
     if use_openrouter:
         config_list = [_build_openrouter_config(model)]
     else:
-        config_list = [_build_local_config(resolved_local_url, model)]
+        config_list = [
+            _build_local_config(url, model)
+            for url in _split_urls(resolved_local_url) or [DEFAULT_LOCAL_URL]
+        ]
 
     return {
         "seed": 42,
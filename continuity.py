@@ -0,0 +1,266 @@
+"""Rule-based continuity checks over saved chapters, run locally instead of by an LLM."""
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+CONTINUITY_MODES = ("llm", "local", "hybrid")
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_MONTHS = {"january", "february", "march", "april", "may", "june", "july", "august", "september",
+           "october", "november", "december"}
+_NOT_NAMES = {
+    "i", "the", "a", "an", "he", "she", "it", "they", "we", "you", "his", "her", "their", "our", "my", "mr", "mrs",
+    "ms", "dr", "but", "and", "or", "then", "when", "if", "as", "at", "in", "on", "of", "to", "for", "with", "by",
+    "chapter", "scene", "god", "oh", "no", "yes", "okay", "ok",
+} | set(WEEKDAYS) | _MONTHS
+_COLOURS = ("black|white|grey|gray|brown|blue|green|hazel|amber|red|auburn|blond|blonde|silver|golden|"
+            "dark|pale|violet|ginger|chestnut")
+_NUMBER_WORDS = {
+    word: number for number, word in enumerate(
+        "one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen "
+        "seventeen eighteen nineteen".split(), 1)
+}
+_NUMBER_WORDS.update({"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+                      "eighty": 80, "ninety": 90})
+_SENTENCE = re.compile(r"[^.!?\n]+[.!?]?")
+_CAPITALIZED = re.compile(r"\b[A-Z][a-z]+(?:[ -][A-Z][a-z]+)?\b")
+_NAME = r"(?P<name>[A-Z][a-z]+(?: [A-Z][a-z]+)?)"
+_DAY = r"(?P<day>Mondays?|Tuesdays?|Wednesdays?|Thursdays?|Fridays?|Saturdays?|Sundays?)"
+_AGE = r"(?P<value>\d{1,3}|[a-z]+(?:-[a-z]+)?)"
+_RULES = [
+    # (attribute, pattern); each pattern captures the character as "name" and the attribute as "value"
+    ("eyes", re.compile(rf"{_NAME}'s (?:\w+ )?eyes (?:were|was|are|looked) (?P<value>{_COLOURS})\b")),
+    ("eyes", re.compile(rf"{_NAME} (?:had|has) (?P<value>{_COLOURS})(?:[- ]\w+)? eyes\b")),
+    ("hair", re.compile(rf"{_NAME}'s (?:\w+ )?hair (?:was|is) (?P<value>{_COLOURS})\b")),
+    ("hair", re.compile(rf"{_NAME} (?:had|has) (?:\w+ )?(?P<value>{_COLOURS}) hair\b")),
+    ("age", re.compile(rf"{_NAME} (?:was|is) {_AGE} years old")),
+    ("age", re.compile(rf"{_NAME} (?:had just turned|turned) {_AGE}\b")),
+    ("age", re.compile(rf"{_AGE}-year-old {_NAME}")),
+    ("home", re.compile(rf"{_NAME} (?:lives|lived) in (?P<value>[A-Z][\w' ]+?)(?=[,.;]| with| near| since)")),
+]
+_HABIT = re.compile(rf"{_NAME} (?:always |usually |only )?(?:wears|wore) (?P<value>[\w' -]+?) on {_DAY}")
+_WORE = re.compile(rf"{_NAME} (?:was wearing|wore|had on) (?P<value>[\w' -]+?)(?=[,.;]| and| as| to| that)")
+_DEATH = re.compile(rf"{_NAME} (?:died|was killed|was dead|had died|is dead|passed away)\b")
+_ACTIVE = re.compile(rf"{_NAME} (?:said|says|asked|asks|replied|replies|smiled|smiles|laughed|walked|walks|nodded|nods|shouted|whispered)\b")
+_TIME_MARKER = re.compile(r"\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.IGNORECASE)  # Not "Mondays"
+_TIME_SKIP = re.compile(r"\b(?:next|following|a|one|two|three|several|few) (?:week|month|year)s?\b|"
+                        r"\b(?:weeks|months|years|days) (?:later|after|passed)\b|\bflashback\b|\bremembered\b|"
+                        r"\byears ago\b", re.IGNORECASE)
+
+
+class ContinuityIssue(NamedTuple):
+    chapter: int
+    kind: str  # e.g. "eyes", "habit", "death", "timeline", "name"
+    message: str
+    ambiguous: bool  # True when a human or LLM should judge it; False for a plain contradiction
+    evidence: str = ""
+
+
+class ChapterFacts(NamedTuple):
+    """What one chapter states, independent of earlier chapters"""
+    attributes: List[Tuple[str, str, str, str]]  # (name, attribute, value, sentence)
+    habits: List[Tuple[str, str, str, str]]  # (name, weekday, clothing, sentence)
+    worn: List[Tuple[str, str, str]]  # (name, clothing, sentence)
+    deaths: List[Tuple[str, str]]
+    active: List[Tuple[str, str]]
+    names: Set[str]
+    days: List[str]  # Weekdays mentioned as time markers, in order
+    time_skip: bool
+
+
+def _age(value: str) -> Optional[int]:
+    if value.isdigit():
+        return int(value)
+    parts = value.lower().split("-")
+    if not all(part in _NUMBER_WORDS for part in parts):
+        return None
+    return sum(_NUMBER_WORDS[part] for part in parts)
+
+
+def _is_name(name: str) -> bool:
+    return name.split()[0].lower() not in _NOT_NAMES
+
+
+def _near(a: str, b: str) -> bool:
+    """Whether ``a`` and ``b`` differ by exactly one edit"""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = j = edits = 0
+    while i < len(a) and j < len(b):
+        if a[i] != b[j]:
+            edits += 1
+            if edits > 1:
+                return False
+            if len(a) == len(b):
+                i += 1
+            j += 1
+            continue
+        i += 1
+        j += 1
+    return edits + (len(b) - j) + (len(a) - i) == 1
+
+
+def _resolve(name: str, names: Set[str]) -> str:
+    """Drop a sentence-opening word the name pattern swept up, as in "Later Dane" """
+    if " " in name and name not in names:
+        first, rest = name.split(" ", 1)
+        if first not in names:
+            return rest
+    return name
+
+
+def extract_facts(text: str) -> ChapterFacts:
+    """Names, character attributes, habits and time markers a chapter states"""
+    sentences = [match.group(0).strip() for match in _SENTENCE.finditer(text)]
+    sentences = [sentence for sentence in sentences if sentence]
+    names: Set[str] = set()
+    for sentence in sentences:
+        # Words capitalized mid-sentence are names; the first word may just start the sentence
+        for candidate in _CAPITALIZED.finditer(sentence, 1):
+            opening = not sentence[:candidate.start()].strip(" \"'“‘(*-—")  # e.g. the first word of a quote
+            if not opening and _is_name(candidate.group(0)):
+                names.add(candidate.group(0))
+                names.update(candidate.group(0).split(" "))
+
+    def found_names(pattern: re.Pattern, sentence: str):
+        for found in pattern.finditer(sentence):
+            name = _resolve(found.group("name"), names)
+            if _is_name(name):
+                yield name, found
+
+    attributes, habits, worn, deaths, active = [], [], [], [], []
+    for sentence in sentences:
+        for attribute, pattern in _RULES:
+            for name, found in found_names(pattern, sentence):
+                value = found.group("value").strip()
+                if attribute != "home":  # Place names keep their capitals
+                    value = value.lower()
+                if attribute == "age" and _age(value) is None:
+                    continue
+                attributes.append((name, attribute, value, sentence))
+        for name, found in found_names(_HABIT, sentence):
+            day = found.group("day").lower().rstrip("s")
+            habits.append((name, day, found.group("value").lower().strip(), sentence))
+        if not _HABIT.search(sentence):
+            worn += [(name, found.group("value").lower().strip(), sentence) for name, found in found_names(_WORE, sentence)]
+        deaths += [(name, sentence) for name, _ in found_names(_DEATH, sentence)]
+        active += [(name, sentence) for name, _ in found_names(_ACTIVE, sentence)]
+    days = [match.group(1).lower() for match in _TIME_MARKER.finditer(text)]
+    return ChapterFacts(attributes, habits, worn, deaths, active, names, days, bool(_TIME_SKIP.search(text)))
+
+
+class ContinuityChecker:
+    """Facts established so far in the book, checked against each new chapter.
+
+    Chapters must be analysed in order. Plain contradictions (a character's
+    eye colour changing, a dead character speaking) are reported as such;
+    findings that may be intended (an age or home changing, a habit broken,
+    days running backwards, a name one letter off a known one) are marked
+    ambiguous.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.attributes: Dict[str, Dict[str, Tuple[str, int]]] = {}  # name -> attribute -> (value, chapter)
+        self.habits: Dict[str, Dict[str, Tuple[str, int]]] = {}  # name -> weekday -> (clothing, chapter)
+        self.deaths: Dict[str, int] = {}
+        self.names: Dict[str, int] = {}  # Name -> chapter it first appeared in
+        self.last_day: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "attributes": {name: {key: list(value) for key, value in attrs.items()} for name, attrs in self.attributes.items()},
+            "habits": {name: {day: list(value) for day, value in days.items()} for name, days in self.habits.items()},
+            "deaths": dict(self.deaths),
+            "names": dict(self.names),
+            "last_day": self.last_day,
+        }
+
+    def load_dict(self, state: Dict) -> None:
+        self.clear()
+        self.attributes = {name: {key: tuple(value) for key, value in attrs.items()}
+                           for name, attrs in state.get("attributes", {}).items()}
+        self.habits = {name: {day: tuple(value) for day, value in days.items()}
+                       for name, days in state.get("habits", {}).items()}
+        self.deaths = dict(state.get("deaths", {}))
+        self.names = dict(state.get("names", {}))
+        self.last_day = state.get("last_day")
+
+    def analyze(self, chapter: int, text: str) -> List[ContinuityIssue]:
+        """Check a chapter against everything established before it, then record what it establishes"""
+        facts = extract_facts(text)
+        issues: List[ContinuityIssue] = []
+
+        for name, attribute, value, sentence in facts.attributes:
+            known = self.attributes.get(name, {}).get(attribute)
+            if known is None or known[0] == value:
+                continue
+            if attribute == "eyes":
+                issues.append(ContinuityIssue(chapter, attribute, f"{name}'s eyes are {value} here but "
+                                              f"{known[0]} in chapter {known[1]}", False, sentence))
+            elif attribute == "hair" and "dyed" not in text:
+                issues.append(ContinuityIssue(chapter, attribute, f"{name}'s hair is {value} here but "
+                                              f"{known[0]} in chapter {known[1]}", True, sentence))
+            elif attribute == "age":
+                younger = (_age(value) or 0) < (_age(known[0]) or 0)
+                issues.append(ContinuityIssue(chapter, attribute, f"{name} is {value} here but {known[0]} in "
+                                              f"chapter {known[1]}", not younger, sentence))
+            elif attribute == "home" and "moved" not in text:
+                issues.append(ContinuityIssue(chapter, attribute, f"{name} lives in {value} here but in {known[0]} "
+                                              f"in chapter {known[1]}", True, sentence))
+
+        for name, day, clothing, sentence in facts.habits:
+            known = self.habits.get(name, {}).get(day)
+            if known is not None and known[0] != clothing:
+                issues.append(ContinuityIssue(chapter, "habit", f"{name} wears {clothing} on {day.title()}s here but "
+                                              f"{known[0]} in chapter {known[1]}", False, sentence))
+        if facts.days:
+            scene_day = facts.days[0]
+            for name, clothing, sentence in facts.worn:
+                known = self.habits.get(name, {}).get(scene_day)
+                if known is not None and known[0] not in clothing and clothing not in known[0]:
+                    issues.append(ContinuityIssue(chapter, "habit", f"{name} wears {clothing} on a {scene_day.title()}, "
+                                                  f"but always wears {known[0]} then (chapter {known[1]})", True, sentence))
+
+        for name, sentence in facts.active:
+            if name in self.deaths:
+                issues.append(ContinuityIssue(chapter, "death", f"{name} acts here but died in chapter "
+                                              f"{self.deaths[name]}", facts.time_skip, sentence))
+
+        if facts.days and self.last_day and not facts.time_skip:
+            if WEEKDAYS.index(facts.days[0]) < WEEKDAYS.index(self.last_day):
+                issues.append(ContinuityIssue(chapter, "timeline", f"Chapter opens on {facts.days[0].title()} but "
+                                              f"the previous chapter reached {self.last_day.title()} with no time skip",
+                                              True))
+
+        for name in sorted(facts.names - set(self.names)):
+            similar = [known for known in self.names if len(known) >= 5 and _near(name, known)]
+            if similar:
+                issues.append(ContinuityIssue(chapter, "name", f"{name} may be a misspelling of {similar[0]}", True))
+
+        self._record(chapter, facts)
+        return issues
+
+    def _record(self, chapter: int, facts: ChapterFacts) -> None:
+        for name, attribute, value, _ in facts.attributes:
+            self.attributes.setdefault(name, {})[attribute] = (value, chapter)
+        for name, day, clothing, _ in facts.habits:
+            self.habits.setdefault(name, {}).setdefault(day, (clothing, chapter))
+        for name, _ in facts.deaths:
+            self.deaths.setdefault(name, chapter)
+        for name in facts.names:
+            self.names.setdefault(name, chapter)
+        if facts.days:
+            self.last_day = facts.days[-1]
+
+
+def memory_update_lines(text: str) -> List[str]:
+    """CHARACTER: lines for a chapter's stated attributes, in the memory keeper's format"""
+    facts = extract_facts(text)
+    lines = [f"CHARACTER: {name} - {attribute} {value}" for name, attribute, value, _ in facts.attributes]
+    lines += [f"CHARACTER: {name} - wears {clothing} on {day.title()}s" for name, day, clothing, _ in facts.habits]
+    lines += [f"EVENT: {name} dies" for name, _ in facts.deaths]
+    return list(dict.fromkeys(lines))
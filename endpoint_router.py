@@ -0,0 +1,180 @@
+"""Spread completions over several OpenAI-compatible endpoints."""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import autogen
+
+from rate_limiter import RateLimiter, TokenBucket
+
+
+class Endpoint:
+    """One backend with its own client and health state"""
+
+    def __init__(self, config: Dict, agent_config: Dict, bucket: Optional[TokenBucket] = None):
+        self.url = config.get("base_url", "")
+        self.client = autogen.OpenAIWrapper(**{**agent_config, "config_list": [config]})
+        self.bucket = bucket  # Rate limit of this endpoint and model, if any
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0  # Consecutive failures
+        self.total_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.latency_ewma: Optional[float] = None
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+
+class EndpointRouter:
+    """Routes each completion to the healthy endpoint with the fewest requests in flight.
+
+    An endpoint is ejected for ``eject_seconds`` after ``max_failures``
+    consecutive errors, or when its average latency exceeds ``slow_factor``
+    times that of the fastest endpoint. The ejection time doubles on each
+    repeat, up to ``max_eject_seconds``. Once it expires the endpoint gets
+    traffic again and a success clears its record. A failed request is
+    retried on another endpoint. With a ``rate_limiter`` each request waits
+    on the bucket of the endpoint it is sent to, so a 429 from one endpoint
+    only slows that one, and endpoints holding off are picked last. Build
+    routed agents from :attr:`agent_config`, which lists a single endpoint,
+    so each agent creates one client rather than one per endpoint.
+    """
+
+    def __init__(
+        self,
+        agent_config: Dict,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 300.0,
+        slow_factor: float = 4.0,
+        min_samples: int = 5,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.rate_limiter = rate_limiter
+        self.endpoints = [
+            Endpoint(config, agent_config, rate_limiter.endpoint_bucket(config) if rate_limiter else None)
+            for config in agent_config["config_list"]
+        ]
+        # Requests go through the endpoints' own clients; an agent only needs one to hook into
+        self.agent_config = {**agent_config, "config_list": agent_config["config_list"][:1]}
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.slow_factor = slow_factor
+        self.min_samples = min_samples
+        self._samples: Dict[str, int] = {endpoint.url: 0 for endpoint in self.endpoints}
+        self._lock = threading.Lock()
+        self._next = 0  # Rotates ties between equally loaded endpoints
+
+    def attach(self, agent: autogen.ConversableAgent) -> None:
+        """Agent hook that sends the agent's completions through the router.
+
+        Apply it before hooks that wrap ``client.create`` so they wrap the
+        routed call.
+        """
+        client = getattr(agent, "client", None)
+        if client is None or getattr(client, "endpoint_router", None) is self:
+            return
+        client.create = self.create
+        client.endpoint_router = self
+
+    def create(self, **config: Any) -> Any:
+        """Run one completion on the best endpoint, failing over to the others"""
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(tried)
+            tried.add(endpoint.url)
+            if endpoint.bucket is not None:
+                endpoint.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = endpoint.client.create(**config)
+            except Exception as e:
+                print(f"Endpoint {endpoint.url} failed: {str(e)}")
+                if endpoint.bucket is not None:
+                    self.rate_limiter.on_error(endpoint.bucket, e)
+                self._release(endpoint, time.perf_counter() - started, ok=False)
+                last_error = e
+                continue
+            if endpoint.bucket is not None:
+                endpoint.bucket.on_success()
+            self._release(endpoint, time.perf_counter() - started, ok=True)
+            return response
+        raise last_error
+
+    def _acquire(self, exclude: Set[str]) -> Endpoint:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude]
+            healthy = [endpoint for endpoint in candidates if not endpoint.ejected(now)]
+            if healthy:
+                count = len(healthy)
+                # Not rate limited, then least outstanding; rotate the starting point so ties spread evenly
+                order = healthy[self._next % count:] + healthy[:self._next % count]
+                self._next += 1
+                endpoint = min(order, key=lambda e: (e.bucket is not None and e.bucket.paused_until > now,
+                                                     e.outstanding))
+            else:
+                # Everything is ejected: use whichever comes back soonest rather than stall
+                endpoint = min(candidates, key=lambda e: e.ejected_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, latency: float, ok: bool) -> None:
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not ok:
+                endpoint.failures += 1
+                endpoint.total_failures += 1
+                if endpoint.failures >= self.max_failures:
+                    self._eject(endpoint, f"{endpoint.failures} consecutive failures")
+                return
+
+            endpoint.failures = 0
+            if endpoint.ejected_until and not endpoint.ejected(time.monotonic()):
+                endpoint.ejected_until = 0.0
+                endpoint.ejections = 0
+                print(f"Endpoint {endpoint.url} re-admitted")
+            endpoint.latency_ewma = latency if endpoint.latency_ewma is None else (
+                0.8 * endpoint.latency_ewma + 0.2 * latency
+            )
+            self._samples[endpoint.url] += 1
+            self._check_slow(endpoint)
+
+    def _check_slow(self, endpoint: Endpoint) -> None:
+        measured = [
+            e.latency_ewma for e in self.endpoints
+            if e.latency_ewma is not None and self._samples[e.url] >= self.min_samples
+        ]
+        if len(measured) < 2 or self._samples[endpoint.url] < self.min_samples:
+            return
+        if endpoint.latency_ewma > self.slow_factor * min(measured):
+            self._eject(endpoint, f"average latency {endpoint.latency_ewma:.1f}s")
+            # Start over once re-admitted so one slow spell is not held against it forever
+            endpoint.latency_ewma = None
+            self._samples[endpoint.url] = 0
+
+    def _eject(self, endpoint: Endpoint, reason: str) -> None:
+        duration = min(self.eject_seconds * (2 ** endpoint.ejections), self.max_eject_seconds)
+        endpoint.ejections += 1
+        endpoint.ejected_until = time.monotonic() + duration
+        print(f"Endpoint {endpoint.url} ejected for {duration:g}s ({reason})")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint request counts, failures and latency"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "url": endpoint.url,
+                    "requests": endpoint.requests,
+                    "failures": endpoint.total_failures,
+                    "ejected": endpoint.ejected(now),
+                    "latency_ewma_s": round(endpoint.latency_ewma, 3) if endpoint.latency_ewma is not None else None,
+                }
+                for endpoint in self.endpoints
+            ]
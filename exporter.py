@@ -0,0 +1,148 @@
+"""Assemble the saved chapters into one Markdown, HTML or EPUB manuscript, a chapter at a time."""
+import html
+import os
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, IO, Iterator, List, Optional, Tuple, Union
+
+EXPORT_FORMATS = ("markdown", "html", "epub")
+EXPORT_EXTENSIONS = {"markdown": ".md", "html": ".html", "epub": ".epub"}
+EXPORT_MIME_TYPES = {"markdown": "text/markdown", "html": "text/html", "epub": "application/epub+zip"}
+
+_CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+_XHTML_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="en" xml:lang="en">
+<head><meta charset="utf-8"/><title>{title}</title></head>
+<body>
+"""
+
+
+def _chapters(output_dir: Path, outline: List[Dict]) -> List[Tuple[int, str, Path]]:
+    """``(number, heading, file)`` for each outline chapter that has been saved, in order"""
+    chapters = []
+    for chapter in sorted(outline, key=lambda c: c["chapter_number"]):
+        number = chapter["chapter_number"]
+        path = output_dir / f"chapter_{number:02d}.txt"
+        if path.exists():
+            chapters.append((number, f"Chapter {number}: {chapter['title']}", path))
+    return chapters
+
+
+def _paragraphs(path: Path) -> Iterator[str]:
+    """Paragraphs of a chapter file without its "Chapter N" header, read line by line"""
+    current: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        header = f.readline()
+        if not header.strip().startswith("Chapter"):
+            current.append(header.strip())
+        for line in f:
+            line = line.strip()
+            if line:
+                current.append(line)
+            elif current:
+                yield " ".join(current)
+                current = []
+    if current:
+        yield " ".join(current)
+
+
+def _write_markdown(out: IO[str], title: str, chapters: List[Tuple[int, str, Path]]) -> None:
+    out.write(f"# {title}\n\n## Contents\n\n")
+    out.writelines(f"{index}. [{heading}](#chapter-{number})\n" for index, (number, heading, _) in enumerate(chapters, 1))
+    for number, heading, path in chapters:
+        out.write(f'\n<a id="chapter-{number}"></a>\n\n## {heading}\n\n')
+        for paragraph in _paragraphs(path):
+            out.write(f"{paragraph}\n\n")
+
+
+def _write_html(out: IO[str], title: str, chapters: List[Tuple[int, str, Path]]) -> None:
+    out.write(f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+              f"<title>{html.escape(title)}</title>\n</head>\n<body>\n<h1>{html.escape(title)}</h1>\n"
+              "<nav>\n<h2>Contents</h2>\n<ol>\n")
+    out.writelines(f'<li><a href="#chapter-{number}">{html.escape(heading)}</a></li>\n'
+                   for number, heading, _ in chapters)
+    out.write("</ol>\n</nav>\n")
+    for number, heading, path in chapters:
+        out.write(f'<section id="chapter-{number}">\n<h2>{html.escape(heading)}</h2>\n')
+        for paragraph in _paragraphs(path):
+            out.write(f"<p>{html.escape(paragraph)}</p>\n")
+        out.write("</section>\n")
+    out.write("</body>\n</html>\n")
+
+
+def _write_epub(archive: zipfile.ZipFile, title: str, chapters: List[Tuple[int, str, Path]]) -> None:
+    # The mimetype entry must come first and be stored uncompressed
+    archive.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+    archive.writestr("META-INF/container.xml", _CONTAINER_XML)
+
+    for number, heading, path in chapters:
+        with archive.open(f"OEBPS/chapter_{number:02d}.xhtml", "w") as entry:
+            entry.write(_XHTML_HEAD.format(title=html.escape(heading)).encode("utf-8"))
+            entry.write(f"<section epub:type=\"chapter\">\n<h2>{html.escape(heading)}</h2>\n".encode("utf-8"))
+            for paragraph in _paragraphs(path):
+                entry.write(f"<p>{html.escape(paragraph)}</p>\n".encode("utf-8"))
+            entry.write(b"</section>\n</body>\n</html>\n")
+
+    toc = "\n".join(f'<li><a href="chapter_{number:02d}.xhtml">{html.escape(heading)}</a></li>'
+                    for number, heading, _ in chapters)
+    archive.writestr("OEBPS/nav.xhtml", _XHTML_HEAD.format(title="Contents") + (
+        f'<nav epub:type="toc" id="toc">\n<h1>Contents</h1>\n<ol>\n{toc}\n</ol>\n</nav>\n</body>\n</html>\n'))
+
+    items = "\n".join(f'    <item id="chapter-{number}" href="chapter_{number:02d}.xhtml" '
+                      f'media-type="application/xhtml+xml"/>' for number, _, _ in chapters)
+    spine = "\n".join(f'    <itemref idref="chapter-{number}"/>' for number, _, _ in chapters)
+    modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    archive.writestr("OEBPS/content.opf", f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="book-id">urn:uuid:{uuid.uuid4()}</dc:identifier>
+    <dc:title>{html.escape(title)}</dc:title>
+    <dc:language>en</dc:language>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{items}
+  </manifest>
+  <spine>
+{spine}
+  </spine>
+</package>
+""")
+
+
+def export_book(output_dir: Union[str, Path], outline: List[Dict], fmt: str = "markdown",
+                title: str = "Untitled", path: Optional[Union[str, Path]] = None) -> Path:
+    """Write the saved chapters of ``outline`` as one ``fmt`` file with a table of contents.
+
+    Chapters are streamed from their files one paragraph at a time, so the
+    manuscript is never held in memory. The file goes to ``path``, or to
+    ``book.md``, ``book.html`` or ``book.epub`` in ``output_dir``, and is
+    renamed into place once complete. Chapters without a file are left out.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {EXPORT_FORMATS}")
+    output_dir = Path(output_dir)
+    path = Path(path) if path is not None else output_dir / f"book{EXPORT_EXTENSIONS[fmt]}"
+    chapters = _chapters(output_dir, outline)
+    if not chapters:
+        raise FileNotFoundError(f"No saved chapters to export in {output_dir}")
+
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    if fmt == "epub":
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            _write_epub(archive, title, chapters)
+    else:
+        with tmp_path.open("w", encoding="utf-8") as out:
+            (_write_markdown if fmt == "markdown" else _write_html)(out, title, chapters)
+    os.replace(tmp_path, path)
+    return path
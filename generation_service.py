@@ -1,32 +1,40 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 
-from agents import BookAgents
+from agents import AgentHook, BookAgents
 from book_generator import BookGenerator
+from cancellation import cancel_hook
 from config import get_config
+from endpoint_router import EndpointRouter
+from exporter import EXPORT_FORMATS, export_book
+from llm_cache import ResponseCache, cache_namespace, open_response_cache
 from outline_generator import OutlineGenerator
+from outline_parser import IncrementalOutlineParser
+from outline_stream import OutlineStream
+from rate_limiter import shared_rate_limiter
+from run_journal import JOURNAL_FILENAME, RunJournal
+from story_state import STORY_STATE_FILENAME, StoryState
+from streaming import StreamCallback, stream_agents
+from telemetry import LLMTracer, open_tracer
 
 ProgressCallback = Callable[[str], None]
+AsyncProgressCallback = Callable[[str], Union[None, Awaitable[None]]]
 
 
-def run_generation(
+def _prepare_config(
     initial_prompt: str,
     num_chapters: int,
-    local_url: Optional[str] = None,
-    *,
-    use_openrouter: Optional[bool] = None,
-    model: Optional[str] = None,
-    save_outline: bool = True,
-    generate_book: bool = True,
-    progress_callback: Optional[ProgressCallback] = None,
+    local_url: Optional[str],
+    use_openrouter: Optional[bool],
+    model: Optional[str],
+    concurrency: int,
 ) -> Dict[str, Any]:
-    """Run the complete generation workflow with optional callbacks."""
-
-    def notify(message: str) -> None:
-        if progress_callback:
-            progress_callback(message)
-        else:
-            print(message)
+    """Validate a generation request and build its agent configuration."""
 
     if not initial_prompt.strip():
         raise ValueError("Initial prompt cannot be empty.")
@@ -34,62 +42,668 @@ def run_generation(
     if num_chapters <= 0:
         raise ValueError("Number of chapters must be positive.")
 
+    if concurrency <= 0:
+        raise ValueError("Concurrency must be positive.")
+
     cleaned_url: Optional[str]
     if isinstance(local_url, str):
         cleaned_url = local_url.strip() or None
     else:
         cleaned_url = local_url
 
-    notify("Preparing configuration...")
-    agent_config = get_config(
+    return get_config(
         local_url=cleaned_url,
         use_openrouter=use_openrouter,
         model=model,
     )
 
-    notify("Creating agent team...")
-    outline_agents = BookAgents(agent_config)
-    agents = outline_agents.create_agents(initial_prompt, num_chapters)
 
-    notify("Generating outline...")
-    outline_gen = OutlineGenerator(agents, agent_config)
-    outline = outline_gen.generate_outline(initial_prompt, num_chapters)
+def _save_outline(outline: List[Dict[str, Any]], output_dir: Path) -> Path:
+    """Write the human-readable outline next to the chapters."""
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outline_path = output_dir / "outline.txt"
+    with outline_path.open("w", encoding="utf-8") as file:
+        for chapter in outline:
+            file.write(f"Chapter {chapter['chapter_number']}: {chapter['title']}\n")
+            file.write("-" * 50 + "\n")
+            file.write(chapter["prompt"] + "\n\n")
+    return outline_path
+
+
+def _open_journal(
+    output_dir: Path,
+    request: Dict[str, Any],
+    agent_config: Dict[str, Any],
+    resume: bool,
+) -> RunJournal:
+    """Start a new run journal, or load and check the existing one when resuming."""
+
+    journal_path = output_dir / JOURNAL_FILENAME
+    config_hash = cache_namespace(agent_config)
+    if resume:
+        journal = RunJournal.load(journal_path)
+        journal.check_compatible(request, config_hash)
+        return journal
+    return RunJournal.create(journal_path, request, config_hash)
+
+
+def _build_agent_hooks(
+    router: Optional[EndpointRouter],
+    tracer: Optional[LLMTracer],
+    stream_callback: Optional[StreamCallback],
+    cancel_event: Optional[threading.Event] = None,
+) -> List[AgentHook]:
+    """Agent hooks in wrapping order: each wraps the request made by the ones before it."""
+
+    hooks: List[AgentHook] = []
+    if router is not None:
+        hooks.append(router.attach)  # Replaces the request itself, so it goes innermost
+    if tracer is not None:
+        hooks.append(tracer.instrument)  # Inside the limiter so each retry is traced
+    hooks.append(shared_rate_limiter().attach)  # Only retries routed requests; the router limits each endpoint
+    if stream_callback:
+        hooks.append(stream_agents(stream_callback))
+    if cancel_event is not None:
+        hooks.append(cancel_hook(cancel_event))  # Outermost, so nothing waits or retries once cancelled
+    return hooks
+
+
+class _GenerationRun:
+    """The configuration, journal, cache, tracer and endpoint router of one generation run.
+
+    :func:`run_generation` and :func:`arun_generation` build it from their
+    keyword arguments, so both set a run up the same way. Keywords not named
+    here are book options: they are journaled with the request and passed to
+    :class:`BookGenerator`. Progress messages are collected in ``notes`` for
+    the caller to report.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_prompt: str,
+        num_chapters: int,
+        local_url: Optional[str],
+        use_openrouter: Optional[bool],
+        model: Optional[str],
+        save_outline: bool,
+        generate_book: bool,
+        stream_callback: Optional[StreamCallback],
+        use_cache: bool,
+        cache_path: Optional[str],
+        cache_max_bytes: Optional[int],
+        trace: bool,
+        resume: bool,
+        output_dir: Union[str, Path],
+        stream_outline: bool,
+        cancel_event: Optional[threading.Event],
+        **book_options: Any,
+    ):
+        self.initial_prompt = initial_prompt
+        self.num_chapters = num_chapters
+        self.save_outline = save_outline
+        self.generate_book = generate_book
+        self.stream_outline = stream_outline
+        self.book_options = book_options
+        self.output_dir = Path(output_dir)
+        self.notes: List[str] = []
+
+        config = _prepare_config(
+            initial_prompt, num_chapters, local_url, use_openrouter, model, book_options["concurrency"]
+        )
+        request = {
+            "initial_prompt": initial_prompt,
+            "num_chapters": num_chapters,
+            "local_url": local_url,
+            "use_openrouter": use_openrouter,
+            "model": model,
+            "stream_outline": stream_outline,
+            **book_options,
+        }
+        self.journal = _open_journal(self.output_dir, request, config, resume)
+        if resume:
+            self.notes.append(f"Resuming run journaled at {self.journal.path}.")
+
+        self.cache: Optional[ResponseCache] = None
+        self.cache_stats: Optional[Dict[str, Any]] = None
+        if use_cache:
+            self.cache = open_response_cache(config, path=cache_path, max_bytes=cache_max_bytes)
+            self.notes.append(f"Using response cache at {self.cache.path}.")
+
+        self.tracer: Optional[LLMTracer] = open_tracer(self.output_dir) if trace else None
+        self.router = (EndpointRouter(config, rate_limiter=shared_rate_limiter())
+                       if len(config["config_list"]) > 1 else None)
+        self.agent_hooks = _build_agent_hooks(self.router, self.tracer, stream_callback, cancel_event)
+        # Routed agents only need one endpoint's client; requests go through the router's
+        self.agent_config = self.router.agent_config if self.router is not None else config
+
+    def take_notes(self) -> List[str]:
+        notes, self.notes = self.notes, []
+        return notes
+
+    def close(self) -> None:
+        """Close the response cache and the tracer"""
+        if self.cache is not None:
+            self.cache_stats = self.cache.stats()
+            self.notes.append(f"Response cache: {self.cache_stats['hits']} hits, {self.cache_stats['misses']} misses.")
+            self.cache.close()
+        if self.tracer is not None:
+            self.tracer.close()
+
+    def finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the cache, telemetry and endpoint statistics to a pipeline result"""
+        if self.cache_stats is not None:
+            result["cache_stats"] = self.cache_stats
+        if self.tracer is not None:
+            result["telemetry"] = self.tracer.summary()
+            self.notes.append(_format_telemetry(result["telemetry"]))
+        if self.router is not None:
+            result["endpoints"] = self.router.stats()
+        return result
+
+    def outline_generator(self, stream: Optional[OutlineStream]) -> OutlineGenerator:
+        """Outline agents, streaming their outline into ``stream`` when given"""
+        outline_agents = BookAgents(self.agent_config, output_dir=str(self.output_dir))
+        agents = outline_agents.create_agents(self.initial_prompt, self.num_chapters)
+        outline_hooks = list(self.agent_hooks)
+        if stream is not None:
+            outline_hooks.append(_outline_stream_hook(stream))
+        return OutlineGenerator(agents, self.agent_config, cache=self.cache, agent_hooks=outline_hooks,
+                                execution_mode=self.book_options["execution_mode"])
+
+    def book_generator(self, book_outline: List[Dict[str, Any]], stream: Optional[OutlineStream],
+                       story_state: StoryState) -> BookGenerator:
+        """Chapter agents and their generator for ``book_outline``, which a streamed outline keeps extending"""
+        book_agents = BookAgents(self.agent_config, book_outline, context_mode=self.book_options["context_mode"],
+                                 output_dir=str(self.output_dir), edit_mode=self.book_options["edit_mode"],
+                                 story_state=story_state)
+        agents_with_context = book_agents.create_agents(self.initial_prompt, self.num_chapters)
+        if stream is not None:
+            # Entries that arrive later are added to the agents' system messages
+            stream.subscribe(lambda: book_agents.refresh_outline_context(agents_with_context))
+            book_agents.refresh_outline_context(agents_with_context)
+        return BookGenerator(
+            agents_with_context,
+            self.agent_config,
+            book_outline,
+            cache=self.cache,
+            agent_hooks=self.agent_hooks,
+            journal=self.journal,
+            output_dir=str(self.output_dir),
+            num_chapters=self.num_chapters if stream is not None else None,
+            story_state=story_state,
+            **self.book_options,
+        )
+
+    def result(self, outline: List[Dict[str, Any]], outline_path: Optional[Path],
+               book_gen: Optional[BookGenerator], story_state: Optional[StoryState]) -> Dict[str, Any]:
+        """What the pipeline returns, before :meth:`finish` adds the statistics"""
+        return {
+            "outline": outline,
+            "outline_path": str(outline_path) if outline_path else None,
+            "output_dir": str(self.output_dir),
+            "chapters": [str(path) for path in sorted(self.output_dir.glob("chapter_*.txt"))] if book_gen else [],
+            "context_savings": book_gen.context_savings if book_gen is not None else [],
+            "continuity_alerts": book_gen.continuity_alerts if book_gen is not None else [],
+            "story_state_path": str(story_state.path) if story_state is not None else None,
+            "journal_path": str(self.journal.path),
+        }
+
+
+def _outline_stream_hook(stream: OutlineStream) -> AgentHook:
+    """Agent hook that streams the outline_creator's reply and releases each parsed chapter to ``stream``."""
+
+    parser = IncrementalOutlineParser(on_chapter=stream.add)
+    return stream_agents(lambda chunk, info: parser.feed(chunk), agent_names=("outline_creator",))
+
+
+def _format_telemetry(telemetry: Dict[str, Any]) -> str:
+    """One-line summary of a run's LLM usage for progress output."""
+
+    totals = telemetry["totals"]
+    return (
+        f"LLM usage: {totals['calls']} calls ({totals['cached']} cached), {totals['prompt_tokens']} prompt + "
+        f"{totals['completion_tokens']} completion tokens, {totals['latency_s']:.1f}s in requests, "
+        f"${totals['cost']:.4f} estimated (trace: {telemetry['trace_path']})."
+    )
+
+
+def run_generation(
+    initial_prompt: str,
+    num_chapters: int,
+    local_url: Optional[str] = None,
+    *,
+    use_openrouter: Optional[bool] = None,
+    model: Optional[str] = None,
+    save_outline: bool = True,
+    generate_book: bool = True,
+    progress_callback: Optional[ProgressCallback] = None,
+    stream_callback: Optional[StreamCallback] = None,
+    use_cache: bool = False,
+    cache_path: Optional[str] = None,
+    cache_max_bytes: Optional[int] = None,
+    concurrency: int = 1,
+    context_mode: str = "full",
+    outline_window: int = 1,
+    execution_mode: str = "groupchat",
+    trace: bool = True,
+    resume: bool = False,
+    output_dir: Union[str, Path] = "book_output",
+    stream_outline: bool = False,
+    target_words: int = 5000,
+    edit_mode: str = "rewrite",
+    continuity_mode: str = "llm",
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """Run the complete generation workflow with optional callbacks.
+
+    When ``use_cache`` is set, completions are served from and stored in a
+    persistent on-disk cache (see :mod:`llm_cache`), so rerunning an
+    identical request does not hit the LLM again. ``concurrency`` above one
+    drafts that many chapters in parallel before a sequential continuity pass.
+    ``context_mode="window"`` gives chapter agents a table of contents plus
+    ``outline_window`` neighbouring chapters instead of the whole outline.
+    ``execution_mode="pipeline"`` calls the agents one after another with
+    only the inputs each step needs instead of a broadcasting group chat.
+    Everything is written to ``output_dir``, so concurrent runs need
+    separate directories. With ``trace`` enabled every completion is logged
+    to a JSONL file under ``<output_dir>/traces`` and summarized in the
+    result's ``telemetry`` key.
+    ``stream_callback(chunk, info)`` receives the writer's and editor's
+    replies token by token as they are generated; ``info`` names the agent,
+    phase and chapter. Progress is journaled to ``<output_dir>/run_journal.json``; ``resume``
+    continues that run instead of starting over (see :func:`resume_generation`).
+    ``stream_outline`` streams the outline and starts writing chapter 1 as soon
+    as its outline entry is complete, while later chapters are still outlined.
+    Chapters shorter than ``target_words`` are continued from their outline
+    entry and closing paragraphs; ``0`` turns that off. ``edit_mode="patch"``
+    has the editor return anchored edits that are applied locally instead of
+    the chapter being written out again in full. ``continuity_mode="local"``
+    replaces the memory keeper's turn in each chapter with rule-based checks
+    of the saved chapter; ``"hybrid"`` also asks the memory keeper about the
+    findings those checks cannot decide. Alerts are returned under
+    ``continuity_alerts``. Setting ``cancel_event`` from another thread stops
+    the run before its next LLM request by raising
+    :class:`~cancellation.GenerationCancelled`; the journal is left for a resume.
+    """
+
+    # Every other keyword configures the run; see _GenerationRun
+    arguments = {key: value for key, value in locals().items() if key != "progress_callback"}
+
+    def notify(message: str) -> None:
+        if progress_callback:
+            progress_callback(message)
+        else:
+            print(message)
+
+    notify("Preparing configuration...")
+    run = _GenerationRun(**arguments)
+    for message in run.take_notes():
+        notify(message)
+    try:
+        result = _run_pipeline(run, notify)
+    finally:
+        run.close()
+        for message in run.take_notes():
+            notify(message)
+
+    run.finish(result)
+    for message in run.take_notes():
+        notify(message)
+    return result
+
+
+def _record_outline(outline: List[Dict[str, Any]], journal: RunJournal) -> List[Dict[str, Any]]:
+    """Journal a freshly generated outline, refusing an empty one."""
 
     if not outline:
         raise RuntimeError("Failed to generate outline. No chapters were returned.")
+    journal.record_outline(outline)
+    return outline
+
+
+def _generate_streamed_outline(
+    outline_gen: OutlineGenerator,
+    stream: OutlineStream,
+    initial_prompt: str,
+    num_chapters: int,
+    journal: RunJournal,
+    notify: ProgressCallback,
+) -> List[Dict[str, Any]]:
+    """Generate the outline while its chapters are released to ``stream``, then settle it."""
 
+    try:
+        outline = _record_outline(outline_gen.generate_outline(initial_prompt, num_chapters), journal)
+    except BaseException as e:
+        # Including GenerationCancelled, or chapters would wait on the outline forever
+        stream.fail(e)
+        raise
+    stream.finish(outline)
     notify(f"Outline generated with {len(outline)} chapters.")
+    return outline
+
+
+def _run_pipeline(run: _GenerationRun, notify: ProgressCallback) -> Dict[str, Any]:
+    """Generate the outline and, optionally, every chapter.
+
+    With ``stream_outline`` the outline is generated on a worker thread and
+    chapters start as soon as their outline entries have been parsed.
+    """
+
+    outline = run.journal.outline
+    stream: Optional[OutlineStream] = None
+    executor: Optional[ThreadPoolExecutor] = None
+    if outline:
+        notify(f"Using the journaled outline with {len(outline)} chapters.")
+    else:
+        run.journal.reset_chapters()
+        notify("Creating agent team...")
+        if run.stream_outline and run.generate_book:
+            stream = OutlineStream(run.num_chapters)
+        outline_gen = run.outline_generator(stream)
+
+        notify("Generating outline...")
+        if stream is None:
+            outline = _record_outline(outline_gen.generate_outline(run.initial_prompt, run.num_chapters), run.journal)
+            notify(f"Outline generated with {len(outline)} chapters.")
+        else:
+            executor = ThreadPoolExecutor(max_workers=1)
+            outline_future = executor.submit(
+                contextvars.copy_context().run,
+                _generate_streamed_outline, outline_gen, stream, run.initial_prompt, run.num_chapters, run.journal,
+                notify,
+            )
 
     outline_path: Optional[Path] = None
-    output_dir = Path("book_output")
 
-    if save_outline:
+    def save() -> Path:
         notify("Saving outline to disk...")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        outline_path = output_dir / "outline.txt"
-        with outline_path.open("w", encoding="utf-8") as file:
-            for chapter in outline:
-                file.write(f"Chapter {chapter['chapter_number']}: {chapter['title']}\n")
-                file.write("-" * 50 + "\n")
-                file.write(chapter["prompt"] + "\n\n")
-        notify(f"Outline saved to {outline_path}.")
-
-    chapters_generated: List[str] = []
-
-    if generate_book:
-        notify("Initializing chapter generation...")
-        book_agents = BookAgents(agent_config, outline)
-        agents_with_context = book_agents.create_agents(initial_prompt, num_chapters)
-        book_gen = BookGenerator(agents_with_context, agent_config, outline)
-        book_gen.generate_book(outline)
-        chapters_generated = [str(path) for path in sorted(output_dir.glob("chapter_*.txt"))]
-        notify("Book generation complete.")
+        path = _save_outline(outline, run.output_dir)
+        notify(f"Outline saved to {path}.")
+        return path
+
+    if run.save_outline and stream is None:
+        outline_path = save()
+
+    book_gen: Optional[BookGenerator] = None
+    story_state: Optional[StoryState] = None
+
+    try:
+        if run.generate_book:
+            notify("Initializing chapter generation...")
+            if stream is not None:
+                stream.wait(1)  # Agents need at least one outline entry
+            story_state = StoryState(run.output_dir / STORY_STATE_FILENAME)
+            book_gen = run.book_generator(stream.chapters if stream is not None else outline, stream, story_state)
+            book_gen.generate_book(stream if stream is not None else outline)
+            notify("Book generation complete.")
+        else:
+            notify("Chapter generation skipped as requested.")
+    finally:
+        if story_state is not None:
+            story_state.close()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    if executor is not None:
+        outline = outline_future.result()
+        if run.save_outline:
+            outline_path = save()
+
+    return run.result(outline, outline_path, book_gen, story_state)
+
+
+def resume_generation(
+    output_dir: Union[str, Path] = "book_output",
+    *,
+    progress_callback: Optional[ProgressCallback] = None,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Continue the run journaled in ``output_dir`` from its first incomplete chapter.
+
+    The prompt, chapter count, endpoint and book options are read from the
+    journal; ``options`` may set the remaining :func:`run_generation` keywords
+    such as ``use_cache`` or ``trace``. The saved outline, completed chapters
+    and story memory are reused, so no finished step calls the LLM again.
+    """
+
+    journal = RunJournal.load(Path(output_dir) / JOURNAL_FILENAME)
+    return run_generation(
+        **journal.request,
+        progress_callback=progress_callback,
+        resume=True,
+        output_dir=output_dir,
+        **options,
+    )
+
+
+def export_manuscript(
+    output_dir: Union[str, Path] = "book_output",
+    fmt: str = "markdown",
+    *,
+    title: Optional[str] = None,
+    path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """Assemble the chapters saved in ``output_dir`` into one Markdown, HTML or EPUB file.
+
+    The outline and prompt are read from the run journal; ``title`` defaults
+    to the prompt's first sentence. ``fmt`` is one of :data:`EXPORT_FORMATS`.
+    Returns the path of the exported file.
+    """
+
+    journal = RunJournal.load(Path(output_dir) / JOURNAL_FILENAME)
+    if not journal.outline:
+        raise ValueError(f"Run journaled in {output_dir} has no outline to export")
+    if title is None:
+        title = journal.request["initial_prompt"].strip().split(".", 1)[0][:80].strip() or "Untitled"
+    return export_book(output_dir, journal.outline, fmt=fmt, title=title, path=path)
+
+
+async def aresume_generation(
+    output_dir: Union[str, Path] = "book_output",
+    *,
+    progress_callback: Optional[AsyncProgressCallback] = None,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Asynchronous variant of :func:`resume_generation`."""
+
+    journal = RunJournal.load(Path(output_dir) / JOURNAL_FILENAME)
+    return await arun_generation(
+        **journal.request,
+        progress_callback=progress_callback,
+        resume=True,
+        output_dir=output_dir,
+        **options,
+    )
+
+
+async def arun_generation(
+    initial_prompt: str,
+    num_chapters: int,
+    local_url: Optional[str] = None,
+    *,
+    use_openrouter: Optional[bool] = None,
+    model: Optional[str] = None,
+    save_outline: bool = True,
+    generate_book: bool = True,
+    progress_callback: Optional[AsyncProgressCallback] = None,
+    stream_callback: Optional[StreamCallback] = None,
+    use_cache: bool = False,
+    cache_path: Optional[str] = None,
+    cache_max_bytes: Optional[int] = None,
+    concurrency: int = 1,
+    context_mode: str = "full",
+    outline_window: int = 1,
+    execution_mode: str = "groupchat",
+    trace: bool = True,
+    resume: bool = False,
+    output_dir: Union[str, Path] = "book_output",
+    stream_outline: bool = False,
+    target_words: int = 5000,
+    edit_mode: str = "rewrite",
+    continuity_mode: str = "llm",
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """Asynchronous variant of :func:`run_generation`.
+
+    Agent conversations run through AutoGen's ``a_initiate_chat`` so several
+    books, or several chapters of one book, can share a single event loop.
+    ``progress_callback`` may be a plain function or a coroutine function;
+    ``stream_callback`` is called synchronously from the thread making the
+    request.
+    """
+
+    # Every other keyword configures the run; see _GenerationRun
+    arguments = {key: value for key, value in locals().items() if key != "progress_callback"}
+
+    async def notify(message: str) -> None:
+        if progress_callback:
+            outcome = progress_callback(message)
+            if inspect.isawaitable(outcome):
+                await outcome
+        else:
+            print(message)
+
+    await notify("Preparing configuration...")
+    run = _GenerationRun(**arguments)
+    for message in run.take_notes():
+        await notify(message)
+    try:
+        result = await _arun_pipeline(run, notify)
+    finally:
+        run.close()
+        for message in run.take_notes():
+            await notify(message)
+
+    run.finish(result)
+    for message in run.take_notes():
+        await notify(message)
+    return result
+
+
+async def _agenerate_streamed_outline(
+    outline_gen: OutlineGenerator,
+    stream: OutlineStream,
+    initial_prompt: str,
+    num_chapters: int,
+    journal: RunJournal,
+    notify: Callable[[str], Awaitable[None]],
+) -> List[Dict[str, Any]]:
+    """Asynchronous variant of :func:`_generate_streamed_outline`."""
+
+    try:
+        outline = _record_outline(await outline_gen.agenerate_outline(initial_prompt, num_chapters), journal)
+    except BaseException as e:
+        # Including GenerationCancelled, or chapters would wait on the outline forever
+        stream.fail(e)
+        raise
+    stream.finish(outline)
+    await notify(f"Outline generated with {len(outline)} chapters.")
+    return outline
+
+
+async def _arun_pipeline(run: _GenerationRun, notify: Callable[[str], Awaitable[None]]) -> Dict[str, Any]:
+    """Asynchronous variant of :func:`_run_pipeline`."""
+
+    outline = run.journal.outline
+    stream: Optional[OutlineStream] = None
+    outline_task: Optional[asyncio.Future] = None
+    if outline:
+        await notify(f"Using the journaled outline with {len(outline)} chapters.")
     else:
-        notify("Chapter generation skipped as requested.")
-
-    return {
-        "outline": outline,
-        "outline_path": str(outline_path) if outline_path else None,
-        "output_dir": str(output_dir),
-        "chapters": chapters_generated,
-    }
+        run.journal.reset_chapters()
+        await notify("Creating agent team...")
+        if run.stream_outline and run.generate_book:
+            stream = OutlineStream(run.num_chapters)
+        outline_gen = run.outline_generator(stream)
+
+        await notify("Generating outline...")
+        if stream is None:
+            outline = _record_outline(
+                await outline_gen.agenerate_outline(run.initial_prompt, run.num_chapters), run.journal
+            )
+            await notify(f"Outline generated with {len(outline)} chapters.")
+        else:
+            outline_task = asyncio.ensure_future(_agenerate_streamed_outline(
+                outline_gen, stream, run.initial_prompt, run.num_chapters, run.journal, notify,
+            ))
+
+    outline_path: Optional[Path] = None
+
+    async def save() -> Path:
+        await notify("Saving outline to disk...")
+        path = _save_outline(outline, run.output_dir)
+        await notify(f"Outline saved to {path}.")
+        return path
+
+    if run.save_outline and stream is None:
+        outline_path = await save()
+
+    book_gen: Optional[BookGenerator] = None
+    story_state: Optional[StoryState] = None
+
+    try:
+        if run.generate_book:
+            await notify("Initializing chapter generation...")
+            if stream is not None:
+                await asyncio.get_running_loop().run_in_executor(None, stream.wait, 1)
+            story_state = StoryState(run.output_dir / STORY_STATE_FILENAME)
+            book_gen = run.book_generator(stream.chapters if stream is not None else outline, stream, story_state)
+            await book_gen.agenerate_book(stream if stream is not None else outline)
+            await notify("Book generation complete.")
+        else:
+            await notify("Chapter generation skipped as requested.")
+    finally:
+        if story_state is not None:
+            story_state.close()
+        if outline_task is not None:
+            await asyncio.gather(outline_task, return_exceptions=True)
+
+    if outline_task is not None:
+        outline = outline_task.result()
+        if run.save_outline:
+            outline_path = await save()
+
+    return run.result(outline, outline_path, book_gen, story_state)
+
+
+async def astream_generation(
+    initial_prompt: str,
+    num_chapters: int,
+    local_url: Optional[str] = None,
+    **options: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run :func:`arun_generation` and yield its progress as an async stream.
+
+    Each update is yielded as ``{"type": "progress", "message": ...}``; the
+    final item is ``{"type": "result", "result": ...}``. Errors raised by
+    the run propagate out of the iterator.
+    """
+
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    task = asyncio.ensure_future(
+        arun_generation(
+            initial_prompt,
+            num_chapters,
+            local_url,
+            progress_callback=queue.put,
+            **options,
+        )
+    )
+
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield {"type": "progress", "message": getter.result()}
+            else:
+                getter.cancel()
+        while not queue.empty():
+            yield {"type": "progress", "message": queue.get_nowait()}
+    finally:
+        if not task.done():
+            task.cancel()
+
+    yield {"type": "result", "result": task.result()}
@@ -0,0 +1,153 @@
+"""Background book generation jobs that outlive the UI request that started them."""
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from cancellation import GenerationCancelled
+from generation_service import resume_generation, run_generation
+from run_journal import JOURNAL_FILENAME
+
+JOB_STATUSES = ("queued", "running", "cancelling", "cancelled", "succeeded", "failed")
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+STREAM_TAIL_CHARS = 3000  # Live text kept per job; the UI only shows the end of the current reply
+
+
+class Job:
+    """One generation request, its progress messages, live text and outcome"""
+
+    def __init__(self, job_id: str, options: Dict[str, Any], meta: Dict[str, Any], output_dir: Path):
+        self.id = job_id
+        self.options = options  # run_generation keywords
+        self.meta = meta  # Display details, e.g. provider and chapter count
+        self.output_dir = output_dir
+        self.status = "queued"
+        self.progress: List[str] = []  # Only ever appended to, so readers can render just the new lines
+        self.stream_info: Dict[str, Any] = {}
+        self.stream_text = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def resumable(self) -> bool:
+        return not self.active and self.status != "succeeded" and (self.output_dir / JOURNAL_FILENAME).exists()
+
+    def log(self, message: str) -> None:
+        self.progress.append(message)
+
+    def on_stream(self, chunk: str, info: Dict[str, Any]) -> None:
+        with self._lock:
+            if info != self.stream_info:
+                self.stream_info, self.stream_text = info, ""
+            self.stream_text = (self.stream_text + chunk)[-STREAM_TAIL_CHARS:]
+
+
+class JobManager:
+    """Runs generation jobs on a shared thread pool and keeps them by id.
+
+    One manager serves every browser session of the app, so ``max_workers``
+    bounds how many books use the endpoints at once; further jobs wait in the
+    queue. Each job writes to ``<output_root>/<job id>``, and its cancel event
+    stops it before the next LLM request.
+    """
+
+    def __init__(self, max_workers: int = 2, output_root: Union[str, Path] = "book_output"):
+        self.output_root = Path(output_root)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="book-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, options: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue a run_generation call with ``options`` and return its job"""
+        job_id = uuid.uuid4().hex[:12]
+        job = Job(job_id, dict(options), dict(meta or {}), self.output_root / job_id)
+        return self._start(job, resume=False)
+
+    def resumable(self, job_id: str) -> bool:
+        """Whether :meth:`resume` can continue the job"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.resumable
+        return job_id.isalnum() and (self.output_root / job_id / JOURNAL_FILENAME).exists()
+
+    def resume(self, job_id: str) -> Job:
+        """Continue a cancelled or failed job, or one from before a restart, from its run journal"""
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid job id {job_id!r}")
+        job = self.get(job_id)
+        output_dir = job.output_dir if job is not None else self.output_root / job_id
+        if job is not None and job.active:
+            return job
+        if not (output_dir / JOURNAL_FILENAME).exists():
+            raise FileNotFoundError(f"No run journal for job {job_id} in {output_dir}")
+        resumed = Job(job_id, job.options if job is not None else {}, job.meta if job is not None else {}, output_dir)
+        return self._start(resumed, resume=True)
+
+    def _start(self, job: Job, resume: bool) -> Job:
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, resume)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created)
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a job to stop; a queued job never starts. Returns False for unknown or finished jobs"""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        elif job.status == "running":
+            job.status = "cancelling"
+            job.log("Cancelling after the current request...")
+        return True
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.error = error
+        job.finished = time.time()
+        job.status = status
+
+    def _run(self, job: Job, resume: bool) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        callbacks = {
+            "progress_callback": job.log,
+            # The page polls the job, so parallel drafts can stream too
+            "stream_callback": job.on_stream,
+            "cancel_event": job.cancel_event,
+        }
+        try:
+            if resume and not job.options:
+                # Started before a restart: the journal has the request, book options included
+                job.result = resume_generation(job.output_dir, **callbacks)
+            else:
+                job.result = run_generation(**job.options, output_dir=job.output_dir, resume=resume, **callbacks)
+        except GenerationCancelled:
+            job.log("Generation cancelled.")
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.log(f"Generation failed: {str(e)}")
+            self._finish(job, "failed", f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, "succeeded")
@@ -0,0 +1,165 @@
+"""Persistent, size-bounded response cache for AutoGen completions."""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = Path(".cache") / "llm_responses.sqlite"
+DEFAULT_CACHE_MAX_MB = 512
+
+
+def cache_namespace(agent_config: Dict) -> str:
+    """Return a namespace that separates entries per model, endpoint and seed.
+
+    AutoGen's cache key covers the request parameters (model, messages,
+    temperature, seed) but deliberately omits the endpoint, so two servers
+    hosting a model with the same name would otherwise share entries.
+    """
+
+    endpoints = sorted(
+        (entry.get("model", ""), entry.get("base_url", ""))
+        for entry in agent_config.get("config_list", [])
+    )
+    payload = {
+        "endpoints": endpoints,
+        "seed": agent_config.get("seed"),
+        "temperature": agent_config.get("temperature"),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """SQLite-backed LRU cache implementing AutoGen's ``AbstractCache`` protocol.
+
+    AutoGen enters and exits the cache context around every single request, so
+    ``__exit__`` keeps the connection open; call :meth:`close` once the run is
+    finished.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, namespace: str = ""):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)"
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._total_bytes = int(row[0])
+
+    def _key(self, key: str) -> str:
+        return hashlib.sha256(f"{self.namespace}:{key}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        """Return the cached response for ``key`` and mark it as recently used."""
+        digest = self._key(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), digest)
+            )
+            self._conn.commit()
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            print(f"Discarding unreadable cache entry: {str(e)}")
+            return default
+        self.hits += 1
+        try:
+            value.from_cache = True  # Lets telemetry tell cache hits from billed requests
+        except AttributeError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` and evict least recently used entries over budget."""
+        try:
+            blob = pickle.dumps(value)
+        except Exception as e:
+            print(f"Response not cacheable: {str(e)}")
+            return
+
+        size = len(blob)
+        if size > self.max_bytes:
+            return
+
+        digest = self._key(key)
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (digest,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (digest, sqlite3.Binary(blob), size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop the oldest entries until the cache fits its byte budget."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for digest, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (digest,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current on-disk footprint."""
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._total_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # AutoGen wraps each request in ``with cache:``; keep the connection alive.
+        return None
+
+
+def open_response_cache(
+    agent_config: Dict,
+    path: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> ResponseCache:
+    """Open the shared response cache using explicit values or the environment.
+
+    ``LLM_CACHE_PATH`` and ``LLM_CACHE_MAX_MB`` are consulted when the
+    corresponding argument is ``None``.
+    """
+
+    resolved_path = Path(path or os.getenv("LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH)))
+    if max_bytes is None:
+        max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", str(DEFAULT_CACHE_MAX_MB))) * 1024 * 1024)
+    return ResponseCache(resolved_path, max_bytes, namespace=cache_namespace(agent_config))
@@ -0,0 +1,40 @@
+"""Format the book outline for agent prompts, either whole or windowed."""
+from typing import Dict, List
+
+CONTEXT_MODES = ("full", "window")
+
+
+def format_full_outline(outline: List[Dict]) -> str:
+    """Format every chapter of the outline with its full prompt"""
+    context_parts = ["Complete Book Outline:"]
+    for chapter in sorted(outline, key=lambda x: x['chapter_number']):
+        context_parts.extend([
+            f"\nChapter {chapter['chapter_number']}: {chapter['title']}",
+            chapter['prompt']
+        ])
+    return "\n".join(context_parts)
+
+
+def format_table_of_contents(outline: List[Dict]) -> str:
+    """Format the outline as one line per chapter"""
+    return "\n".join([
+        "Table of Contents:",
+        *[f"Chapter {chapter['chapter_number']}: {chapter['title']}"
+          for chapter in sorted(outline, key=lambda x: x['chapter_number'])]
+    ])
+
+
+def format_outline_window(outline: List[Dict], chapter_number: int, window: int = 1) -> str:
+    """Format the current chapter and up to ``window`` neighbours on each side"""
+    nearby = [
+        chapter for chapter in sorted(outline, key=lambda x: x['chapter_number'])
+        if abs(chapter['chapter_number'] - chapter_number) <= window
+    ]
+    context_parts = [f"Outline Around Chapter {chapter_number}:"]
+    for chapter in nearby:
+        label = "Current Chapter" if chapter['chapter_number'] == chapter_number else "Chapter"
+        context_parts.extend([
+            f"\n{label} {chapter['chapter_number']}: {chapter['title']}",
+            chapter['prompt']
+        ])
+    return "\n".join(context_parts)
@@ -1,19 +1,37 @@
 """Generate book outlines using AutoGen agents with improved error handling"""
+import asyncio
+import contextvars
 import autogen
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence
 import re
 
+from agent_pipeline import EXECUTION_MODES, PipelineStep, arun_pipeline, run_pipeline
+from agents import AgentHook, ask_agent
+from llm_cache import ResponseCache
+from outline_parser import OUTLINE_END, OUTLINE_START, parse_outline
+from telemetry import label_agents
+
+_CHAPTER_MARKER = re.compile(r'Chapter (\d+)')
+
 class OutlineGenerator:
-    def __init__(self, agents: Dict[str, autogen.ConversableAgent], agent_config: Dict):
+    def __init__(self, agents: Dict[str, autogen.ConversableAgent], agent_config: Dict,
+                 cache: Optional[ResponseCache] = None, agent_hooks: Sequence[AgentHook] = (),
+                 execution_mode: str = "groupchat", repair_attempts: int = 2):
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {execution_mode!r}; expected one of {EXECUTION_MODES}")
         self.agents = agents
         self.agent_config = agent_config
+        self.cache = cache  # Optional persistent response cache
+        self.execution_mode = execution_mode  # "groupchat" or a direct "pipeline" of agent calls
+        self.repair_attempts = repair_attempts  # Requests for just the chapters that failed validation
+        for agent in self.agents.values():
+            for hook in agent_hooks:
+                hook(agent)
+        label_agents(self.agents.values(), phase="outline")
 
-    def generate_outline(self, initial_prompt: str, num_chapters: int = 25) -> List[Dict]:
-        """Generate a book outline based on initial prompt"""
-        print("\nGenerating outline...")
-
-        
-        groupchat = autogen.GroupChat(
+    def _create_outline_chat(self) -> autogen.GroupChat:
+        """Create the group chat used to plan the outline"""
+        return autogen.GroupChat(
             agents=[
                 self.agents["user_proxy"],
                 self.agents["story_planner"],
@@ -24,10 +42,10 @@ class OutlineGenerator:
             max_round=4,
             speaker_selection_method="round_robin"
         )
-        
-        manager = autogen.GroupChatManager(groupchat=groupchat, llm_config=self.agent_config)
 
-        outline_prompt = f"""Let's create a {num_chapters}-chapter outline for a book with the following premise:
+    def _build_outline_prompt(self, initial_prompt: str, num_chapters: int) -> str:
+        """Build the opening message for the outline conversation"""
+        return f"""Let's create a {num_chapters}-chapter outline for a book with the following premise:
 
 {initial_prompt}
 
@@ -48,21 +66,89 @@ There should be clear content for each chapter. There should be a total of {num_
 
 End the outline with 'END OF OUTLINE'"""
 
+    def _outline_steps(self, initial_prompt: str, num_chapters: int) -> List[PipelineStep]:
+        """Planner, world builder and outline creator, each sent only what it builds on"""
+        return [
+            PipelineStep("story_planner", self.agents["story_planner"], lambda outputs: f"""Create the high-level story arc for a {num_chapters}-chapter book with the following premise:
+
+{initial_prompt}"""),
+            PipelineStep("world_builder", self.agents["world_builder"], lambda outputs: f"""Establish the settings needed for a {num_chapters}-chapter book with the following premise:
+
+{initial_prompt}
+
+Story Arc:
+{outputs["story_planner"]}"""),
+            PipelineStep("outline_creator", self.agents["outline_creator"], lambda outputs: f"""{self._build_outline_prompt(initial_prompt, num_chapters)}
+
+Story Arc:
+{outputs["story_planner"]}
+
+World Elements:
+{outputs["world_builder"]}"""),
+        ]
+
+    def generate_outline(self, initial_prompt: str, num_chapters: int = 25) -> List[Dict]:
+        """Generate a book outline based on initial prompt"""
+        print("\nGenerating outline...")
+
+        if self.execution_mode == "pipeline":
+            messages = []
+            try:
+                messages = run_pipeline(self._outline_steps(initial_prompt, num_chapters), cache=self.cache)
+                return self._process_outline_results(messages, num_chapters, initial_prompt)
+            except Exception as e:
+                print(f"Error generating outline: {str(e)}")
+                return self._emergency_outline_processing(messages, num_chapters)
+
+        groupchat = self._create_outline_chat()
+        manager = autogen.GroupChatManager(groupchat=groupchat, llm_config=self.agent_config)
+        outline_prompt = self._build_outline_prompt(initial_prompt, num_chapters)
+
         try:
             # Initiate the chat
             self.agents["user_proxy"].initiate_chat(
                 manager,
-                message=outline_prompt
+                message=outline_prompt,
+                cache=self.cache
             )
 
             # Extract the outline from the chat messages
-            return self._process_outline_results(groupchat.messages, num_chapters)
+            return self._process_outline_results(groupchat.messages, num_chapters, initial_prompt)
             
         except Exception as e:
             print(f"Error generating outline: {str(e)}")
             # Try to salvage any outline content we can find
             return self._emergency_outline_processing(groupchat.messages, num_chapters)
 
+    async def agenerate_outline(self, initial_prompt: str, num_chapters: int = 25) -> List[Dict]:
+        """Asynchronous variant of :meth:`generate_outline`"""
+        print("\nGenerating outline...")
+
+        if self.execution_mode == "pipeline":
+            messages = []
+            try:
+                messages = await arun_pipeline(self._outline_steps(initial_prompt, num_chapters), cache=self.cache)
+                return await self._aprocess_outline_results(messages, num_chapters, initial_prompt)
+            except Exception as e:
+                print(f"Error generating outline: {str(e)}")
+                return self._emergency_outline_processing(messages, num_chapters)
+
+        groupchat = self._create_outline_chat()
+        manager = autogen.GroupChatManager(groupchat=groupchat, llm_config=self.agent_config)
+        outline_prompt = self._build_outline_prompt(initial_prompt, num_chapters)
+
+        try:
+            await self.agents["user_proxy"].a_initiate_chat(
+                manager,
+                message=outline_prompt,
+                cache=self.cache
+            )
+            return await self._aprocess_outline_results(groupchat.messages, num_chapters, initial_prompt)
+
+        except Exception as e:
+            print(f"Error generating outline: {str(e)}")
+            return self._emergency_outline_processing(groupchat.messages, num_chapters)
+
     def _get_sender(self, msg: Dict) -> str:
         """Helper to get sender from message regardless of format"""
         return msg.get("sender") or msg.get("name", "")
@@ -94,7 +180,8 @@ End the outline with 'END OF OUTLINE'"""
 
         return ""
 
-    def _process_outline_results(self, messages: List[Dict], num_chapters: int) -> List[Dict]:
+    def _process_outline_results(self, messages: List[Dict], num_chapters: int,
+                                 initial_prompt: str = "") -> List[Dict]:
         """Extract and process the outline with strict format requirements"""
         outline_content = self._extract_outline_content(messages)
         
@@ -102,57 +189,17 @@ End the outline with 'END OF OUTLINE'"""
             print("No structured outline found, attempting emergency processing...")
             return self._emergency_outline_processing(messages, num_chapters)
 
-        chapters = []
-        chapter_sections = re.split(r'Chapter \d+:', outline_content)
-        
-        for i, section in enumerate(chapter_sections[1:], 1):  # Skip first empty section
-            try:
-                    # Extract required components
-                title_match = re.search(r'\*?\*?Title:\*?\*?\s*(.+?)(?=\n|$)', section, re.IGNORECASE)
-                events_match = re.search(r'\*?\*?Key Events:\*?\*?\s*(.*?)(?=\*?\*?Character Developments:|$)', section, re.DOTALL | re.IGNORECASE)
-                character_match = re.search(r'\*?\*?Character Developments:\*?\*?\s*(.*?)(?=\*?\*?Setting:|$)', section, re.DOTALL | re.IGNORECASE)
-                setting_match = re.search(r'\*?\*?Setting:\*?\*?\s*(.*?)(?=\*?\*?Tone:|$)', section, re.DOTALL | re.IGNORECASE)
-                tone_match = re.search(r'\*?\*?Tone:\*?\*?\s*(.*?)(?=\*?\*?Chapter \d+:|$)', section, re.DOTALL | re.IGNORECASE)
-
-                # If no explicit title match, try to get it from the chapter header
-                if not title_match:
-                    title_match = re.search(r'\*?\*?Chapter \d+:\s*(.+?)(?=\n|$)', section)
-
-                # Verify all components exist
-                if not all([title_match, events_match, character_match, setting_match, tone_match]):
-                    print(f"Missing required components in Chapter {i}")
-                    missing = []
-                    if not title_match: missing.append("Title")
-                    if not events_match: missing.append("Key Events")
-                    if not character_match: missing.append("Character Developments")
-                    if not setting_match: missing.append("Setting")
-                    if not tone_match: missing.append("Tone")
-                    print(f"  Missing: {', '.join(missing)}")
-                    continue
-
-                # Format chapter content
-                chapter_info = {
-                    "chapter_number": i,
-                    "title": title_match.group(1).strip(),
-                    "prompt": "\n".join([
-                        f"- Key Events: {events_match.group(1).strip()}",
-                        f"- Character Developments: {character_match.group(1).strip()}",
-                        f"- Setting: {setting_match.group(1).strip()}",
-                        f"- Tone: {tone_match.group(1).strip()}"
-                    ])
-                }
-                
-                # Verify events (at least 3)
-                events = re.findall(r'-\s*(.+?)(?=\n|$)', events_match.group(1))
-                if len(events) < 3:
-                    print(f"Chapter {i} has fewer than 3 events")
-                    continue
+        chapters, problems = parse_outline(outline_content)
+        for number, problem in sorted(problems.items()):
+            print(f"Chapter {number} rejected: {problem}")
 
-                chapters.append(chapter_info)
-
-            except Exception as e:
-                print(f"Error processing Chapter {i}: {str(e)}")
-                continue
+        found = {chapter["chapter_number"] for chapter in chapters}
+        failed = {
+            number: problems.get(number, "missing from the outline")
+            for number in range(1, num_chapters + 1) if number not in found
+        }
+        if failed:
+            chapters = self._repair_chapters(chapters, failed, num_chapters, initial_prompt)
 
         # If we don't have enough valid chapters, raise error to trigger retry
         if len(chapters) < num_chapters:
@@ -160,6 +207,75 @@ End the outline with 'END OF OUTLINE'"""
 
         return chapters
 
+    async def _aprocess_outline_results(self, messages: List[Dict], num_chapters: int,
+                                        initial_prompt: str = "") -> List[Dict]:
+        """:meth:`_process_outline_results` off the event loop, since a repair makes a blocking call"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, contextvars.copy_context().run, self._process_outline_results,
+                                          messages, num_chapters, initial_prompt)
+
+    def _build_repair_prompt(self, chapters: List[Dict], failed: Dict[int, str], num_chapters: int,
+                             initial_prompt: str) -> str:
+        """Ask for just the failed chapters, showing the valid chapters around them"""
+        by_number = {chapter["chapter_number"]: chapter for chapter in chapters}
+        neighbours = sorted({
+            neighbour for number in failed for neighbour in (number - 1, number + 1)
+            if neighbour in by_number
+        })
+        context = "\n\n".join(
+            f"Chapter {number}: {by_number[number]['title']}\n{by_number[number]['prompt']}"
+            for number in neighbours
+        )
+        problems = "\n".join(f"- Chapter {number}: {problem}" for number, problem in sorted(failed.items()))
+        premise = f"Premise:\n{initial_prompt}\n\n" if initial_prompt else ""
+        surrounding = f"Surrounding chapters (these stay as they are):\n{context}\n\n" if context else ""
+        return f"""{premise}The {num_chapters}-chapter outline is complete except for the chapters below, which were missing or malformed:
+{problems}
+
+{surrounding}Rewrite only these chapters: {", ".join(str(number) for number in sorted(failed))}.
+
+Keep each chapter's number, fit it between its neighbours, and use the usual format:
+Chapter N: [Title]
+Chapter Title: [Same title]
+Key Events:
+- [Event 1]
+- [Event 2]
+- [Event 3]
+Character Developments: [Development]
+Setting: [Setting]
+Tone: [Tone]
+
+Start with '{OUTLINE_START}' and end with '{OUTLINE_END}'"""
+
+    def _repair_chapters(self, chapters: List[Dict], failed: Dict[int, str], num_chapters: int,
+                         initial_prompt: str) -> List[Dict]:
+        """Re-request only the failed chapters and merge the valid replies into the outline"""
+        chapters = list(chapters)
+        failed = dict(failed)
+        for attempt in range(1, self.repair_attempts + 1):
+            if not failed:
+                break
+            print(f"Repairing outline chapters {', '.join(str(number) for number in sorted(failed))} (attempt {attempt})")
+            prompt = self._build_repair_prompt(chapters, failed, num_chapters, initial_prompt)
+            try:
+                reply = ask_agent(self.agents["outline_creator"], prompt, cache=self.cache)
+            except Exception as e:
+                print(f"Error repairing outline: {str(e)}")
+                break
+
+            content = self._extract_outline_content([{"content": reply}]) or reply
+            repaired, problems = parse_outline(content, use_header_numbers=True)
+            for chapter in repaired:
+                if chapter["chapter_number"] in failed:
+                    del failed[chapter["chapter_number"]]
+                    chapters.append(chapter)
+            for number, problem in problems.items():
+                if number in failed:
+                    failed[number] = problem
+                    print(f"Chapter {number} rejected again: {problem}")
+
+        return sorted(chapters, key=lambda x: x["chapter_number"])
+
     def _verify_chapter_sequence(self, chapters: List[Dict], num_chapters: int) -> List[Dict]:
         """Verify and fix chapter numbering"""
         # Sort chapters by their current number
@@ -193,15 +309,16 @@ End the outline with 'END OF OUTLINE'"""
         # Look through all messages for any chapter content
         for msg in messages:
             content = msg.get("content", "")
-            lines = content.split('\n')
+            has_events = "Key events:" in content  # Once per message, not once per line
             
-            for line in lines:
+            for line in content.split('\n'):
                 # Look for chapter markers
-                chapter_match = re.search(r'Chapter (\d+)', line)
-                if chapter_match and "Key events:" in content:
+                chapter_match = _CHAPTER_MARKER.search(line) if has_events else None
+                if chapter_match:
                     if current_chapter:
+                        current_chapter['prompt'] = '\n'.join(current_chapter['prompt'])
                         chapters.append(current_chapter)
-                    
+
                     current_chapter = {
                         'chapter_number': int(chapter_match.group(1)),
                         'title': line.split(':')[-1].strip() if ':' in line else f"Chapter {chapter_match.group(1)}",
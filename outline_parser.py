@@ -0,0 +1,214 @@
+"""Single-pass parser for the chapter outlines produced by the outline_creator."""
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+# Matched against a lowercased copy, which is much faster than re.IGNORECASE.
+# Chapter headers are then checked for "Chapter" in the original text.
+_TOKEN_PATTERN = r"chapter \d+:|(title|key events|character developments|setting|tone):"
+_TOKEN = re.compile(_TOKEN_PATTERN)
+_TOKEN_ANY_CASE = re.compile(_TOKEN_PATTERN, re.IGNORECASE)  # When lowercasing changes offsets
+_CHAPTER_HEADER = re.compile(r"Chapter \d+:")
+_TITLE = re.compile(r"\s*(.+)")
+_EVENT = re.compile(r"-\s*(.+?)(?=\n|$)")
+
+FIELDS = ("title", "key events", "character developments", "setting", "tone")
+FIELD_NAMES = {
+    "title": "Title",
+    "key events": "Key Events",
+    "character developments": "Character Developments",
+    "setting": "Setting",
+    "tone": "Tone",
+}
+# Label -> the field it closes; each field runs until the label after it in the requested format
+_CLOSES = {
+    "character developments": "key events",
+    "setting": "character developments",
+    "tone": "setting",
+}
+MIN_EVENTS = 3
+
+OUTLINE_START = "OUTLINE:"
+OUTLINE_END = "END OF OUTLINE"
+
+
+class OutlineParse(NamedTuple):
+    chapters: List[Dict]
+    problems: Dict[int, str]  # Chapter number -> why it was rejected
+
+    @property
+    def invalid(self) -> List[int]:
+        return sorted(self.problems)
+
+
+class _Section:
+    """Label positions seen so far in one chapter section"""
+
+    __slots__ = ("number", "value_start", "value_end")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.value_start: Dict[str, int] = {}
+        self.value_end: Dict[str, int] = {}
+
+    def mark(self, label: str, start: int, end: int) -> None:
+        closed = _CLOSES.get(label)
+        if closed in self.value_start and closed not in self.value_end:
+            self.value_end[closed] = start
+        # Only the first occurrence of a label counts
+        self.value_start.setdefault(label, end)
+
+
+def _finish(content: str, section: _Section, end: int, chapters: List[Dict], problems: Dict[int, str]) -> None:
+    title: Optional[str] = None
+    if "title" in section.value_start:
+        title_match = _TITLE.match(content, section.value_start["title"], end)
+        if title_match:
+            title = title_match.group(1).strip()
+
+    values = {}
+    for field in FIELDS[1:]:
+        if field in section.value_start:
+            values[field] = (section.value_start[field], section.value_end.get(field, end))
+
+    missing = (["Title"] if title is None else []) + [FIELD_NAMES[field] for field in FIELDS[1:] if field not in values]
+    if missing:
+        problems[section.number] = f"missing {', '.join(missing)}"
+        return
+
+    events_start, events_end = values["key events"]
+    if len(_EVENT.findall(content, events_start, events_end)) < MIN_EVENTS:
+        problems[section.number] = f"fewer than {MIN_EVENTS} events"
+        return
+
+    chapters.append({
+        "chapter_number": section.number,
+        "title": title,
+        "prompt": "\n".join(
+            f"- {FIELD_NAMES[field]}: {content[start:stop].strip()}"
+            for field, (start, stop) in values.items()
+        ),
+    })
+
+
+def parse_outline(content: str, use_header_numbers: bool = False) -> OutlineParse:
+    """Split outline text into chapter dicts in one pass over its labels.
+
+    Chapters are numbered by their position in the outline, or by the number
+    in their "Chapter N:" header with ``use_header_numbers``. A chapter is
+    rejected when any of Title, Key Events, Character Developments, Setting
+    or Tone is missing, or when it lists fewer than three key events.
+    """
+    chapters: List[Dict] = []
+    problems: Dict[int, str] = {}
+    section: Optional[_Section] = None
+    lowered = content.lower()
+    text, token = (lowered, _TOKEN) if len(lowered) == len(content) else (content, _TOKEN_ANY_CASE)
+    for match in token.finditer(text):
+        start, end = match.span()
+        label = match.group(1)
+        if label is None:
+            if not content.startswith("Chapter", start):
+                continue
+            if section is not None:
+                _finish(content, section, start, chapters, problems)
+            if use_header_numbers:
+                number = int(text[start + len("chapter "):end - 1])
+            else:
+                number = section.number + 1 if section else 1
+            section = _Section(number)
+        elif section is not None:
+            # Labels may be wrapped in markdown bold, e.g. "**Key Events:**"
+            for _ in range(2):
+                if content[start - 1:start] == "*":
+                    start -= 1
+                if content[end:end + 1] == "*":
+                    end += 1
+            section.mark(label.lower(), start, end)
+    if section is not None:
+        _finish(content, section, len(content), chapters, problems)
+    return OutlineParse(chapters, problems)
+
+
+class IncrementalOutlineParser:
+    """Parses an outline while it streams in and emits each chapter as soon as it is complete.
+
+    Text before ``OUTLINE:`` is ignored. A chapter is complete once the next
+    chapter header, ``END OF OUTLINE`` or another ``OUTLINE:`` arrives, because its Tone may run over
+    several lines. Chapters are numbered and validated exactly as
+    :func:`parse_outline` does for the finished text; rejected ones are kept
+    in ``problems``.
+    """
+
+    _LOOKBEHIND = 32  # Enough to catch a header or end marker split across chunks
+
+    def __init__(self, on_chapter: Optional[Callable[[Dict], None]] = None):
+        self.on_chapter = on_chapter
+        self.chapters: List[Dict] = []
+        self.problems: Dict[int, str] = {}
+        self.finished = False
+        self._started = False
+        self._buffer = ""  # From the current chapter header on
+        self._header_length = 0  # Zero until the first header arrives
+        self._scanned = 0
+        self._sections = 0
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add streamed text and return the chapters it completed"""
+        if self.finished:
+            return []
+        self._buffer += chunk
+        if not self._started:
+            start = self._buffer.find(OUTLINE_START)
+            if start == -1:
+                self._buffer = self._buffer[-len(OUTLINE_START):]
+                return []
+            self._started = True
+            self._buffer = self._buffer[start + len(OUTLINE_START):]
+        return self._advance(final=False)
+
+    def close(self) -> List[Dict]:
+        """Finish the last chapter once the stream has ended"""
+        if self.finished or not self._started:
+            self.finished = True
+            return []
+        return self._advance(final=True)
+
+    def _advance(self, final: bool) -> List[Dict]:
+        emitted: List[Dict] = []
+        scan_from = max(self._header_length, self._scanned - self._LOOKBEHIND)
+        # Another "OUTLINE:" starts a new reply, e.g. a repair request, rather than continuing this one
+        ends = [self._buffer.find(marker, scan_from) for marker in (OUTLINE_END, OUTLINE_START)]
+        ends = [index for index in ends if index != -1]
+        if ends:
+            self._buffer = self._buffer[:min(ends)]
+            final = True
+
+        while True:
+            header = _CHAPTER_HEADER.search(self._buffer, scan_from)
+            if header is None:
+                break
+            if self._header_length:
+                emitted.extend(self._emit(self._buffer[:header.start()]))
+            self._buffer = self._buffer[header.start():]
+            self._header_length = header.end() - header.start()
+            scan_from = self._header_length
+        self._scanned = len(self._buffer)
+
+        if final:
+            if self._header_length:
+                emitted.extend(self._emit(self._buffer))
+            self._buffer = ""
+            self.finished = True
+        return emitted
+
+    def _emit(self, section: str) -> List[Dict]:
+        self._sections += 1
+        chapters, problems = parse_outline(section)
+        if problems:
+            self.problems[self._sections] = problems[1]
+            return []
+        chapter = {**chapters[0], "chapter_number": self._sections}
+        self.chapters.append(chapter)
+        if self.on_chapter is not None:
+            self.on_chapter(chapter)
+        return [chapter]
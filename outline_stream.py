@@ -0,0 +1,108 @@
+"""Hand chapters of an outline that is still being generated to the book generator."""
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+
+class OutlineStream:
+    """Outline shared between the thread generating it and the one writing chapters.
+
+    Chapters are released in order: one that arrives early waits until
+    every chapter before it has arrived. ``chapters`` is the released
+    outline and grows in place, so it can be handed to agents and the book
+    generator before it is complete. :meth:`finish` settles it with the
+    outline the generator finally returned.
+    """
+
+    def __init__(self, num_chapters: int):
+        self.num_chapters = num_chapters
+        self.chapters: List[Dict] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._pending: Dict[int, Dict] = {}
+        self._listeners: List[Callable[[], None]] = []
+        self._condition = threading.Condition()
+
+    def add(self, chapter: Dict) -> None:
+        """Offer a chapter parsed from the streamed outline"""
+        with self._condition:
+            if self.done:
+                return
+            self._pending[chapter["chapter_number"]] = chapter
+            released = False
+            while len(self.chapters) + 1 in self._pending:
+                self.chapters.append(self._pending.pop(len(self.chapters) + 1))
+                released = True
+            if released:
+                self._condition.notify_all()
+        if released:
+            self._notify_listeners()
+
+    def finish(self, outline: List[Dict]) -> None:
+        """Settle the outline; released chapters that changed are replaced in place"""
+        with self._condition:
+            for index, chapter in enumerate(outline):
+                if index >= len(self.chapters):
+                    self.chapters.append(chapter)
+                elif self.chapters[index] != chapter:
+                    print(f"Outline entry for chapter {chapter['chapter_number']} changed after it was released")
+                    self.chapters[index] = chapter
+            del self.chapters[len(outline):]
+            self.done = True
+            self._condition.notify_all()
+        self._notify_listeners()
+
+    def fail(self, error: BaseException) -> None:
+        with self._condition:
+            self.error = error
+            self.done = True
+            self._condition.notify_all()
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Call ``listener`` whenever the released outline grows or is settled"""
+        self._listeners.append(listener)
+
+    def _notify_listeners(self) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"Outline listener failed: {str(e)}")
+
+    def wait(self, count: int) -> bool:
+        """Block until ``count`` chapters are released; False if the outline ended with fewer"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.chapters) >= count or self.done)
+            if len(self.chapters) < count and self.error is not None:
+                raise self.error
+            return len(self.chapters) >= count
+
+    def __iter__(self) -> Iterator[Dict]:
+        index = 0
+        while self.wait(index + 1):
+            yield self.chapters[index]
+            index += 1
+
+    async def __aiter__(self) -> AsyncIterator[Dict]:
+        loop = asyncio.get_running_loop()
+        index = 0
+        while await loop.run_in_executor(None, self.wait, index + 1):
+            yield self.chapters[index]
+            index += 1
+
+
+def ordered_chapters(outline: Union[Iterable[Dict], OutlineStream]) -> Iterable[Dict]:
+    """Chapters in order: a stream as it arrives, a list sorted by chapter number"""
+    if isinstance(outline, OutlineStream):
+        return outline
+    return sorted(outline, key=lambda x: x["chapter_number"])
+
+
+async def aordered_chapters(outline: Union[Iterable[Dict], OutlineStream]) -> AsyncIterator[Dict]:
+    """Asynchronous variant of :func:`ordered_chapters` that never blocks the event loop"""
+    if isinstance(outline, OutlineStream):
+        async for chapter in outline:
+            yield chapter
+        return
+    for chapter in ordered_chapters(outline):
+        yield chapter
@@ -0,0 +1,247 @@
+"""Adaptive per-provider rate limiting with jittered retries for LLM requests."""
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Mapping, Optional
+
+import autogen
+import openai
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Request-rate bucket that slows down on rate limits and speeds back up on success.
+
+    ``rate`` is in requests per second; ``None`` means unlimited until the
+    provider first pushes back. The rate then starts from half of what was
+    actually being sent and grows by a few percent with each success, up to
+    ``max_rate`` when one is configured.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: float = 4.0,
+                 max_rate: Optional[float] = None, min_rate: float = 1 / 60):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.tokens = burst
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._recent: Deque[float] = deque()  # Send times over the last minute
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Wait for permission to send a request; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and (self.rate is None or self.tokens >= 1):
+                    if self.rate is not None:
+                        self.tokens -= 1
+                    self._recent.append(now)
+                    while self._recent and self._recent[0] < now - 60:
+                        self._recent.popleft()
+                    return waited
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause_until(self, resume_at: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, resume_at)
+
+    def on_rate_limited(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 60:
+                self._recent.popleft()
+            # Rate over the span actually observed, so a young run is not underestimated
+            span = now - self._recent[0] if self._recent else 60.0
+            observed = len(self._recent) / max(1.0, span)
+            current = self.rate if self.rate is not None else max(observed, self.min_rate * 2)
+            self.rate = max(self.min_rate, current / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate is not None:
+                self.rate *= 1.05
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds in a header such as "2", "1.5", "20ms" or "6m0s"."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def retry_delay_from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After or rate-limit reset headers"""
+    headers = {key.lower(): value for key, value in headers.items()}
+    if "retry-after-ms" in headers:
+        delay = _parse_duration(headers["retry-after-ms"])
+        if delay is not None:
+            return delay / 1000
+    if "retry-after" in headers:
+        delay = _parse_duration(headers["retry-after"])
+        if delay is not None:
+            return delay
+        try:
+            retry_at = parsedate_to_datetime(headers["retry-after"])
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    if headers.get("x-ratelimit-remaining-requests") == "0" and "x-ratelimit-reset-requests" in headers:
+        return _parse_duration(headers["x-ratelimit-reset-requests"])  # OpenAI style: "6m0s"
+    if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        try:
+            reset_ms = float(headers["x-ratelimit-reset"])  # OpenRouter style: epoch milliseconds
+            return max(0.0, reset_ms / 1000 - time.time())
+        except ValueError:
+            return None
+    return None
+
+
+def _error_headers(error: BaseException) -> Mapping[str, str]:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+class RateLimiter:
+    """Token buckets keyed per provider endpoint and model, plus retry with jittered backoff.
+
+    ``requests_per_minute`` caps every bucket up front; without it the
+    buckets only start limiting once a provider returns 429.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.rate = requests_per_minute / 60 if requests_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, agent_config: Dict) -> TokenBucket:
+        """Bucket of the endpoint an agent sends to, the first in its config_list"""
+        return self.endpoint_bucket((agent_config.get("config_list") or [{}])[0])
+
+    def endpoint_bucket(self, config: Dict) -> TokenBucket:
+        """Bucket shared by every request to one endpoint and model"""
+        key = f"{config.get('base_url', '')}|{config.get('model', '')}"
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(rate=self.rate, max_rate=self.rate)
+            return self._buckets[key]
+
+    def attach(self, agent: autogen.ConversableAgent) -> None:
+        """Agent hook that rate-limits the agent's completions and retries transient errors.
+
+        When the agent's requests go through an :class:`~endpoint_router.EndpointRouter`
+        using this limiter, the router waits on the bucket of each endpoint it
+        picks, and the hook only retries.
+        """
+        client = getattr(agent, "client", None)
+        if client is None or getattr(client, "rate_limiter", None) is self:
+            return
+
+        router = getattr(client, "endpoint_router", None)
+        bucket = None if getattr(router, "rate_limiter", None) is self else self.bucket(agent.llm_config)
+        create = client.create
+
+        def limited_create(**config: Any) -> Any:
+            attempt = 0
+            while True:
+                if bucket is not None:
+                    bucket.acquire()
+                try:
+                    response = create(**config)
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(bucket, e, attempt)
+                    print(f"{agent.name}: {type(e).__name__}, retrying in {delay:.1f}s "
+                          f"(attempt {attempt + 1} of {self.max_retries})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if bucket is not None:
+                    bucket.on_success()
+                return response
+
+        client.create = limited_create
+        client.rate_limiter = self
+
+    def _backoff(self, bucket: Optional[TokenBucket], error: BaseException, attempt: int) -> float:
+        """Full-jitter exponential backoff, never shorter than what the provider asked for"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_delay_from_headers(_error_headers(error))
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay * 5))
+        if bucket is not None:
+            self.on_error(bucket, error, delay)
+        return delay
+
+    def on_error(self, bucket: TokenBucket, error: BaseException, delay: Optional[float] = None) -> None:
+        """Slow ``bucket`` down if ``error`` is a rate limit, holding it for ``delay`` or as long as asked"""
+        if not (isinstance(error, openai.RateLimitError) or getattr(error, "status_code", None) == 429):
+            return
+        if delay is None:
+            requested = retry_delay_from_headers(_error_headers(error))
+            delay = min(requested, self.max_delay * 5) if requested is not None else self.base_delay
+        bucket.on_rate_limited()
+        # Hold every caller sharing this bucket, not just the one that was refused
+        bucket.pause_until(time.monotonic() + delay)
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """Process-wide limiter so concurrent runs share each provider's quota.
+
+    ``LLM_REQUESTS_PER_MINUTE`` sets an upfront cap and ``LLM_MAX_RETRIES``
+    the retries per request (default 5).
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            rpm = os.getenv("LLM_REQUESTS_PER_MINUTE")
+            _shared_limiter = RateLimiter(
+                requests_per_minute=float(rpm) if rpm else None,
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")),
+            )
+        return _shared_limiter
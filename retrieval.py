@@ -0,0 +1,117 @@
+"""Dependency-free BM25 retrieval over passages of the chapters written so far."""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i in into is it its me my no not of on or our
+she so than that the their them then there they this to up was we were what when which who will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS and len(word) > 1]
+
+
+class Passage(NamedTuple):
+    chapter: int
+    index: int  # Position of the passage within its chapter
+    text: str
+    score: float
+
+
+class PassageIndex:
+    """Inverted index with BM25 scoring, updated one chapter at a time.
+
+    Chapters are split into passages of whole paragraphs of about
+    ``passage_words`` words. Adding a chapter again replaces its previous
+    passages, so a rewritten chapter is never retrieved in its old form.
+    """
+
+    def __init__(self, passage_words: int = 150, k1: float = 1.5, b: float = 0.75):
+        self.passage_words = passage_words
+        self.k1 = k1
+        self.b = b
+        self._passages: Dict[int, Tuple[int, int, str]] = {}  # id -> (chapter, index, text)
+        self._lengths: Dict[int, int] = {}
+        self._terms: Dict[int, List[str]] = {}  # Distinct terms of each passage, to unindex it
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> passage id -> term frequency
+        self._chapters: Dict[int, List[int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, chapter: int) -> bool:
+        return chapter in self._chapters
+
+    def _split(self, text: str) -> List[str]:
+        passages, current, words = [], [], 0
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            current.append(paragraph)
+            words += len(paragraph.split())
+            if words >= self.passage_words:
+                passages.append("\n\n".join(current))
+                current, words = [], 0
+        if current:
+            passages.append("\n\n".join(current))
+        return passages
+
+    def _remove(self, chapter: int) -> None:
+        for passage_id in self._chapters.pop(chapter, []):
+            del self._passages[passage_id]
+            self._total_length -= self._lengths.pop(passage_id)
+            for term in self._terms.pop(passage_id):
+                postings = self._postings[term]
+                del postings[passage_id]
+                if not postings:
+                    del self._postings[term]
+
+    def add_chapter(self, chapter: int, text: str) -> None:
+        """Index a saved chapter, replacing any earlier version of it"""
+        with self._lock:
+            self._remove(chapter)
+            ids = []
+            for index, passage in enumerate(self._split(text)):
+                terms = Counter(tokenize(passage))
+                passage_id = self._next_id
+                self._next_id += 1
+                self._passages[passage_id] = (chapter, index, passage)
+                self._lengths[passage_id] = sum(terms.values())
+                self._total_length += self._lengths[passage_id]
+                self._terms[passage_id] = list(terms)
+                for term, count in terms.items():
+                    self._postings.setdefault(term, {})[passage_id] = count
+                ids.append(passage_id)
+            self._chapters[chapter] = ids
+
+    def remove_chapter(self, chapter: int) -> None:
+        with self._lock:
+            self._remove(chapter)
+
+    def search(self, query: str, limit: int = 3, chapters: Optional[Iterable[int]] = None) -> List[Passage]:
+        """The ``limit`` passages scoring highest for ``query``, optionally only from ``chapters``"""
+        allowed = set(chapters) if chapters is not None else None
+        with self._lock:
+            count = len(self._passages)
+            if not count:
+                return []
+            average = self._total_length / count or 1
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, frequency in postings.items():
+                    if allowed is not None and self._passages[passage_id][0] not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[passage_id] / average)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [Passage(*self._passages[passage_id], score=score) for passage_id, score in best]
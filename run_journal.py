@@ -0,0 +1,113 @@
+"""Crash-safe record of a generation run, used to resume where it stopped."""
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from chapter_store import atomic_write_text
+
+JOURNAL_FILENAME = "run_journal.json"
+JOURNAL_VERSION = 1
+
+
+class RunJournal:
+    """Structured outline, chapter status and memory of one run, saved after every step.
+
+    Each save writes a temporary file and atomically replaces the journal, so
+    a crash leaves either the previous or the new state on disk, never a
+    partial file.
+    """
+
+    def __init__(self, path: Path, data: Dict[str, Any]):
+        self.path = Path(path)
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path: Path, request: Dict[str, Any], config_hash: str) -> "RunJournal":
+        """Start a fresh journal for a run, replacing any previous one"""
+        now = datetime.now().isoformat(timespec="seconds")
+        journal = cls(path, {
+            "version": JOURNAL_VERSION,
+            "created": now,
+            "updated": now,
+            "config_hash": config_hash,
+            "request": request,
+            "outline": None,
+            "chapters": {},
+            "memory": None,
+        })
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, path: Path) -> "RunJournal":
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"No run journal found at {path}")
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != JOURNAL_VERSION:
+            raise ValueError(f"Unsupported run journal version {data.get('version')!r} in {path}")
+        return cls(path, data)
+
+    @property
+    def request(self) -> Dict[str, Any]:
+        return self.data["request"]
+
+    @property
+    def outline(self) -> Optional[List[Dict]]:
+        return self.data["outline"]
+
+    @property
+    def memory(self) -> Optional[Dict[str, Any]]:
+        return self.data["memory"]
+
+    def check_compatible(self, request: Dict[str, Any], config_hash: str) -> None:
+        """Refuse to resume a run started with a different request or model configuration"""
+        if self.data["config_hash"] != config_hash:
+            raise ValueError(
+                f"Run journal {self.path} was written with a different model configuration; "
+                "start a new run instead of resuming"
+            )
+        changed = sorted(key for key in request if self.request.get(key) != request[key])
+        if changed:
+            raise ValueError(f"Run journal {self.path} was written for a different request ({', '.join(changed)})")
+
+    def chapter_status(self, chapter_number: int) -> Optional[str]:
+        return self.data["chapters"].get(str(chapter_number), {}).get("status")
+
+    def record_outline(self, outline: List[Dict]) -> None:
+        with self._lock:
+            self.data["outline"] = outline
+            self._save()
+
+    def reset_chapters(self) -> None:
+        """Forget chapter progress made against an outline that was never recorded"""
+        with self._lock:
+            if self.data["chapters"] or self.data["memory"] is not None:
+                self.data["chapters"] = {}
+                self.data["memory"] = None
+                self._save()
+
+    def record_chapter(self, chapter_number: int, status: str,
+                       memory: Optional[Dict[str, Any]] = None) -> None:
+        """Record a chapter's status ("drafted", "complete" or "failed") and the memory after it"""
+        with self._lock:
+            self.data["chapters"][str(chapter_number)] = {
+                "status": status,
+                "updated": datetime.now().isoformat(timespec="seconds"),
+            }
+            if memory is not None:
+                self.data["memory"] = memory
+            self._save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        self.data["updated"] = datetime.now().isoformat(timespec="seconds")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self.path, json.dumps(self.data, indent=2))
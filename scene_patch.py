@@ -0,0 +1,162 @@
+"""Apply an editor's anchored edits to a draft instead of having the whole chapter rewritten."""
+import json
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+EDIT_MODES = ("rewrite", "patch")
+EDITS_MARKER = "EDITS:"
+EDIT_OPS = ("replace", "insert_before", "insert_after", "delete")
+
+EDIT_FORMAT = """After 'EDITS:' give a JSON array of edits to the draft, for example:
+EDITS:
+[
+  {"op": "replace", "paragraph": 3, "text": "The rewritten third paragraph."},
+  {"op": "replace", "anchor": "exact words from the draft", "text": "their replacement"},
+  {"op": "insert_after", "paragraph": 7, "text": "A new paragraph."},
+  {"op": "delete", "paragraph": 12}
+]
+"op" is one of replace, insert_before, insert_after or delete. Locate each edit by "paragraph"
+(numbered from 1 in the draft as given) or by "anchor", a short exact quote from the draft.
+A replace or delete with an anchor changes only the quoted words. Return [] when nothing needs to change."""
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER_PREFIX = re.compile(r"^\[\d+\]\s*")  # Copied from a numbered draft
+
+
+class PatchError(ValueError):
+    """The editor's reply has no usable edits or they do not fit the draft"""
+
+
+class Edit(NamedTuple):
+    op: str
+    paragraph: Optional[int] = None  # 1-based index into the draft's paragraphs
+    anchor: Optional[str] = None  # Exact quote locating the edit instead of an index
+    text: str = ""
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+def number_paragraphs(text: str) -> str:
+    """Draft with ``[n]`` before each paragraph, so edits can refer to them by index"""
+    return "\n\n".join(f"[{number}] {paragraph}" for number, paragraph in enumerate(split_paragraphs(text), 1))
+
+
+def number_draft_messages(messages: List[Dict]) -> List[Dict]:
+    """Chat history with the paragraphs of the writer's latest draft numbered.
+
+    Registered on the editor as a ``process_all_messages_before_reply`` hook
+    in group chats, so its edits count paragraphs the way :func:`apply_edits`
+    does; the stored history keeps the plain draft.
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        content = message.get("content")
+        if message.get("name") == "writer" and isinstance(content, str) and "SCENE:" in content:
+            head, scene = content.split("SCENE:", 1)
+            numbered = dict(message, content=f"{head}SCENE:\n{number_paragraphs(scene)}")
+            return messages[:index] + [numbered] + messages[index + 1:]
+    return messages
+
+
+def _to_edit(raw: Dict) -> Edit:
+    if not isinstance(raw, dict):
+        raise PatchError(f"Edit is not an object: {raw!r}")
+    op = str(raw.get("op", "")).lower()
+    if op not in EDIT_OPS:
+        raise PatchError(f"Unknown edit operation {op!r}")
+    paragraph = raw.get("paragraph")
+    anchor = raw.get("anchor")
+    if paragraph is None and not anchor:
+        raise PatchError(f"{op} edit has neither a paragraph nor an anchor")
+    if paragraph is not None:
+        try:
+            paragraph = int(paragraph)
+        except (TypeError, ValueError):
+            raise PatchError(f"Paragraph {paragraph!r} is not a number")
+    text = _NUMBER_PREFIX.sub("", str(raw.get("text") or "").strip())
+    if op != "delete" and not text:
+        raise PatchError(f"{op} edit has no text")
+    return Edit(op, paragraph, _NUMBER_PREFIX.sub("", str(anchor)) if anchor else None, text)
+
+
+def parse_edits(reply: str) -> List[Edit]:
+    """Edits from the JSON array after ``EDITS:`` in an editor's reply"""
+    if EDITS_MARKER not in reply:
+        raise PatchError("Reply has no EDITS section")
+    body = reply.split(EDITS_MARKER, 1)[1]
+    start = body.find("[")
+    if start == -1:
+        raise PatchError("EDITS section has no JSON array")
+    try:
+        raw_edits, _ = json.JSONDecoder().raw_decode(body, start)
+    except json.JSONDecodeError as e:
+        raise PatchError(f"EDITS are not valid JSON: {e}")
+    if not isinstance(raw_edits, list):
+        raise PatchError("EDITS are not a JSON array")
+    return [_to_edit(raw) for raw in raw_edits]
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _locate(paragraphs: List[str], edit: Edit) -> int:
+    """Index of the paragraph an edit refers to, in the unedited draft"""
+    if edit.paragraph is not None:
+        if not 1 <= edit.paragraph <= len(paragraphs):
+            raise PatchError(f"Paragraph {edit.paragraph} is outside the draft's {len(paragraphs)} paragraphs")
+        return edit.paragraph - 1
+    anchor = _normalize(edit.anchor)
+    matches = [index for index, paragraph in enumerate(paragraphs) if anchor in _normalize(paragraph)]
+    if not matches:
+        raise PatchError(f"Anchor not found in the draft: {edit.anchor[:60]!r}")
+    if len(matches) > 1:
+        raise PatchError(f"Anchor appears in {len(matches)} paragraphs: {edit.anchor[:60]!r}")
+    return matches[0]
+
+
+def apply_edits(draft: str, edits: List[Edit]) -> str:
+    """Apply ``edits`` to ``draft`` and return the edited text.
+
+    Every edit refers to the draft as it was given, so their order does not
+    matter. Raises :class:`PatchError` when an edit cannot be placed or two
+    edits rewrite the same paragraph.
+    """
+    paragraphs = split_paragraphs(draft)
+    if not paragraphs:
+        raise PatchError("Draft is empty")
+
+    edited = list(paragraphs)
+    rewritten = set()  # Paragraphs replaced or deleted as a whole
+    before: Dict[int, List[str]] = {}
+    after: Dict[int, List[str]] = {}
+    for edit in edits:
+        index = _locate(paragraphs, edit)
+        if edit.op == "insert_before":
+            before.setdefault(index, []).append(edit.text)
+        elif edit.op == "insert_after":
+            after.setdefault(index, []).append(edit.text)
+        elif edit.paragraph is None:
+            # Anchored replace or delete: change only the quoted words
+            if index in rewritten:
+                raise PatchError(f"Paragraph {index + 1} is edited more than once")
+            pattern = r"\s+".join(re.escape(word) for word in edit.anchor.split())
+            edited[index], count = re.subn(pattern, lambda _: edit.text, edited[index], count=1)
+            if not count:
+                raise PatchError(f"Anchor overlaps an earlier edit: {edit.anchor[:60]!r}")
+        else:
+            if index in rewritten or edited[index] != paragraphs[index]:
+                raise PatchError(f"Paragraph {index + 1} is edited more than once")
+            rewritten.add(index)
+            edited[index] = edit.text if edit.op == "replace" else ""
+
+    result = []
+    for index, paragraph in enumerate(edited):
+        result.extend(before.get(index, []))
+        if paragraph.strip():
+            result.append(paragraph.strip())
+        result.extend(after.get(index, []))
+    return "\n\n".join(result)
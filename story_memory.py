@@ -0,0 +1,119 @@
+"""Bounded, hierarchical memory of what has happened in the book so far."""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from text_utils import compress_parts, truncate_to_tokens
+
+# Condenses a list of memory entries into a single text of at most N tokens.
+Summarizer = Callable[[List[str], int], str]
+
+
+class StoryMemory:
+    """Chapter memory whose rendered size stays within a fixed token budget.
+
+    The most recent chapters are kept verbatim, older chapters are rolled up
+    into act summaries of ``act_size`` chapters, and acts that fall out of the
+    act window are folded into one running synopsis of the whole book.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1500,
+        recent_chapters: int = 3,
+        act_size: int = 5,
+        max_acts: int = 3,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.token_budget = token_budget
+        self.recent_chapters = max(1, recent_chapters)
+        self.act_size = max(1, act_size)
+        self.max_acts = max(1, max_acts)
+        self.summarizer = summarizer
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget everything remembered so far"""
+        self.recent: List[Tuple[int, str]] = []
+        self.pending: List[Tuple[int, str]] = []  # Left the recent window, awaiting a full act
+        self.acts: List[Dict] = []
+        self.synopsis = ""
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable snapshot of the remembered state"""
+        return {
+            "recent": [list(entry) for entry in self.recent],
+            "pending": [list(entry) for entry in self.pending],
+            "acts": [dict(act) for act in self.acts],
+            "synopsis": self.synopsis,
+        }
+
+    def load_dict(self, state: Dict) -> None:
+        """Restore a snapshot taken with :meth:`to_dict`"""
+        self.recent = [(number, text) for number, text in state.get("recent", [])]
+        self.pending = [(number, text) for number, text in state.get("pending", [])]
+        self.acts = [dict(act) for act in state.get("acts", [])]
+        self.synopsis = state.get("synopsis", "")
+
+    @property
+    def _synopsis_tokens(self) -> int:
+        return self.token_budget // 5
+
+    @property
+    def _act_tokens(self) -> int:
+        return (self.token_budget * 7 // 20) // self.max_acts
+
+    @property
+    def _entry_tokens(self) -> int:
+        detail_budget = self.token_budget - self._synopsis_tokens - self._act_tokens * self.max_acts
+        return max(1, detail_budget // (self.recent_chapters + self.act_size - 1))
+
+    def add(self, chapter_number: int, summary: str) -> None:
+        """Remember a chapter summary, rolling older chapters up as needed"""
+        self.recent.append((chapter_number, summary.strip()))
+        while len(self.recent) > self.recent_chapters:
+            self.pending.append(self.recent.pop(0))
+        while len(self.pending) >= self.act_size:
+            self._roll_up_act()
+
+    def _roll_up_act(self) -> None:
+        chapters, self.pending = self.pending[:self.act_size], self.pending[self.act_size:]
+        start, end = chapters[0][0], chapters[-1][0]
+        summary = self._summarize(
+            [f"Chapter {number}: {text}" for number, text in chapters], self._act_tokens
+        )
+        self.acts.append({"start": start, "end": end, "summary": summary})
+
+        while len(self.acts) > self.max_acts:
+            oldest = self.acts.pop(0)
+            self.synopsis = self._summarize(
+                [self.synopsis, f"Chapters {oldest['start']}-{oldest['end']}: {oldest['summary']}"],
+                self._synopsis_tokens,
+            )
+
+    def _summarize(self, parts: List[str], max_tokens: int) -> str:
+        if self.summarizer is not None:
+            try:
+                condensed = self.summarizer([part for part in parts if part], max_tokens)
+                if condensed and condensed.strip():
+                    return truncate_to_tokens(condensed, max_tokens)
+            except Exception as e:
+                print(f"Memory summarizer failed, compressing locally: {str(e)}")
+        return compress_parts(parts, max_tokens)
+
+    def render(self) -> str:
+        """Format the memory for inclusion in a chapter prompt"""
+        sections = []
+        if self.synopsis:
+            sections.append(f"Story So Far:\n{self.synopsis}")
+        if self.acts:
+            sections.append("\n".join([
+                "Earlier Acts:",
+                *[f"Chapters {act['start']}-{act['end']}: {act['summary']}" for act in self.acts]
+            ]))
+        details = self.pending + self.recent
+        if details:
+            sections.append("\n".join([
+                "Previous Chapter Summaries:",
+                *[f"Chapter {number}: {truncate_to_tokens(text, self._entry_tokens)}"
+                  for number, text in details]
+            ]))
+        return "\n\n".join(sections)
@@ -0,0 +1,193 @@
+"""Characters, places and events parsed from the memory keeper's updates, indexed by name and chapter."""
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+STORY_STATE_FILENAME = "story_state.sqlite"
+FACT_KINDS = ("event", "character", "world")
+
+_FACT_LINE = re.compile(r"^[\s*>-]*(EVENT|CHARACTER|WORLD)\s*:\**\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+_NAME_DETAIL = re.compile(r"^(.+?)\s+[-–—]\s+(.+)$|^([^:]+?):\s+(.+)$")
+
+
+class Fact(NamedTuple):
+    chapter: int
+    kind: str  # One of FACT_KINDS
+    name: str  # Character or place; empty for events
+    detail: str
+
+
+def parse_memory_update(text: str) -> List[Fact]:
+    """EVENT:, CHARACTER: and WORLD: lines of a memory update, as chapter-less facts.
+
+    ``CHARACTER: Dane - more confident`` becomes the character "Dane" with the
+    detail "more confident"; events keep their whole line as the detail.
+    Character and world lines without a ``<Name> - <detail>`` split are
+    skipped, as their text would never match a name in the outline.
+    """
+    facts = []
+    for match in _FACT_LINE.finditer(text):
+        kind, body = match.group(1).lower(), match.group(2).strip("* ")
+        if not body or body.upper() == "NONE":
+            continue
+        if kind == "event":
+            facts.append(Fact(0, kind, "", body))
+            continue
+        split = _NAME_DETAIL.match(body)
+        if not split:
+            print(f"Skipping {kind.upper()} line without a name: {body}")
+            continue
+        name, detail = (split.group(1), split.group(2)) if split.group(1) else (split.group(3), split.group(4))
+        facts.append(Fact(0, kind, name.strip("*[] "), detail.strip()))
+    return facts
+
+
+class StoryState:
+    """Structured story facts in memory, optionally persisted to SQLite.
+
+    Facts are indexed by lowercased entity name and by chapter, so a chapter
+    prompt can carry just the characters and places its outline entry
+    mentions. With ``path`` every change is also written to a SQLite file and
+    existing facts are loaded from it.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else None
+        self.facts: List[Fact] = []
+        self._by_name: Dict[str, List[Fact]] = {}
+        self._by_chapter: Dict[int, List[Fact]] = {}
+        self._display_names: Dict[str, str] = {}
+        self._name_pattern: Optional[re.Pattern] = None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS facts ("
+                "id INTEGER PRIMARY KEY, chapter INTEGER NOT NULL, kind TEXT NOT NULL, "
+                "name TEXT NOT NULL, key TEXT NOT NULL, detail TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS facts_key ON facts(key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS facts_chapter ON facts(chapter)")
+            self._conn.commit()
+            rows = self._conn.execute("SELECT chapter, kind, name, detail FROM facts ORDER BY id").fetchall()
+            for row in rows:
+                self._index(Fact(*row))
+
+    def _index(self, fact: Fact) -> None:
+        self.facts.append(fact)
+        self._by_chapter.setdefault(fact.chapter, []).append(fact)
+        if fact.name:
+            key = fact.name.lower()
+            if key not in self._by_name:
+                self._name_pattern = None  # A new name to look for
+            self._by_name.setdefault(key, []).append(fact)
+            self._display_names[key] = fact.name
+
+    def add(self, chapter: int, kind: str, name: str, detail: str) -> None:
+        if kind not in FACT_KINDS:
+            raise ValueError(f"Unknown fact kind {kind!r}; expected one of {FACT_KINDS}")
+        fact = Fact(chapter, kind, name.strip(), detail.strip())
+        with self._lock:
+            self._index(fact)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO facts (chapter, kind, name, key, detail) VALUES (?, ?, ?, ?, ?)",
+                    (fact.chapter, fact.kind, fact.name, fact.name.lower(), fact.detail),
+                )
+                self._conn.commit()
+
+    def record_update(self, chapter: int, text: str) -> int:
+        """Parse a memory update and store its facts under ``chapter``; returns how many were found"""
+        facts = parse_memory_update(text)
+        for fact in facts:
+            self.add(chapter, fact.kind, fact.name, fact.detail)
+        return len(facts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.facts = []
+            self._by_name = {}
+            self._by_chapter = {}
+            self._display_names = {}
+            self._name_pattern = None
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM facts")
+                self._conn.commit()
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable snapshot, stored with the run journal's memory"""
+        return {"facts": [list(fact) for fact in self.facts]}
+
+    def load_dict(self, state: Dict) -> None:
+        """Replace the stored facts with a snapshot taken with :meth:`to_dict`"""
+        self.clear()
+        for chapter, kind, name, detail in state.get("facts", []):
+            self.add(chapter, kind, name, detail)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @property
+    def world_elements(self) -> Dict[str, str]:
+        """Latest description of each place or world element"""
+        return {fact.name: fact.detail for fact in self.facts if fact.kind == "world"}
+
+    @property
+    def character_developments(self) -> Dict[str, List[str]]:
+        """Every development recorded for each character, oldest first"""
+        developments: Dict[str, List[str]] = {}
+        for fact in self.facts:
+            if fact.kind == "character":
+                developments.setdefault(fact.name, []).append(fact.detail)
+        return developments
+
+    def chapter_facts(self, chapter: int) -> List[Fact]:
+        return list(self._by_chapter.get(chapter, []))
+
+    def mentioned_in(self, text: str) -> Set[str]:
+        """Lowercased names of known characters and places that ``text`` mentions"""
+        with self._lock:
+            if not self._by_name:
+                return set()
+            if self._name_pattern is None:
+                names = sorted(self._by_name, key=len, reverse=True)
+                self._name_pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in names) + r")\b",
+                                                re.IGNORECASE)
+            pattern = self._name_pattern
+        return {match.group(1).lower() for match in pattern.finditer(text)}
+
+    def render_for(self, text: str, max_details: int = 3, max_events: int = 5) -> str:
+        """State of the characters and places ``text`` mentions, for a chapter prompt"""
+        names = self.mentioned_in(text)
+        if not names:
+            return ""
+        characters, places = [], []
+        for key in sorted(names):
+            facts = self._by_name[key]
+            name = self._display_names[key]
+            developments = [f for f in facts if f.kind == "character" and f.detail][-max_details:]
+            if developments:
+                characters.append(f"- {name}: " + "; ".join(f"{f.detail} (ch. {f.chapter})" for f in developments))
+            world = [f for f in facts if f.kind == "world" and f.detail]
+            if world:
+                places.append(f"- {name}: {world[-1].detail} (ch. {world[-1].chapter})")
+        events = [
+            fact for fact in self.facts
+            if fact.kind == "event" and any(name in fact.detail.lower() for name in names)
+        ][-max_events:]
+
+        parts = []
+        if characters:
+            parts += ["Characters in this chapter:", *characters]
+        if places:
+            parts += ["Places in this chapter:", *places]
+        if events:
+            parts += ["Related events so far:", *(f"- {fact.detail} (ch. {fact.chapter})" for fact in events)]
+        return "\n".join(parts)
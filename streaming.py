@@ -0,0 +1,59 @@
+"""Relay streamed completion tokens from selected agents to a callback."""
+from typing import Any, Callable, Dict, Sequence
+
+import autogen
+from autogen.io import IOStream
+
+from agents import AgentHook
+from telemetry import current_labels, note_first_token
+
+# Receives each text chunk with the agent, phase and chapter that produced it
+StreamCallback = Callable[[str, Dict[str, Any]], None]
+
+STREAMING_AGENTS = ("writer", "writer_final", "editor")
+
+
+class StreamRelay:
+    """IOStream that hands completion chunks to a callback and everything else to the console.
+
+    AutoGen prints each streamed chunk with ``end=""`` and ``flush=True``;
+    its other output (colour codes, message headers) is passed through.
+    """
+
+    def __init__(self, callback: StreamCallback, info: Dict[str, Any], console: IOStream):
+        self.callback = callback
+        self.info = info
+        self.console = console
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False) -> None:
+        self.console.print(*objects, sep=sep, end=end, flush=flush)
+        if end == "" and flush and objects:
+            note_first_token()
+            try:
+                self.callback(sep.join(str(obj) for obj in objects), self.info)
+            except Exception as e:
+                print(f"Stream callback failed: {str(e)}")
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        return self.console.input(prompt, password=password)
+
+
+def stream_agents(callback: StreamCallback, agent_names: Sequence[str] = STREAMING_AGENTS) -> AgentHook:
+    """Agent hook that requests streamed completions and relays their chunks to ``callback``"""
+    def hook(agent: autogen.ConversableAgent) -> None:
+        client = getattr(agent, "client", None)
+        if agent.name not in agent_names or client is None or getattr(client, "stream_relay", None):
+            return
+
+        create = client.create
+
+        def streamed_create(**config: Any) -> Any:
+            info = {"agent": agent.name, **current_labels(agent)}
+            relay = StreamRelay(callback, info, IOStream.get_default())
+            with IOStream.set_default(relay):
+                return create(**{"stream": True, **config})
+
+        client.create = streamed_create
+        client.stream_relay = callback
+
+    return hook
@@ -1,9 +1,13 @@
 from html import escape
 from pathlib import Path
 import os
+import time
 
 import streamlit as st
-from generation_service import run_generation
+from chapter_store import CHAPTER_MANIFEST_FILENAME
+from exporter import EXPORT_EXTENSIONS, EXPORT_FORMATS, EXPORT_MIME_TYPES
+from generation_service import export_manuscript
+from job_manager import JobManager
 
 st.set_page_config(page_title="AI Book Writer", page_icon=":books:", layout="wide")
 
@@ -203,6 +207,15 @@ st.markdown(
         flex: 1;
     }
 
+    .stream-text {
+        white-space: pre-wrap;
+        max-height: 22rem;
+        overflow-y: auto;
+        color: rgba(226, 232, 240, 0.9);
+        font-size: 0.95rem;
+        line-height: 1.6;
+    }
+
     .tab-content {
         margin-top: 1.5rem;
     }
@@ -279,12 +292,34 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-if "result" not in st.session_state:
-    st.session_state["result"] = None
-if "progress_log" not in st.session_state:
-    st.session_state["progress_log"] = []
-if "last_request" not in st.session_state:
-    st.session_state["last_request"] = None
+POLL_SECONDS = 1.0
+LOG_BLOCK = 100  # Log entries rendered together and cached once complete
+CHAPTERS_PER_PAGE = 5
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """One job manager per server process, shared by every browser session"""
+    return JobManager(max_workers=int(os.getenv("BOOK_JOB_WORKERS", "2")))
+
+
+job_manager = get_job_manager()
+
+
+# Job ids live in the URL rather than the session, so a reload or reconnect finds the jobs again
+def watched_job_ids():
+    return [job_id for job_id in st.query_params.get("jobs", "").split(",") if job_id.isalnum()]
+
+
+def watch_jobs(job_ids, selected=None):
+    if job_ids:
+        st.query_params["jobs"] = ",".join(job_ids)
+    else:
+        st.query_params.pop("jobs", None)
+    if selected:
+        st.query_params["job"] = selected
+    elif st.query_params.get("job") not in job_ids:
+        st.query_params.pop("job", None)
 
 hero_left, hero_right = st.columns([1.8, 1])
 with hero_left:
@@ -331,14 +366,62 @@ st.markdown(
 )
 
 
-def build_progress_markup(log_lines):
-    if not log_lines:
-        return ""
-    entries = "".join(
+def build_log_entries(log_lines):
+    return "".join(
         f"<div class='log-entry'><span class='log-dot'></span><span class='log-text'>{escape(line)}</span></div>"
         for line in log_lines
     )
-    return f"<div class='progress-card'><h3>Activity log</h3>{entries}</div>"
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def log_block_markup(job_id, created, start):
+    """Markup for a full block of a job's log; the log is append-only, so a full block never changes"""
+    return build_log_entries(job_manager.get(job_id).progress[start:start + LOG_BLOCK])
+
+
+def build_progress_markup(job, show_all=False):
+    """Activity log of a job; only the unfinished last block is rebuilt on each rerun"""
+    count = len(job.progress)  # The job may append while this runs
+    if not count:
+        return ""
+    complete = count // LOG_BLOCK * LOG_BLOCK
+    first = 0 if show_all else max(0, complete - LOG_BLOCK)  # Otherwise the last full block and the tail
+    entries = "".join(log_block_markup(job.id, job.created, start) for start in range(first, complete, LOG_BLOCK))
+    entries += build_log_entries(job.progress[complete:count])
+    heading = "Activity log" + (f" · {first} earlier entries hidden" if first else "")
+    return f"<div class='progress-card'><h3>{heading}</h3>{entries}</div>"
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def read_text_file(path, mtime_ns):
+    """File contents, read again only when its modification time changes"""
+    with open(path, "r", encoding="utf-8") as handle:
+        return handle.read()
+
+
+def cached_text(path):
+    return read_text_file(str(path), Path(path).stat().st_mtime_ns)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def exported_book(output_dir, export_format, manifest_mtime_ns):
+    """The book in ``export_format``, exported again only after a chapter is saved"""
+    return export_manuscript(output_dir, export_format).read_bytes()
+
+
+def build_stream_markup(info, text, tail_chars=3000):
+    if not text:
+        return ""
+    source = info.get("agent", "agent").replace("_", " ").title()
+    if info.get("chapter"):
+        source = f"{source} · Chapter {info['chapter']}"
+    visible = text[-tail_chars:]
+    if len(text) > tail_chars:
+        visible = "…" + visible
+    return (
+        f"<div class='progress-card'><h3>Live draft — {escape(source)}</h3>"
+        f"<div class='stream-text'>{escape(visible)}</div></div>"
+    )
 
 
 def build_request_summary(request_meta):
@@ -421,15 +504,56 @@ with st.form("generation_form"):
             help="Use the OpenRouter model list endpoint to explore available models.",
         )
 
-    submitted = st.form_submit_button("Run agents", type="primary")
+    concurrency = st.number_input(
+        "Parallel chapter drafts",
+        min_value=1,
+        max_value=16,
+        value=1,
+        help="Draft this many chapters at once, then run a quick continuity pass. Match it to your endpoint's capacity.",
+    )
+
+    windowed_context = st.toggle(
+        "Windowed outline context",
+        value=False,
+        help="Send each chapter only its neighbours and a table of contents instead of the full outline.",
+    )
+
+    direct_pipeline = st.toggle(
+        "Direct agent pipeline",
+        value=False,
+        help="Call the agents one after another with only the inputs each needs instead of a shared group chat.",
+    )
+
+    patch_edits = st.toggle(
+        "Patch-based editing",
+        value=False,
+        help="Have the editor return targeted edits that are applied locally instead of rewriting each chapter in full.",
+    )
+
+    continuity_mode = st.selectbox(
+        "Continuity checks",
+        options=["llm", "local", "hybrid"],
+        format_func={
+            "llm": "Memory keeper (LLM)",
+            "local": "Local rules",
+            "hybrid": "Local rules, LLM for unclear cases",
+        }.get,
+        help="Local rules check each saved chapter in milliseconds and skip the memory keeper's turn per chapter.",
+    )
+
+    use_cache = st.toggle(
+        "Reuse cached responses",
+        value=False,
+        help="Serve identical LLM requests from the on-disk cache so reruns skip completed work.",
+    )
 
-log_placeholder = st.empty()
+    submitted = st.form_submit_button("Run agents", type="primary")
 
 if submitted:
     sanitized_endpoint = endpoint_input.strip() if endpoint_input else None
     model_override = model_name.strip() if model_name else ""
 
-    st.session_state["last_request"] = {
+    request_meta = {
         "provider": provider_choice,
         "chapters": num_chapters,
         "generate_book": generate_book,
@@ -437,41 +561,72 @@ if submitted:
             "Automatic selection" if use_openrouter else "Server default"
         ),
     }
-
-    st.session_state["progress_log"] = []
-    log_placeholder.empty()
-
-    def update_progress(message: str) -> None:
-        st.session_state["progress_log"].append(message)
-        log_markup = build_progress_markup(st.session_state["progress_log"])
-        if log_markup:
-            log_placeholder.markdown(log_markup, unsafe_allow_html=True)
-
-    try:
-        with st.spinner("Coordinating agents..."):
-            st.session_state["result"] = run_generation(
-                initial_prompt=prompt,
-                num_chapters=num_chapters,
-                local_url=sanitized_endpoint,
-                use_openrouter=use_openrouter,
-                model=model_override or None,
-                generate_book=generate_book,
-                progress_callback=update_progress,
-            )
-        st.success("Generation finished. Scroll down to review the results.")
-    except Exception as exc:
-        st.session_state["result"] = None
-        st.error(f"Generation failed: {exc}")
-
-if st.session_state["progress_log"]:
-    log_markup = build_progress_markup(st.session_state["progress_log"])
+    job = job_manager.submit(
+        {
+            "initial_prompt": prompt,
+            "num_chapters": num_chapters,
+            "local_url": sanitized_endpoint,
+            "use_openrouter": use_openrouter,
+            "model": model_override or None,
+            "generate_book": generate_book,
+            "use_cache": use_cache,
+            "concurrency": int(concurrency),
+            "context_mode": "window" if windowed_context else "full",
+            "execution_mode": "pipeline" if direct_pipeline else "groupchat",
+            "edit_mode": "patch" if patch_edits else "rewrite",
+            "continuity_mode": continuity_mode,
+        },
+        meta=request_meta,
+    )
+    watch_jobs(watched_job_ids() + [job.id], selected=job.id)
+    st.success(f"Started job {job.id}. It keeps running if you reload or close this page.")
+
+job_ids = watched_job_ids()
+if job_ids:
+    st.subheader("Jobs")
+    for job_id in job_ids:
+        job = job_manager.get(job_id)
+        label_col, view_col, action_col, remove_col = st.columns([4, 1, 1, 1])
+        with label_col:
+            if job is None:
+                st.markdown(f"**{job_id}** · not running on this server")
+            else:
+                chapters_text = f"{job.meta.get('chapters', '?')} chapters" if job.meta else "resumed run"
+                st.markdown(f"**{job_id}** · {escape(chapters_text)} · {job.status}")
+        with view_col:
+            st.button("View", key=f"view-{job_id}", on_click=watch_jobs, args=(job_ids, job_id))
+        with action_col:
+            if job is not None and job.active:
+                st.button("Cancel", key=f"cancel-{job_id}", on_click=job_manager.cancel, args=(job_id,))
+            elif job_manager.resumable(job_id):
+                # Cancelled, failed, or started before a server restart: continue from the run journal
+                st.button("Resume", key=f"resume-{job_id}", on_click=job_manager.resume, args=(job_id,))
+        with remove_col:
+            if job is None or not job.active:
+                st.button("Remove", key=f"remove-{job_id}", on_click=watch_jobs,
+                          args=([other for other in job_ids if other != job_id],))
+
+selected_id = st.query_params.get("job") or (job_ids[-1] if job_ids else None)
+selected_job = job_manager.get(selected_id) if selected_id else None
+
+result = None
+if selected_job is not None:
+    show_full_log = len(selected_job.progress) > 2 * LOG_BLOCK and st.toggle("Show full activity log", value=False)
+    log_markup = build_progress_markup(selected_job, show_all=show_full_log)
     if log_markup:
-        log_placeholder.markdown(log_markup, unsafe_allow_html=True)
-
-result = st.session_state["result"]
+        st.markdown(log_markup, unsafe_allow_html=True)
+    if selected_job.active:
+        stream_markup = build_stream_markup(selected_job.stream_info, selected_job.stream_text)
+        if stream_markup:
+            st.markdown(stream_markup, unsafe_allow_html=True)
+    elif selected_job.status == "failed":
+        st.error(f"Generation failed: {selected_job.error}")
+    elif selected_job.status == "cancelled":
+        st.warning("Generation was cancelled. Resume it to continue from the last finished chapter.")
+    result = selected_job.result
 
 if result:
-    summary_markup = build_request_summary(st.session_state.get("last_request"))
+    summary_markup = build_request_summary(selected_job.meta)
     if summary_markup:
         st.markdown(summary_markup, unsafe_allow_html=True)
 
@@ -488,11 +643,9 @@ if result:
         if outline_path:
             try:
                 outline_file = Path(outline_path)
-                with outline_file.open("r", encoding="utf-8") as handle:
-                    outline_content = handle.read()
                 st.download_button(
                     "Download outline",
-                    data=outline_content,
+                    data=cached_text(outline_file),
                     file_name=outline_file.name,
                     mime="text/plain",
                 )
@@ -501,25 +654,45 @@ if result:
 
     with chapters_tab:
         st.markdown("### Chapters")
+        continuity_alerts = result.get("continuity_alerts") or []
+        if continuity_alerts:
+            with st.expander(f"Continuity alerts ({len(continuity_alerts)})", expanded=False):
+                st.markdown("\n".join(f"- {alert}" for alert in continuity_alerts))
         chapters = result.get("chapters", [])
         if chapters:
-            column_count = 2 if len(chapters) > 1 else 1
-            chapter_columns = st.columns(column_count)
-            for index, chapter_path in enumerate(chapters):
-                column = chapter_columns[index % column_count]
-                with column:
-                    file_path = Path(chapter_path)
+            # Only the chapters on the current page are read, each at most once per change on disk
+            page_count = (len(chapters) + CHAPTERS_PER_PAGE - 1) // CHAPTERS_PER_PAGE
+            page = 1
+            if page_count > 1:
+                page = int(st.number_input("Page", min_value=1, max_value=page_count, value=1))
+            for chapter_path in chapters[(page - 1) * CHAPTERS_PER_PAGE:page * CHAPTERS_PER_PAGE]:
+                file_path = Path(chapter_path)
+                with st.expander(file_path.stem.replace("_", " ").title(), expanded=False):
                     try:
-                        with file_path.open("r", encoding="utf-8") as chapter_file:
-                            chapter_content = chapter_file.read()
-                        st.markdown(f"**{file_path.stem.replace('_', ' ').title()}**")
-                        st.download_button(
-                            f"Download {file_path.name}",
-                            data=chapter_content,
-                            file_name=file_path.name,
-                            mime="text/plain",
-                        )
+                        st.markdown(cached_text(file_path).split("\n\n", 1)[-1])
                     except OSError:
                         st.warning(f"Could not read {file_path}.")
+
+            export_format = st.selectbox(
+                "Book format",
+                options=list(EXPORT_FORMATS),
+                format_func={"markdown": "Markdown", "html": "HTML", "epub": "EPUB"}.get,
+            )
+            try:
+                manifest = Path(result["output_dir"]) / CHAPTER_MANIFEST_FILENAME
+                manifest_mtime_ns = manifest.stat().st_mtime_ns if manifest.exists() else 0
+                st.download_button(
+                    "Download book",
+                    data=exported_book(result["output_dir"], export_format, manifest_mtime_ns),
+                    file_name=f"book{EXPORT_EXTENSIONS[export_format]}",
+                    mime=EXPORT_MIME_TYPES[export_format],
+                )
+            except (OSError, ValueError) as exc:
+                st.warning(f"Could not export the book: {exc}")
         else:
             st.info("No chapters generated yet. Enable \"Full chapter drafts\" to produce full drafts.")
+
+# Poll while any watched job is still running; the jobs themselves run in the background
+if any(job is not None and job.active for job in map(job_manager.get, job_ids)):
+    time.sleep(POLL_SECONDS)
+    st.rerun()
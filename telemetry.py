@@ -0,0 +1,217 @@
+"""Per-call LLM telemetry: tokens, latency and cost traced to a JSONL file."""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import autogen
+
+from text_utils import estimate_tokens
+
+_call_labels: contextvars.ContextVar = contextvars.ContextVar("llm_call_labels", default={})
+# Holds [first token time] for the traced completion running in this context
+_first_token: contextvars.ContextVar = contextvars.ContextVar("llm_first_token", default=None)
+
+
+@contextmanager
+def trace_labels(**labels: Any) -> Iterator[None]:
+    """Label completions made directly on this thread (e.g. through ``ask_agent``).
+
+    These labels take precedence over the ones set with :func:`label_agents`.
+    """
+    token = _call_labels.set({**_call_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _call_labels.reset(token)
+
+
+def current_labels(agent: autogen.ConversableAgent) -> Dict[str, Any]:
+    """Labels that apply to a completion the agent is making now"""
+    return {**getattr(agent, "trace_labels", {}), **_call_labels.get()}
+
+
+def note_first_token() -> None:
+    """Mark the arrival of the first streamed token of the completion in progress"""
+    holder = _first_token.get()
+    if holder is not None and holder[0] is None:
+        holder[0] = time.perf_counter()
+
+
+def label_agents(agents: Iterable[autogen.ConversableAgent], **labels: Any) -> None:
+    """Attach labels such as phase and chapter to every completion these agents make.
+
+    Labels live on the agent rather than in a context variable because
+    AutoGen's async replies run completions on executor threads, which do not
+    inherit the caller's context.
+    """
+    for agent in agents:
+        agent.trace_labels = dict(labels)
+
+
+class LLMTracer:
+    """Records one JSON line per LLM completion and keeps running totals."""
+
+    def __init__(self, path: Path, price_per_1k: Optional[Tuple[float, float]] = None):
+        self.path = Path(path)
+        self.price_per_1k = price_per_1k  # (prompt, completion) USD per 1K tokens
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._rounds: Dict[Tuple[Any, str], int] = {}
+        self._totals = self._empty_totals()
+        self._by_agent: Dict[str, Dict[str, float]] = {}
+        self._by_chapter: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _empty_totals() -> Dict[str, float]:
+        return {
+            "calls": 0,
+            "cached": 0,
+            "errors": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latency_s": 0.0,
+            "cost": 0.0,
+        }
+
+    def instrument(self, agent: autogen.ConversableAgent) -> None:
+        """Wrap the agent's LLM client so every completion is traced"""
+        client = getattr(agent, "client", None)
+        if client is None or getattr(client, "llm_tracer", None) is self:
+            return
+
+        create = client.create
+
+        def traced_create(**config: Any) -> Any:
+            labels = current_labels(agent)
+            started = time.perf_counter()
+            first_token = [None]
+            token = _first_token.set(first_token)
+            response = None
+            error: Optional[BaseException] = None
+            try:
+                response = create(**config)
+                return response
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _first_token.reset(token)
+                ttft = first_token[0] - started if first_token[0] is not None else None
+                self._record(agent.name, labels, config, response, error, time.perf_counter() - started, ttft)
+
+        client.create = traced_create
+        client.llm_tracer = self
+
+    def _record(
+        self,
+        agent_name: str,
+        labels: Dict[str, Any],
+        config: Dict[str, Any],
+        response: Any,
+        error: Optional[BaseException],
+        latency: float,
+        ttft: Optional[float] = None,
+    ) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+        else:
+            prompt_tokens = sum(
+                estimate_tokens(str(message.get("content") or ""))
+                for message in config.get("messages", [])
+            )
+            completion_tokens = 0
+
+        cached = bool(getattr(response, "from_cache", False))
+        if cached:
+            cost = 0.0  # Served by the response cache, so nothing was billed
+        elif self.price_per_1k is not None:
+            cost = (prompt_tokens * self.price_per_1k[0] + completion_tokens * self.price_per_1k[1]) / 1000
+        else:
+            cost = getattr(response, "cost", 0.0) or 0.0
+
+        chapter = labels.get("chapter")
+        with self._lock:
+            round_key = (chapter, agent_name)
+            self._rounds[round_key] = self._rounds.get(round_key, 0) + 1
+            record = {
+                "ts": datetime.now().isoformat(timespec="milliseconds"),
+                "agent": agent_name,
+                "phase": labels.get("phase"),
+                "chapter": chapter,
+                "round": self._rounds[round_key],
+                "model": getattr(response, "model", None) or config.get("model"),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_s": round(latency, 4),
+                "ttft_s": round(ttft, 4) if ttft is not None else None,  # Streamed completions only
+                "cost": round(cost, 6),
+                "cached": cached,
+                "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            }
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+            buckets = [
+                self._totals,
+                self._by_agent.setdefault(agent_name, self._empty_totals()),
+                self._by_chapter.setdefault(str(chapter or labels.get("phase") or "other"), self._empty_totals()),
+            ]
+            for bucket in buckets:
+                bucket["calls"] += 1
+                bucket["errors"] += 1 if error is not None else 0
+                bucket["latency_s"] += latency
+                if cached:
+                    bucket["cached"] += 1
+                    continue
+                bucket["prompt_tokens"] += prompt_tokens
+                bucket["completion_tokens"] += completion_tokens
+                bucket["cost"] += cost
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate totals overall, per agent and per chapter (or phase).
+
+        Completions served by the response cache count towards ``calls`` and
+        ``cached`` but not towards tokens or cost.
+        """
+        def rounded(bucket: Dict[str, float]) -> Dict[str, float]:
+            return {
+                key: round(value, 4) if isinstance(value, float) else value
+                for key, value in bucket.items()
+            }
+
+        with self._lock:
+            return {
+                "trace_path": str(self.path),
+                "totals": rounded(self._totals),
+                "by_agent": {name: rounded(bucket) for name, bucket in self._by_agent.items()},
+                "by_chapter": {key: rounded(bucket) for key, bucket in self._by_chapter.items()},
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def open_tracer(output_dir: Path) -> LLMTracer:
+    """Create a tracer writing to a fresh per-run file under ``output_dir/traces``.
+
+    ``LLM_PRICE_PER_1K`` ("prompt,completion" in USD) overrides AutoGen's
+    built-in price table, which does not know local or most OpenRouter models.
+    """
+    price_per_1k: Optional[Tuple[float, float]] = None
+    price_setting = os.getenv("LLM_PRICE_PER_1K")
+    if price_setting:
+        prompt_price, _, completion_price = price_setting.partition(",")
+        price_per_1k = (float(prompt_price), float(completion_price or prompt_price))
+
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return LLMTracer(Path(output_dir) / "traces" / f"run-{run_id}.jsonl", price_per_1k=price_per_1k)
@@ -0,0 +1,16 @@
+from scene_patch import apply_edits, number_draft_messages, parse_edits
+
+
+def test_editor_sees_the_numbering_edits_are_applied_with():
+    draft = "First paragraph.\n\n\n  Second paragraph.\n\nThird paragraph."
+    history = [
+        {"role": "user", "name": "user_proxy", "content": "Write chapter 1."},
+        {"role": "user", "name": "writer", "content": f"PLAN: a plan\nSCENE:\n{draft}"},
+    ]
+
+    shown = number_draft_messages(history)
+
+    assert shown[1]["content"].endswith("[1] First paragraph.\n\n[2] Second paragraph.\n\n[3] Third paragraph.")
+    assert history[1]["content"].endswith(draft)  # The stored history is left alone
+    edits = parse_edits('EDITS: [{"op": "replace", "paragraph": 2, "text": "New second."}]')
+    assert apply_edits(draft, edits) == "First paragraph.\n\nNew second.\n\nThird paragraph."
@@ -0,0 +1,33 @@
+from story_state import Fact, StoryState, parse_memory_update
+
+
+def test_parse_memory_update_splits_names_from_details():
+    facts = parse_memory_update(
+        "MEMORY UPDATE:\n"
+        "EVENT: The board rejects the merger\n"
+        "CHARACTER: Dane - more confident\n"
+        "WORLD: **Conference Room**: tense and crowded\n"
+    )
+
+    assert facts == [
+        Fact(0, "event", "", "The board rejects the merger"),
+        Fact(0, "character", "Dane", "more confident"),
+        Fact(0, "world", "Conference Room", "tense and crowded"),
+    ]
+
+
+def test_parse_memory_update_skips_free_form_lines():
+    facts = parse_memory_update(
+        "CHARACTER: Dane becomes more confident after the meeting\n"
+        "CHARACTER: Mara - distrusts Dane\n"
+    )
+
+    assert facts == [Fact(0, "character", "Mara", "distrusts Dane")]
+
+
+def test_free_form_line_does_not_hide_known_names():
+    state = StoryState()
+    state.record_update(1, "CHARACTER: Dane becomes more confident after the meeting\nCHARACTER: Dane - bolder")
+
+    assert [fact.detail for fact in state.facts] == ["bolder"]
+    assert "Dane" in state.render_for("Dane faces the board again")
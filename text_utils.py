@@ -0,0 +1,48 @@
+"""Small text helpers shared by the generation modules."""
+import re
+from typing import List
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\S+")
+
+# Roughly four characters per token for English prose with common tokenizers.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, tokenizer-free estimate of how many tokens ``text`` costs."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_words(text: str) -> int:
+    """Whitespace-separated words in ``text``, counted locally instead of asking the model."""
+    return sum(1 for _ in _WORD.finditer(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Shorten ``text`` to about ``max_tokens`` tokens, preferring sentence boundaries."""
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    kept: List[str] = []
+    length = 0
+    for sentence in _SENTENCE_END.split(text):
+        if length + len(sentence) + 1 > max_chars:
+            break
+        kept.append(sentence)
+        length += len(sentence) + 1
+
+    if kept:
+        return " ".join(kept)
+    return text[:max_chars].rstrip() + "..."
+
+
+def compress_parts(parts: List[str], max_tokens: int) -> str:
+    """Join ``parts`` into one text of about ``max_tokens``, giving each an equal share."""
+    parts = [part.strip() for part in parts if part and part.strip()]
+    if not parts:
+        return ""
+    share = max(1, max_tokens // len(parts))
+    return " ".join(truncate_to_tokens(part, share) for part in parts)